@@ -17,12 +17,15 @@ from z3 import get_version_string
 
 import stormpy
 from pric3.input_program import InputProgram, set_global_expression_int_to_real
+from pric3.portfolio import DEFAULT_PORTFOLIO, load_portfolio, run_portfolio
 from pric3.pric3 import PrIC3
 from pric3.settings import OBLIGATION_QUEUE_CLASSES, GENERALIZATION_METHOD, Settings
+from pric3.pric3_solver import PRIC3_SOLVER_BACKENDS
 from pric3.smt_program import SmtProgram
 from pric3.state_graph import StateGraph
 from pric3.utils import setup_sigint_handler
 from pric3.statistics import Statistics
+from pric3.threshold_sweep import ThresholdSweep, parse_thresholds
 
 
 def _setup_logger(logfile, cmd_loglevel, file_loglevel):
@@ -61,9 +64,15 @@ click.option = partial(click.option, show_default=True)  # type:ignore
 @click.command()
 @click.argument('program', type=click.Path(exists=True))
 @click.option('--lam',
-              required=True,
               help='Lambda, the threshold.',
               type=Fraction)
+@click.option('--lam-sweep',
+              type=str,
+              help='check a comma-separated list of thresholds in one process instead of --lam')
+@click.option('--lam-bisect',
+              type=int,
+              default=0,
+              help='after --lam-sweep, bisect the interval between the largest refuted and the smallest proven threshold this many times')
 @click.option('--render-state-graph',
               default=False,
               type=int,
@@ -83,11 +92,30 @@ click.option = partial(click.option, show_default=True)  # type:ignore
     default=False)
 @click.option('--obligation-queue-class',
               type=click.Choice(OBLIGATION_QUEUE_CLASSES.keys()),
-              default="RepushingObligationQueue")
+              default="RepushingObligationQueue",
+              help="the order in which obligations are checked; the OracleValue, DeltaGap and DepthBounded queues are RepushingObligationQueues with another order within a frame")
+@click.option('--obligation-depth-bound',
+              type=int,
+              default=100,
+              help="up to which history length the DepthBoundedObligationQueue checks obligations breadth-first")
 @click.option('--simulator',
-              type=click.Choice(["py", "cpp"]),
+              type=click.Choice(["py", "cpp", "batched"]),
               default="cpp",
               help="which simulator to use for the simulation oracle")
+@click.option('--simulation-workers', type=int, default=1, help="number of processes for the batched simulator")
+@click.option('--simulation-seed', type=int, help="random seed for the batched simulator")
+@click.option('--simulation-state-limit',
+              type=int,
+              default=1000000,
+              help="how many states the batched simulator explores; walks leaving them are discarded")
+@click.option('--simulation-tolerance',
+              type=float,
+              help="simulate adaptively with the batched simulator until the 95% confidence intervals near the initial state are narrower than this "
+                   "(--number-simulations-for-oracle is the maximum number of walks per round)")
+@click.option('--simulation-walk-budget',
+              type=int,
+              help="the maximum number of walks of the adaptive simulation over the initialization and all refinements "
+                   "(default: 10 times --number-simulations-for-oracle)")
 @click.option("--oracle-type",
               type=click.Choice(["simulation", "perfect", "modelchecking", "solveeqspartly_exact","solveeqspartly_inexact", "file"]),
               default="perfect",
@@ -108,6 +136,48 @@ click.option = partial(click.option, show_default=True)  # type:ignore
               type = click.Choice(GENERALIZATION_METHOD.keys()),
               default="Hybrid")
 @click.option('--max-num-ctgs', type=int, default=1)
+@click.option('--solver-backend',
+              type=click.Choice(PRIC3_SOLVER_BACKENDS.keys()),
+              default="frames",
+              help="one solver per frame, or a single incremental solver with activation literals for the frames")
+@click.option('--solver-workers',
+              type=int,
+              default=1,
+              help="number of processes for checking independent relative inductiveness queries in parallel")
+@click.option('--batch-strengthen/--no-batch-strengthen',
+              default=False,
+              help="check all obligations of the smallest frame index in parallel (with --solver-workers)")
+@click.option('--inductiveness-cache/--no-inductiveness-cache',
+              default=True,
+              help="reuse results of relative inductiveness checks for checks that they imply by monotonicity of the frames")
+@click.option('--counterexample-pool-size',
+              type=int,
+              default=8,
+              help="how many recent counterexamples per frame are evaluated before a relative inductiveness check calls the solver (0 to disable)")
+@click.option('--query-capture',
+              type=click.Choice(["eager", "deferred", "off"]),
+              default="deferred",
+              help="when to serialize the fastest/slowest SMT queries for the statistics")
+@click.option('--oracle-file',
+              type=click.Path(file_okay=False),
+              default="oracle.pr",
+              help="the oracle table directory for --oracle-type file (see Oracle.save_oracle_on_disk)")
+@click.option('--oracle-cache',
+              type=click.Path(file_okay=False),
+              help="a directory to cache initial oracles in, keyed by the program and the oracle settings")
+@click.option('--oracle-refinement',
+              type=click.Choice(["value_iteration", "exact"]),
+              default="exact",
+              help="how to refine the oracle: exact solving with z3, or floating-point value iteration, which is faster, "
+                   "but only approximates the values (the perfect and solveeqspartly_exact oracles are always exact)")
+@click.option('--portfolio',
+              type=int,
+              default=0,
+              help="run this many configurations of the portfolio in parallel processes and take the first answer (0: off)")
+@click.option('--portfolio-configs',
+              type=click.Path(exists=True),
+              help="a JSON file with a list of objects mapping setting names to values, one per configuration "
+                   "(default: the configurations of benchmarks/rwth_cluster/generate_jobs.py)")
 @click.option('--use-states-of-same-kind/--no-use-states-of-same-kind', default=True)
 @click.option('--save-stats/--no-save-stats', default=True)
 @click.option('--tag', type=str, help="a tag which is saved in the stats entry")
@@ -124,6 +194,14 @@ def main(program, **args):
     `--render-state-graph COUNT` may be useful to render a graph of the current model
     to a file, where `COUNT` is the maximum number of nodes to be drawn.
     """
+    sweep_mode = args["lam_sweep"] is not None or args["lam_bisect"] > 0
+    if args["lam"] is None and not sweep_mode:
+        raise click.UsageError("Missing option '--lam' (or '--lam-sweep'/'--lam-bisect').")
+    if args["lam"] is not None and sweep_mode:
+        raise click.UsageError("'--lam' cannot be combined with '--lam-sweep' or '--lam-bisect'.")
+    if args["portfolio"] > 0 and sweep_mode:
+        raise click.UsageError("'--portfolio' cannot be combined with '--lam-sweep' or '--lam-bisect'.")
+
     _setup_logger(logfile='pric3.log',
                   cmd_loglevel=logging.INFO,
                   file_loglevel=logging.INFO)
@@ -164,7 +242,14 @@ def main(program, **args):
 
     smt_program = SmtProgram(input_program, settings.get_smt_settings())
 
-    ic3 = PrIC3(smt_program, args["lam"], settings, statistics)
+    if sweep_mode:
+        sweep = ThresholdSweep(smt_program, settings, statistics)
+    elif args["portfolio"] > 0:
+        configs = load_portfolio(args["portfolio_configs"]) if args["portfolio_configs"] else DEFAULT_PORTFOLIO
+        configs = configs[:args["portfolio"]]
+        ic3 = None
+    else:
+        ic3 = PrIC3(smt_program, args["lam"], settings, statistics)
 
     def sigterm_handler(signum, frame):
         if args["save_stats"]:
@@ -175,15 +260,24 @@ def main(program, **args):
     signal.signal(signal.SIGTERM, sigterm_handler)
 
     try:
-        ic3.run()
+        if sweep_mode:
+            sweep.sweep(parse_thresholds(args["lam_sweep"] or ""))
+            sweep.bisect(args["lam_bisect"])
+            ic3 = sweep.pric3
+        elif args["portfolio"] > 0:
+            run_portfolio(storm_program, input_program, args["lam"], settings, configs, statistics)
+        else:
+            ic3.run()
     except MemoryError:
         if args["save_stats"]:
             statistics.status = "oom"
             statistics.to_file_incremental("stats/stats_%s.p")
         sys.exit(1)
 
-    ic3.print_details()
-    if settings.export_to_smt2:
+    if sweep_mode:
+        sweep.print_results()
+    statistics.print_statistics()
+    if settings.export_to_smt2 and ic3 is not None:
         ic3.export_smt(settings.export_to_smt2)
 
     if args["save_stats"]:
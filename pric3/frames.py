@@ -0,0 +1,155 @@
+"""
+Explicit bookkeeping of the IC3 frames :math:`F_1, \\ldots, F_k` using a :class:`FrameStore`.
+
+Every assertion ("lemma") that is ever added to a frame is interned once and gets a canonical integer id.
+
+The frames are monotone (:math:`F_1 \\supseteq F_2 \\supseteq \\ldots \\supseteq F_k` as sets of lemmas).
+Therefore we do not store the frames themselves, but only the *level* of every lemma, i.e.
+the highest index of a frame that contains it.
+Frame :math:`F_i` consists of all lemmas with level :math:`\\geq i`, and the lemmas with level exactly :math:`i`
+(the *layer* :math:`i`) are :math:`F_i \\setminus F_{i+1}`.
+Propagation only has to consider lemmas in this layer, and two consecutive frames
+are equal iff the layer in between is empty.
+"""
+
+from typing import Dict, Iterator, List, NamedTuple, Set, Tuple, Callable
+
+import z3
+
+from pric3.state_graph import StateId
+
+
+class FrameLemma(NamedTuple):
+    """
+    A lemma :math:`Frame[s] \\leq \\delta` that is stored in (some of) the frames.
+
+    Attributes:
+        state_id (StateId): the state this lemma was created for.
+        state_args (Tuple[z3.BoolRef, ...]): the constraints describing the state(s) this lemma talks about.
+        probability_expression (z3.ExprRef): the upper bound :math:`\\delta` (possibly a polynomial if we generalize).
+        assertion (z3.BoolRef): the assertion that is added to a frame's solver.
+    """
+    state_id: StateId
+    state_args: Tuple[z3.BoolRef, ...]
+    probability_expression: z3.ExprRef
+    assertion: z3.BoolRef
+
+
+LemmaId = int
+"""
+Lemmas are referred to by canonical ids handed out by :py:meth:`FrameStore.intern`.
+"""
+
+
+class FrameStore:
+    """
+    Stores the frames :math:`F_1, \\ldots, F_k` as layers of lemma ids.
+    Each lemma is stored exactly once, together with its level.
+
+    Frame :math:`F_0` is never stored explicitly, it is fixed by the solver (see :py:class:`pric3.pric3_solver.PrIC3Solver`).
+
+    Attributes:
+        lemmas (List[FrameLemma]): all interned lemmas, indexed by their id.
+    """
+
+    def __init__(self):
+        self.lemmas: List[FrameLemma] = []
+        self._lemma_ids: Dict[Tuple[StateId, Tuple[int, ...], int], LemmaId] = dict()
+
+        # The level of each lemma, indexed by lemma id. Level 0 means that the lemma is not contained in any frame.
+        self._levels: List[int] = []
+
+        # _layers[i] contains the ids of all lemmas with level i, i.e. F_i \ F_{i+1}.
+        # Index 0 (i.e. F_0) is a placeholder that is never used.
+        self._layers: List[Set[LemmaId]] = [set()]
+
+    @property
+    def k(self) -> int:
+        """
+        The index of the frontier frame.
+        """
+        return len(self._layers) - 1
+
+    def add_frame(self):
+        """
+        Append a new, empty frontier frame.
+        """
+        self._layers.append(set())
+
+    def intern(self, state_id: StateId, state_args: Tuple[z3.BoolRef, ...],
+               probability_expression: z3.ExprRef,
+               create_assertion: Callable[[], z3.BoolRef]) -> LemmaId:
+        """
+        Return the id of the lemma for the given state args and probability expression.
+        If there is no such lemma yet, a new one is created using `create_assertion` to obtain its solver assertion.
+        """
+        # The z3 ids are stable since we keep references to all expressions in self.lemmas.
+        key = (state_id, tuple(arg.get_id() for arg in state_args), probability_expression.get_id())
+        lemma_id = self._lemma_ids.get(key)
+        if lemma_id is None:
+            lemma_id = len(self.lemmas)
+            self.lemmas.append(FrameLemma(state_id, tuple(state_args), probability_expression, create_assertion()))
+            self._levels.append(0)
+            self._lemma_ids[key] = lemma_id
+        return lemma_id
+
+    def level(self, lemma_id: LemmaId) -> int:
+        """
+        Return the index of the highest frame that contains the lemma, or 0 if no frame contains it.
+        """
+        return self._levels[lemma_id]
+
+    def contains(self, frame_index: int, lemma_id: LemmaId) -> bool:
+        """
+        Is the lemma contained in frame `frame_index`?
+        """
+        return self._levels[lemma_id] >= frame_index
+
+    def add(self, frame_index: int, lemma_id: LemmaId) -> int:
+        """
+        Add a lemma to the frames :math:`F_1, \\ldots, F_{frame\\_index}`.
+
+        Return the previous level of the lemma.
+        The lemma was newly added to exactly the frames `previous level + 1, ..., frame_index`
+        (which is empty if the previous level is at least `frame_index`).
+        """
+        assert 1 <= frame_index <= self.k
+        old_level = self._levels[lemma_id]
+        if old_level < frame_index:
+            self._layers[old_level].discard(lemma_id)
+            self._layers[frame_index].add(lemma_id)
+            self._levels[lemma_id] = frame_index
+        return old_level
+
+    def only_in(self, frame_index: int) -> List[LemmaId]:
+        """
+        Return the ids of all lemmas in :math:`F_i \\setminus F_{i+1}` in the order they were interned.
+        The result is a copy and can be iterated while adding lemmas to the frames.
+        """
+        return sorted(self._layers[frame_index])
+
+    def difference_count(self, frame_index: int) -> int:
+        """
+        Return :math:`|F_i \\setminus F_{i+1}|`.
+        """
+        return len(self._layers[frame_index])
+
+    def is_equal_to_next(self, frame_index: int) -> bool:
+        """
+        Return True iff :math:`F_i = F_{i+1}`. Uses monotonicity of the frames.
+        """
+        return frame_index < self.k and self.difference_count(frame_index) == 0
+
+    def lemmas_of(self, frame_index: int) -> Iterator[FrameLemma]:
+        """
+        Iterate over all lemmas in frame `frame_index`.
+        """
+        lemma_ids = [lemma_id for layer in self._layers[frame_index:] for lemma_id in layer]
+        for lemma_id in sorted(lemma_ids):
+            yield self.lemmas[lemma_id]
+
+    def size(self, frame_index: int) -> int:
+        """
+        Return the number of lemmas in frame `frame_index`.
+        """
+        return sum(len(layer) for layer in self._layers[frame_index:])
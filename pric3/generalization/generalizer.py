@@ -6,18 +6,21 @@ Computes a generalization, if available.
 from pric3.generalization.state_of_the_same_kind_cache import StatesOfTheSameKindCache
 from pric3.generalization.interpolator import Interpolator
 from pric3.utils import *
-from pric3.proof_obligations.repushing_obligation_queue import RepushingObligationQueue
+from pric3.proof_obligations.obligation_store import ObligationStore
 from z3 import RealVal, IntVal, Solver
 
 class Generalizer:
 
-    def __init__(self, state_graph, smt_program, p_solver, statistics, settings):
+    split_limit = 0
+
+    def __init__(self, state_graph, smt_program, p_solver, statistics, settings, obligation_store: ObligationStore):
 
         self.state_graph = state_graph
         self.smt_program = smt_program
         self.input_program = self.smt_program.input_program
         self.p_solver = p_solver
         self.statistics = statistics
+        self.obligation_store = obligation_store
 
         self._state_of_the_same_kind_cache = StatesOfTheSameKindCache(self.state_graph, self.input_program,
                                                                       self.statistics)
@@ -221,7 +224,7 @@ class Generalizer:
             #
                 #If the same kind valuation sits between low-val and high-val
                 if z3_values_check_neq(same_kind_valuation, low_val) and z3_values_check_lt(same_kind_valuation, high_val):
-                    data_points.append((same_kind_valuation, RepushingObligationQueue.smallest_probability_for_state[same_kind_id]))
+                    data_points.append((same_kind_valuation, self.obligation_store[same_kind_id]))
 
 
             same_kind_id = self._state_of_the_same_kind_cache.get_last_state_of_this_kind(state_id, input_variable)
@@ -231,7 +234,7 @@ class Generalizer:
                 #If the same kind valuation sits between low-val and high-val
                if z3_values_check_neq(same_kind_valuation, low_val) and z3_values_check_lt(same_kind_valuation, high_val):
                    data_points.append(
-                       (same_kind_valuation, RepushingObligationQueue.smallest_probability_for_state[same_kind_id]))
+                       (same_kind_valuation, self.obligation_store[same_kind_id]))
 
 
         data_points = data_points + [(low_val, low_delta), (high_val, high_delta)]
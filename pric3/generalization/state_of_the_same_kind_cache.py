@@ -47,7 +47,7 @@ class StatesOfTheSameKindCache:
         """
         self._statistics.start_cache_states_of_same_kind_timer()
 
-        val = self._state_graph.get_state_valuation(state_id)
+        val = self._state_graph.get_state_int_valuation(state_id)
 
         # For every variable x:
         #    * Obtain state valuation val_x with variable x dropped.
@@ -82,7 +82,7 @@ class StatesOfTheSameKindCache:
         (i.e. there is no other state of the same kind), we return -1  (since 0 is identified with False and 0 might be a valid state_id).
         """
 
-        val = self._state_graph.get_state_valuation(state_id)
+        val = self._state_graph.get_state_int_valuation(state_id)
         val_without_var = self._state_valuation_to_tuple_without_variable(val, variable)
 
         #Note: We use -1 since 0 is identified with false
@@ -106,7 +106,7 @@ class StatesOfTheSameKindCache:
         (i.e. there is no other state of the same kind), we return -1  (since 0 is identified with False and 0 might be a valid state_id).
         """
 
-        val = self._state_graph.get_state_valuation(state_id)
+        val = self._state_graph.get_state_int_valuation(state_id)
         val_without_var = self._state_valuation_to_tuple_without_variable(val, variable)
 
         #Note: We use -1 since 0 is identified with false
@@ -129,7 +129,7 @@ class StatesOfTheSameKindCache:
         (i.e. there is no other state of the same kind), we return -1  (since 0 is identified with False and 0 might be a valid state_id).
         """
 
-        val = self._state_graph.get_state_valuation(state_id)
+        val = self._state_graph.get_state_int_valuation(state_id)
         val_without_var = self._state_valuation_to_tuple_without_variable(val, variable)
 
         #Note: We use -1 since 0 is identified with false
@@ -139,16 +139,11 @@ class StatesOfTheSameKindCache:
 
     def _state_valuation_to_tuple_without_variable(self, state_valuation, variable_to_drop):
         """
-        Gets a program state (dict from input variables to values) and returns a tuple (for hashing) of these values
-        (order is determined by order of InputVariables), where the entry for variable_to_drop is omitted.s
+        Gets a program state (tuple of ints, see StateGraph.get_state_int_valuation) and returns a tuple (for hashing) of these values
+        where the entry for variable_to_drop is omitted.
         :param state_valuation:
         :param variable_to_drop:
         :return:
         """
-
-        result = ()
-        for var in self._input_program.module.variables.values():
-            if var.name != variable_to_drop.name:
-                result = result + (state_valuation[var], )
-
-        return result
\ No newline at end of file
+        column = self._state_graph.get_valuation_column(variable_to_drop)
+        return state_valuation[:column] + state_valuation[column + 1:]
\ No newline at end of file
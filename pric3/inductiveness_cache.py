@@ -0,0 +1,157 @@
+"""
+Results of relative inductiveness checks (see :py:meth:`pric3.pric3_solver.PrIC3Solver.is_relative_inductive`)
+that are reused for later checks by monotonicity of the frames.
+
+A lemma with level L belongs to the frames F_1, ..., F_L, so for 1 <= j <= i, F_j contains all lemmas of F_i.
+Lemmas are only added until the solver is replaced on a reset. The check for frame i, states and delta is sat iff there is
+a state with Phi(F_i)[s] > delta. Hence:
+
+* An unsat result (inductive) for frame i and delta holds for every frame 1 <= j <= i and every delta' >= delta, at any later time.
+* A sat result (a counterexample) for frame i and delta holds for every frame j >= i and every delta' <= delta,
+  as long as no lemma was added to F_j since the check.
+
+F_0 is not a set of lemmas, so results for F_0 are only reused for F_0 (which never changes).
+Deltas are only compared if they are rational constants, other expressions (e.g. polynomials of the generalizer) must be equal.
+
+Counterexamples are also reused for checks of other states: a :py:class:`CounterexamplePool` keeps the recent counterexample
+models of each frame, and a check is sat if one of them (for the unchanged frame) satisfies its query.
+"""
+
+from collections import deque
+from fractions import Fraction
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from z3 import BoolRef, ExprRef, ModelRef, is_int_value, is_rational_value, is_true
+
+
+def _delta_value(expression: ExprRef) -> Optional[Fraction]:
+    if is_int_value(expression):
+        return Fraction(expression.as_long())
+    if is_rational_value(expression):
+        return expression.as_fraction()
+    return None
+
+
+class _Entry:
+    __slots__ = ["frame_index", "delta", "result", "log_watermark"]
+
+    def __init__(self, frame_index: int, delta: Optional[Fraction], result: Any, log_watermark: int):
+        self.frame_index = frame_index
+        self.delta = delta
+        self.result = result
+        self.log_watermark = log_watermark
+
+    def covers_frame(self, frame_index: int) -> bool:
+        if frame_index == 0 or self.frame_index == 0:
+            return frame_index == self.frame_index
+        if self.result is True:
+            return frame_index <= self.frame_index
+        return frame_index >= self.frame_index
+
+    def covers_delta(self, delta: Optional[Fraction]) -> bool:
+        if delta is None or self.delta is None:
+            # the expressions are equal
+            return True
+        if self.result is True:
+            return delta >= self.delta
+        return delta <= self.delta
+
+    def covers(self, other: "_Entry") -> bool:
+        """
+        Whether this entry holds for every check the other entry holds for.
+        """
+        return (self.result is True) == (other.result is True) and self.covers_frame(other.frame_index) \
+            and self.covers_delta(other.delta) and self.log_watermark >= other.log_watermark
+
+
+class InductivenessCache:
+    """
+    Relative inductiveness results by state and delta.
+
+    Entries are keyed by the z3 ids of the state arguments (and of the delta if it is not constant).
+    The entries keep these expressions alive, so their ids are not reused.
+    """
+
+    def __init__(self):
+        self._entries: Dict[Tuple, Tuple[Tuple[ExprRef, ...], List[_Entry]]] = dict()
+
+    @staticmethod
+    def _key(state_args, expression: ExprRef) -> Tuple[Tuple, Optional[Fraction], Tuple[ExprRef, ...]]:
+        delta = _delta_value(expression)
+        key_expressions = tuple(state_args) if delta is not None else tuple(state_args) + (expression,)
+        key = (tuple(arg.get_id() for arg in key_expressions), delta is None)
+        return key, delta, key_expressions
+
+    def lookup(self, frame_index: int, state_args, expression: ExprRef, frame_version: int):
+        """
+        Return True or the counterexample model of a previous check that holds for this check, or None.
+
+        :param frame_version: the length of the lemma log when a lemma was last added to the frame,
+                              see :py:meth:`pric3.pric3_solver.PrIC3Solver.frame_version`
+        """
+        key, delta, _key_expressions = self._key(state_args, expression)
+        if key not in self._entries:
+            return None
+        for entry in self._entries[key][1]:
+            if entry.covers_frame(frame_index) and entry.covers_delta(delta) and \
+                    (entry.result is True or frame_version <= entry.log_watermark):
+                return entry.result
+        return None
+
+    def add(self, frame_index: int, state_args, expression: ExprRef, result, log_watermark: int):
+        """
+        Add the result (True or a model) of a check, which was made when the lemma log had `log_watermark` entries.
+        Entries that are covered by the new one are dropped.
+        """
+        assert result is True or isinstance(result, ModelRef)
+        key, delta, key_expressions = self._key(state_args, expression)
+        entry = _Entry(frame_index, delta, result, log_watermark)
+        if key not in self._entries:
+            self._entries[key] = (key_expressions, [entry])
+        else:
+            entries = self._entries[key][1]
+            entries[:] = [other for other in entries if not entry.covers(other)]
+            entries.append(entry)
+
+    def __len__(self) -> int:
+        return sum(len(entries) for (_key_expressions, entries) in self._entries.values())
+
+
+class CounterexamplePool:
+    """
+    The most recent counterexample models of each frame.
+
+    A model of a check for F_i satisfies the assertions of F_i at the time of the check.
+    As long as no lemma was added to F_i since, it is a counterexample for another check for F_i if it satisfies that check's query,
+    which is decided by evaluating the query in the model, without a solver call.
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self._models: Dict[int, Deque[Tuple[ModelRef, int]]] = dict()
+
+    def lookup(self, frame_index: int, query: BoolRef, frame_version: int) -> Optional[ModelRef]:
+        """
+        Return a model of the frame that satisfies the query, or None.
+
+        :param frame_version: see :py:meth:`InductivenessCache.lookup`
+        """
+        models = self._models.get(frame_index)
+        if not models:
+            return None
+        # Models from before the last change of the frame are outdated for good
+        while models and models[0][1] < frame_version:
+            models.popleft()
+        for (model, _log_watermark) in reversed(models):
+            # Without model completion, the query only evaluates to true if the model determines it
+            if is_true(model.eval(query, model_completion=False)):
+                return model
+        return None
+
+    def add(self, frame_index: int, model: ModelRef, log_watermark: int):
+        """
+        Add a model of a check for the frame, which was made when the lemma log had `log_watermark` entries.
+        """
+        if frame_index not in self._models:
+            self._models[frame_index] = deque(maxlen=self.size)
+        self._models[frame_index].append((model, log_watermark))
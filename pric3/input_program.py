@@ -18,7 +18,7 @@ Expressions are Z3 expressions generated from the PRISM expressions.
 import operator
 from collections import OrderedDict
 from fractions import Fraction
-from typing import Dict, Union
+from typing import Dict, List, Optional, Union
 
 import z3
 from z3 import And, Bool, BoolVal, Int, IntVal, Or, RealVal, Real
@@ -80,6 +80,7 @@ class InputModule:
         boolean_variables (list(InputVariable)): list of all boolean variables.
         variables (dict(str, InputVariable)): dict of variable names to variables.
         commands (list(InputCommand)): list of commands in this module.
+        commands_by_global_index (list(Optional(InputCommand))): the commands indexed by their `global_index`.
     """
     def __init__(self, prism_module: PrismModule):
         # variables are created in two steps:
@@ -96,10 +97,14 @@ class InputModule:
             var._init_bounds(self.variables)
 
         self.commands = [
-            InputCommand(self.variables, command)
-            for command in prism_module.commands
+            InputCommand(self.variables, command, position)
+            for position, command in enumerate(prism_module.commands)
         ]
 
+        self.commands_by_global_index: List[Optional['InputCommand']] = [None] * (max((command.global_index for command in self.commands), default=-1) + 1)
+        for command in self.commands:
+            self.commands_by_global_index[command.global_index] = command
+
     def lookup_variable(self,
                         variable: Union[str, 'InputVariable', PrismVariable]
                         ) -> 'InputVariable':
@@ -170,11 +175,13 @@ class InputCommand:
 
     Attributes:
         global_index (int): an identifier that can be used to find this command from a choice's origin.
+        position (int): the position of this command in the module's list of commands.
         guard (z3.ExprRef): Z3 expression for the command's guard.
         updates (list[InputUpdate]): list of updates in this command.
     """
-    def __init__(self, variables, prism_command: PrismCommand):
+    def __init__(self, variables, prism_command: PrismCommand, position: int):
         self.global_index = prism_command.global_index
+        self.position = position
         self.guard = _translate_expression(variables,
                                            prism_command.guard_expression)
         self.updates = [
@@ -1,25 +1,18 @@
 from pric3.oracles.oracle import Oracle
 
 class ExactOracle(Oracle):
+    def _refines_by_value_iteration(self) -> bool:
+        # the oracle is built by refinement, and value iteration would only approximate the values
+        return False
+
     def initialize(self):
         self.oracle = dict()
-        all_states = set()
-
-        all_states.add(self.state_graph.get_initial_state_id())
-
-
-        #new_states = {succ[0] for state_id in all_states for succ in
-        #              self.state_graph.get_filtered_successors(state_id) if succ[0] != -1}
-
-        new_states = {succ[0] for state_id in all_states for choice in
-                      self.state_graph.get_successors_filtered(state_id).choices for succ in
-                      choice.distribution if succ[0] != -1}
 
-        while not new_states <= all_states:
-           all_states = all_states.union(new_states)
-           new_states = {succ[0] for state_id in all_states for choice in
-                      self.state_graph.get_successors_filtered(state_id).choices for succ in
-                      choice.distribution if succ[0] != -1}
+        state_space = self.state_graph.explore_to_csr()
+        # the oracle states are all states that occur in filtered distributions (plus the initial state)
+        relevant = ~(state_space.goal_mask | state_space.terminal_mask)
+        relevant[0] = True
+        all_states = set(state_space.state_ids[relevant].tolist())
 
         self.refine_oracle(all_states)
 
@@ -1,71 +1,32 @@
-import pickle
-from fractions import Fraction
-from typing import Dict, Set
+from typing import Dict
 
 import z3
-from z3 import RealVal
 
 from pric3.oracles.oracle import Oracle
+from pric3.oracles.oracle_cache import OracleTable
 from pric3.state_graph import StateGraph, StateId
 
-_SerializedData = Dict[str, Fraction]
-
 
 def save_oracle_dict(state_graph: StateGraph,
                      oracle_dict: Dict[StateId, z3.ExprRef],
                      filename="oracle.pr"):
     """
-    Save an oracle's dict to a file.
-    """
-    fd = open(filename, "wb")
-    data: _SerializedData = {
-        str(state_graph.get_state_valuation(state_id)): value.as_fraction()
-        for state_id, value in oracle_dict.items()
-    }
-    pickle.dump(data, fd)
-    fd.close()
-
-
-def _load_oracle_dict(state_graph: StateGraph,
-                      filename="oracle.pr") -> Dict[StateId, z3.ExprRef]:
+    Save an oracle's dict as an :py:class:`pric3.oracles.oracle_cache.OracleTable` to the directory `filename`.
+    An existing oracle in that directory is replaced.
     """
-    Load an oracle's dict from a file.
-
-    Note that the state ids are different on each load!
-    """
-    fd = open(filename, "rb")
-    data: _SerializedData = pickle.load(fd)
-    fd.close()
-
-    oracle: Dict[StateId, z3.ExprRef] = dict()
-
-    to_consider: Set[StateId] = {state_graph.get_initial_state_id()}
-    seen: Set[StateId] = set()
-
-    while len(data) != 0:
-        to_consider = to_consider - seen
-        to_add: Set[StateId] = set()
-
-        for state_id in to_consider:
-            seen.add(state_id)
-
-            state_val_str = str(state_graph.get_state_valuation(state_id))
-            if state_val_str in oracle:
-                oracle[state_id] = RealVal(data[state_val_str])
-                del data[state_val_str]
-
-            to_add = to_add.union({
-                state
-                for state, prob in state_graph.get_successor_distribution(
-                    state_id)
-            })
-
-    return oracle
+    OracleTable.from_oracle(state_graph, oracle_dict).save(filename, replace=True)
 
 
 class FileOracle(Oracle):
     """
-    A static oracle loaded from a file.
+    A static oracle loaded from a file (see `save_oracle_dict`).
+
+    The table is memory-mapped, and the value of a state is only looked up
+    (by the hash of its valuation) when it is first accessed.
+    States that are not in the table get the default value.
     """
     def initialize(self):
-        self.oracle = _load_oracle_dict(self.state_graph)
+        self.oracle = dict()
+        self._table = OracleTable.load(self.settings.oracle_file)
+        if self._table.variables != [var.name for var in self.state_graph.valuation_variables]:
+            raise RuntimeError("Oracle file %s does not match the program's variables." % self.settings.oracle_file)
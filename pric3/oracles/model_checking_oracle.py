@@ -30,14 +30,6 @@ class ModelCheckingOracle(Oracle):
         logger.debug("Initialization done.")
 
     #TODO
-    def refine_oracle(self, visited_states):
-        """
-        Refines the oracle for the states in oracle_states + visited_states
-        :param visited_states:
-        :return:
-        """
-        pass
-    #TODO
     def _ensure_value_in_oracle(self, state_id: StateId):
         state_mapping_bools, state_mapping_ints = self._state_id_to_prism_variable_to_value(state_id)
         expr_manager = self._get_prism_program().expression_manager
@@ -56,7 +48,8 @@ class ModelCheckingOracle(Oracle):
             self.oracle[state_id] = self._from_mc_result_to_z3_ref(cached_res.min)
 
     def _from_mc_result_to_z3_ref(self, val):
-        #TODO super nasty.
+        # Oracle values are not interned in the probability table of the state graph,
+        # which only holds the few distinct transition probabilities, while almost every state has its own value.
         return z3.RealVal(str(val))
 
 
@@ -1,11 +1,15 @@
 from abc import ABC, abstractmethod
 import logging
+import os
 from fractions import Fraction
-from typing import Set, Dict
+from typing import Dict, Optional, Set
 
+import numpy as np
 import z3
 from z3 import Real, RealVal, Solver, Sum, sat, Optimize
 
+from pric3.oracles.oracle_cache import OracleTable, oracle_cache_key
+from pric3.oracles.value_iteration import IncrementalValueIteration, optimistic_upper_bound, rationalize, reachability_boundary, value_iteration
 from pric3.state_graph import StateGraph, StateId
 from pric3.statistics import Statistics
 from pric3.settings import Settings
@@ -14,6 +18,9 @@ from stormpy.storage import PrismModelType
 
 logger = logging.getLogger(__name__)
 
+# The distance of the guessed upper bound to the values computed by value iteration.
+OPTIMISTIC_EPSILON = 1e-6
+
 class Oracle(ABC):
     """
     An oracle is a dict from state_ids to values (not neccessarily probabilities since o.w. the eq system does not always have a solution).
@@ -53,10 +60,10 @@ class Oracle(ABC):
 
         # The way we refine the Oracle depends on the model type
         if model_type == PrismModelType.DTMC:
-            self.refine_oracle = self.refine_oracle_mc
+            self._refine_oracle_by_model = self.refine_oracle_mc
 
         elif model_type == PrismModelType.MDP:
-            self.refine_oracle = self.refine_oracle_mdp
+            self._refine_oracle_by_model = self.refine_oracle_mdp
 
         else:
             raise Exception("Oracle: Unsupported model type")
@@ -66,22 +73,81 @@ class Oracle(ABC):
 
         self.oracle: Dict[StateId, z3.ExprRef] = dict()
 
+        # Oracle values loaded from a file, see initialize_cached and FileOracle.
+        self._table: Optional[OracleTable] = None
+
+        # The solution of earlier refinements by value iteration (see _refine_oracle_by_value_iteration).
+        self._value_iteration = IncrementalValueIteration(epsilon=OPTIMISTIC_EPSILON)
 
         # self.save_oracle_on_disk()
 
     def _ensure_value_in_oracle(self, state_id: StateId):
         """
         Used to override standard behaviour. Takes a state id, ensures that self.oracle contains this value.
+        By default, the value is looked up in `_table` if there is one.
         :param state_id:
         :return:
         """
-        pass
+        self._load_value_from_table(state_id)
 
     def get_oracle_value(self, state_id: StateId) -> z3.ExprRef:
         if state_id not in self.oracle:
             self._ensure_value_in_oracle(state_id)
         return self.oracle.get(state_id, self.default_value)
 
+    def _load_value_from_table(self, state_id: StateId) -> bool:
+        """
+        Look up the state's valuation in `_table` and add its value to the oracle.
+        Return False if there is no table or no such entry.
+        """
+        if self._table is None:
+            return False
+        value = self._table.lookup(self.state_graph.get_state_int_valuation(state_id))
+        if value is None:
+            return False
+        self.oracle[state_id] = RealVal(value)
+        return True
+
+    def initialize_cached(self, cache_directory: str):
+        """
+        Like `initialize`, but use the oracle from the cache in `cache_directory` if there is one (see :py:mod:`pric3.oracles.oracle_cache`).
+        Otherwise, initialize the oracle and store it in the cache.
+
+        Cached values are looked up lazily on the first access of each state.
+        """
+        directory = os.path.join(cache_directory, oracle_cache_key(self.state_graph.input_program, self.settings))
+        initial_state_id = self.state_graph.get_initial_state_id()
+
+        if OracleTable.exists(directory):
+            logger.info("Loading oracle from cache %s", directory)
+            self._table = OracleTable.load(directory)
+            if self._table.variables != [var.name for var in self.state_graph.valuation_variables]:
+                raise RuntimeError("Oracle cache %s does not match the program's variables." % directory)
+            self.oracle = dict()
+            self.oracle_states = {initial_state_id} if self._table.metadata.get("initial_state_is_oracle_state") else set()
+            self.statistics.oracle_cache_status = "hit"
+        else:
+            self.initialize()
+            metadata = {"initial_state_is_oracle_state": initial_state_id in self.oracle_states}
+            OracleTable.from_oracle(self.state_graph, self.oracle, metadata).save(directory)
+            logger.info("Saved oracle to cache %s", directory)
+            self.statistics.oracle_cache_status = "miss"
+
+
+    def refine_oracle(self, visited_states: Set[StateId]) -> Set[StateId]:
+        """
+        Refine the oracle for the oracle states and the visited states with `refine_oracle_mc` or `refine_oracle_mdp`,
+        and return the states for the refutation test.
+        """
+        self._improve_estimates(visited_states)
+        return self._refine_oracle_by_model(visited_states)
+
+    def _improve_estimates(self, visited_states: Set[StateId]):
+        """
+        Called before every refinement. Oracles that estimate their values override this to improve the estimates
+        of the visited states first.
+        """
+        pass
 
     def refine_oracle_mc(self, visited_states: Set[StateId]) -> Set[StateId]:
 
@@ -99,6 +165,9 @@ class Oracle(ABC):
         else:
             self.oracle_states = self.oracle_states.union(visited_states)
 
+        if self._refines_by_value_iteration():
+            return self._refine_oracle_by_value_iteration()
+
         # TODO: A lot of optimization potential
         self.solver.push()
 
@@ -163,6 +232,9 @@ class Oracle(ABC):
         else:
             self.oracle_states = self.oracle_states.union(visited_states)
 
+        if self._refines_by_value_iteration():
+            return self._refine_oracle_by_value_iteration()
+
         # TODO: A lot of optimization potential
         self.solver_mdp.push()
 
@@ -211,6 +283,67 @@ class Oracle(ABC):
             raise RuntimeError("Oracle solver inconsistent.")
 
 
+    def _refines_by_value_iteration(self) -> bool:
+        """
+        Whether the oracle is refined by value iteration instead of exactly, see `settings.oracle_refinement`.
+        Oracles that promise exact values override this.
+        """
+        return self.settings.oracle_refinement == "value_iteration"
+
+    def _refine_oracle_by_value_iteration(self) -> Set[StateId]:
+        """
+        Set the oracle values of all oracle states to (an approximation of) the maximal reachability probabilities
+        in the sub-model consisting of the oracle states. Successors outside of it keep their current oracle value.
+
+        This computes the same values as the exact refinement (up to the approximation),
+        but by value iteration in floating point. If the verification step of optimistic value iteration succeeds,
+        the values are upper bounds. The results are rationalized before they are stored in the oracle.
+
+        The first refinement solves the whole sub-model by vectorized value iteration.
+        Later refinements only add the new oracle states to `_value_iteration`
+        and recompute the values that depend on them (see :py:class:`IncrementalValueIteration`).
+        States that were oracle states in an earlier refinement stay part of the sub-model.
+        """
+        self.statistics.start_oracle_value_iteration_timer()
+
+        new_states = [state_id for state_id in self.oracle_states if state_id not in self._value_iteration]
+        state_space = self.state_graph.states_to_csr(new_states)
+
+        def outside_value(state_id: StateId) -> float:
+            return float(self.get_oracle_value(state_id).as_fraction())
+
+        if len(self._value_iteration) == 0:
+            fixed_mask, fixed_values = reachability_boundary(state_space)
+            for index in np.flatnonzero(~state_space.explored_mask):
+                fixed_values[index] = outside_value(StateId(int(state_space.state_ids[index])))
+
+            result = value_iteration(state_space, fixed_mask, fixed_values)
+            self.statistics.add_oracle_value_iteration_iterations(result.iterations)
+            if not result.converged:
+                logger.warning("Oracle value iteration did not converge after %s iterations.", result.iterations)
+
+            verified = optimistic_upper_bound(state_space, fixed_mask, fixed_values, result.values, OPTIMISTIC_EPSILON) is not None
+            if verified:
+                self.statistics.inc_oracle_upper_bound_verified_counter()
+            self._value_iteration.add_states(state_space, result.values, verified)
+            changed_states = set(new_states)
+        else:
+            self._value_iteration.add_states(state_space)
+            incremental_result = self._value_iteration.solve(outside_value)
+            self.statistics.add_oracle_value_iteration_iterations(incremental_result.sweeps)
+            if incremental_result.verified:
+                self.statistics.inc_oracle_upper_bound_verified_counter()
+            changed_states = incremental_result.changed_states
+
+        # update oracle
+        for state_id in changed_states:
+            self.oracle[state_id] = RealVal(rationalize(self._value_iteration.upper_bound(state_id)))
+
+        logger.info("Refined oracle.")
+
+        self.statistics.stop_oracle_value_iteration_timer()
+        return self.oracle_states
+
     @abstractmethod
     def initialize(self):
         """
@@ -224,7 +357,7 @@ class Oracle(ABC):
         Save this oracle to disk using `save_oracle_dict` from `pric3.oracles.file_oracle`.
         """
         from pric3.oracles.file_oracle import save_oracle_dict
-        save_oracle_dict(self.state_graph, self.oracle)
+        save_oracle_dict(self.state_graph, self.oracle, self.settings.oracle_file)
 
     def _get_prism_program(self):
         return self.state_graph.input_program.prism_program
@@ -0,0 +1,194 @@
+"""
+A persistent, content-addressed cache for oracles, see :py:meth:`pric3.oracles.oracle.Oracle.initialize_cached`.
+
+An oracle is stored as an :py:class:`OracleTable` in a directory whose name is a hash of everything that determines the oracle:
+the program (with constants substituted), the oracle type and its parameters (see :py:func:`oracle_cache_key`).
+
+A table is a handful of `.npy` files which are memory-mapped when they are loaded.
+Loading a table is therefore cheap, and only the parts of the files that are looked up are ever read.
+"""
+
+import hashlib
+import json
+import os
+from fractions import Fraction
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+import z3
+
+from pric3.input_program import InputProgram
+from pric3.settings import Settings
+from pric3.state_graph import StateGraph, StateId
+
+ORACLE_CACHE_SETTINGS = ("oracle_type", "default_oracle_value", "depth_for_partly_solving_lqs", "simulator",
+                         "number_simulations_for_oracle", "max_number_steps_per_simulation", "oracle_refinement",
+                         "simulation_seed", "simulation_state_limit", "simulation_tolerance",
+                         "simulation_walk_budget")
+"""
+The settings that can change the initial oracle.
+"""
+
+CACHEABLE_ORACLE_TYPES = {"perfect", "simulation", "solveeqspartly_exact", "solveeqspartly_inexact"}
+"""
+The oracle types which compute all of their values in `initialize`.
+"""
+
+_FNV_OFFSET = np.uint64(0xcbf29ce484222325)
+_FNV_PRIME = np.uint64(0x100000001b3)
+
+# Values whose numerator or denominator do not fit into an int64 are approximated.
+_MAX_DENOMINATOR = 2**31
+
+
+def oracle_cache_key(input_program: InputProgram, settings: Settings) -> str:
+    """
+    Return a hash of the program and the oracle settings.
+    """
+    digest = hashlib.sha256()
+    digest.update(str(input_program.prism_program).encode())
+    digest.update(str(input_program.prism_goal).encode())
+    parameters = {name: str(getattr(settings, name)) for name in ORACLE_CACHE_SETTINGS}
+    digest.update(json.dumps(parameters, sort_keys=True).encode())
+    return digest.hexdigest()
+
+
+def valuation_keys(valuations: np.ndarray) -> np.ndarray:
+    """
+    Return a 64-bit hash (FNV-1a over the columns) for each row of a two-dimensional int64 array of valuations.
+    """
+    keys = np.full(len(valuations), _FNV_OFFSET, dtype=np.uint64)
+    with np.errstate(over='ignore'):
+        for column in np.ascontiguousarray(valuations.T).view(np.uint64):
+            keys = (keys ^ column) * _FNV_PRIME
+    return keys
+
+
+def _to_int64_fraction(value: Fraction) -> Fraction:
+    if max(abs(value.numerator), value.denominator) >= 2**63:
+        value = value.limit_denominator(_MAX_DENOMINATOR)
+    return value
+
+
+def _remove_table_directory(directory: str):
+    for name in os.listdir(directory):
+        os.remove(os.path.join(directory, name))
+    os.rmdir(directory)
+
+
+class OracleTable:
+    """
+    Oracle values indexed by state valuations.
+    The entries are sorted by a 64-bit hash of the valuations, so a lookup is a binary search.
+
+    Attributes:
+        variables (List[str]): the names of the variables, i.e. the columns of `valuations`.
+        keys (np.ndarray): the sorted hashes of the valuations (uint64, see :py:func:`valuation_keys`).
+        valuations (np.ndarray): the valuation of each entry (int64, one row per entry).
+        numerators (np.ndarray): the numerator of each value (int64).
+        denominators (np.ndarray): the denominator of each value (int64).
+        metadata (Dict[str, Any]): additional data that is saved with the table.
+    """
+
+    _ARRAYS = ("keys", "valuations", "numerators", "denominators")
+
+    def __init__(self, variables: List[str], keys: np.ndarray, valuations: np.ndarray,
+                 numerators: np.ndarray, denominators: np.ndarray, metadata: Optional[Dict[str, Any]] = None):
+        self.variables = variables
+        self.keys = keys
+        self.valuations = valuations
+        self.numerators = numerators
+        self.denominators = denominators
+        self.metadata = metadata or dict()
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    @staticmethod
+    def from_values(variables: List[str], valuations: np.ndarray, values: Sequence[Fraction],
+                    metadata: Optional[Dict[str, Any]] = None) -> 'OracleTable':
+        """
+        Create a table from a two-dimensional array of valuations and the corresponding values.
+        """
+        valuations = np.asarray(valuations, dtype=np.int64).reshape(len(values), len(variables))
+        fractions = [_to_int64_fraction(Fraction(value)) for value in values]
+        keys = valuation_keys(valuations)
+        order = np.argsort(keys, kind='stable')
+        return OracleTable(variables,
+                           keys[order],
+                           valuations[order],
+                           np.array([value.numerator for value in fractions], dtype=np.int64)[order],
+                           np.array([value.denominator for value in fractions], dtype=np.int64)[order],
+                           metadata)
+
+    @staticmethod
+    def from_oracle(state_graph: StateGraph, oracle: Dict[StateId, z3.ExprRef],
+                    metadata: Optional[Dict[str, Any]] = None) -> 'OracleTable':
+        """
+        Create a table from an oracle's dict.
+        """
+        state_ids = list(oracle.keys())
+        valuations = np.array([state_graph.get_state_int_valuation(state_id) for state_id in state_ids], dtype=np.int64)
+        values = [oracle[state_id].as_fraction() for state_id in state_ids]
+        variables = [var.name for var in state_graph.valuation_variables]
+        return OracleTable.from_values(variables, valuations, values, metadata)
+
+    @staticmethod
+    def exists(directory: str) -> bool:
+        return os.path.isfile(os.path.join(directory, "metadata.json"))
+
+    def save(self, directory: str, replace: bool = False):
+        """
+        Save the table to the given directory, which is created atomically.
+        If the directory exists already, it is kept unless `replace` is True.
+        """
+        parent = os.path.dirname(os.path.abspath(directory))
+        os.makedirs(parent, exist_ok=True)
+        temporary = "%s.tmp-%s" % (directory, os.getpid())
+        os.makedirs(temporary, exist_ok=True)
+        for name in OracleTable._ARRAYS:
+            np.save(os.path.join(temporary, name + ".npy"), getattr(self, name))
+        with open(os.path.join(temporary, "metadata.json"), "w", encoding="utf-8") as file:
+            json.dump({"variables": self.variables, "metadata": self.metadata}, file)
+
+        if replace and os.path.isdir(directory):
+            _remove_table_directory(directory)
+        try:
+            os.rename(temporary, directory)
+        except OSError:
+            # another process saved the same table in the meantime
+            _remove_table_directory(temporary)
+
+    @staticmethod
+    def load(directory: str) -> 'OracleTable':
+        """
+        Load a table from the given directory. The arrays are memory-mapped.
+        """
+        with open(os.path.join(directory, "metadata.json"), encoding="utf-8") as file:
+            data = json.load(file)
+        arrays = {name: np.load(os.path.join(directory, name + ".npy"), mmap_mode='r') for name in OracleTable._ARRAYS}
+        return OracleTable(data["variables"], metadata=data["metadata"], **arrays)
+
+    def find(self, valuation: Sequence[int]) -> int:
+        """
+        Return the index of the entry for the given valuation (ordered like `variables`), or -1 if there is none.
+        """
+        row = np.array([valuation], dtype=np.int64)
+        key = valuation_keys(row)[0]
+        index = int(np.searchsorted(self.keys, key))
+        # check all entries with the same hash
+        while index < len(self.keys) and self.keys[index] == key:
+            if np.array_equal(self.valuations[index], row[0]):
+                return index
+            index += 1
+        return -1
+
+    def value(self, index: int) -> Fraction:
+        return Fraction(int(self.numerators[index]), int(self.denominators[index]))
+
+    def lookup(self, valuation: Sequence[int]) -> Optional[Fraction]:
+        """
+        Return the value for the given valuation, or None if there is none.
+        """
+        index = self.find(valuation)
+        return None if index < 0 else self.value(index)
@@ -1,12 +1,86 @@
+from typing import Set
 
-from pric3.oracles.simulator import simulate, simulate_cpp
+import numpy as np
+from z3 import RealVal
+
+from pric3.oracles.simulator import BatchedSimulator, simulate, simulate_batched, simulate_cpp
 from pric3.oracles.oracle import Oracle
+from pric3.state_graph import StateId
+
+# The adaptive mode watches the interval widths of the states up to this distance from the initial state.
+NEAR_INITIAL_STATE_DEPTH = 2
+# Without a `simulation_walk_budget`, the adaptive mode simulates at most this many times `number_simulations_for_oracle` walks in total.
+DEFAULT_WALK_BUDGET_FACTOR = 10
 
 class SimulationOracle(Oracle):
+    """
+    An oracle that estimates reachability probabilities by simulation.
+
+    With the batched simulator and a `simulation_tolerance`, the number of walks is adaptive:
+    we simulate until the confidence intervals of the states near the initial state are narrower than the tolerance
+    (but at most `number_simulations_for_oracle` walks). Whenever the oracle is refined,
+    we first simulate more walks starting in the problematic states.
+    All rounds together simulate at most `simulation_walk_budget` walks.
+    """
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        self._simulator = None
+
     def initialize(self):
         if self.settings.simulator == "cpp":
             self.oracle = simulate_cpp(self.state_graph.input_program.prism_program, self.settings.number_simulations_for_oracle,
                                self.settings.max_number_steps_per_simulation).to_hit_probability_dict()
+        elif self.settings.simulator == "batched" and self.settings.simulation_tolerance is not None:
+            self._simulator = BatchedSimulator(self.state_graph, self.settings.max_number_steps_per_simulation,
+                                               state_limit=self.settings.simulation_state_limit,
+                                               workers=self.settings.simulation_workers,
+                                               seed=self.settings.simulation_seed)
+            watched_states = self._simulator.states_near_initial_state(NEAR_INITIAL_STATE_DEPTH)
+            widths = self._simulator.run_adaptive(watched_states, self.settings.simulation_tolerance, self._walks_for_round())
+            self._record_interval_widths(watched_states, widths)
+            self.oracle = self._simulator.to_result().to_hit_probability_dict()
+        elif self.settings.simulator == "batched":
+            self.oracle = simulate_batched(self.state_graph, self.settings.number_simulations_for_oracle,
+                                           self.settings.max_number_steps_per_simulation,
+                                           state_limit=self.settings.simulation_state_limit,
+                                           workers=self.settings.simulation_workers,
+                                           seed=self.settings.simulation_seed).to_hit_probability_dict()
         else:
             self.oracle = simulate(self.state_graph, self.settings.number_simulations_for_oracle,
                                    self.settings.max_number_steps_per_simulation).to_hit_probability_dict()
+
+    def _walks_for_round(self) -> int:
+        """
+        Return how many walks the next adaptive round may simulate, within the walk budget.
+        """
+        budget = self.settings.simulation_walk_budget
+        if budget is None:
+            budget = DEFAULT_WALK_BUDGET_FACTOR * self.settings.number_simulations_for_oracle
+        samples = 0 if self._simulator is None else self._simulator.samples
+        return max(0, min(self.settings.number_simulations_for_oracle, budget - samples))
+
+    def _improve_estimates(self, visited_states: Set[StateId]):
+        """
+        In adaptive mode, simulate walks from the given states until their intervals are narrow enough
+        (or the walk budget is used up) and update the estimates of all states whose counters changed.
+        """
+        simulator = self._simulator
+        if simulator is not None and self._walks_for_round() > 0:
+            state_indices = simulator.state_space.state_indices
+            watched_states = simulator.estimable_states(
+                np.array(sorted(state_indices[state_id] for state_id in visited_states if state_id in state_indices), dtype=np.int64))
+            if len(watched_states) > 0:
+                previous_visits = simulator.visits.copy()
+                widths = simulator.run_adaptive(watched_states, self.settings.simulation_tolerance, self._walks_for_round(),
+                                                start_states=watched_states)
+                self._record_interval_widths(watched_states, widths)
+
+                changed_states = np.flatnonzero(simulator.visits != previous_visits)
+                for state_id, (hits, visits) in simulator.to_result(changed_states).items():
+                    if state_id not in self.oracle_states:
+                        self.oracle[state_id] = RealVal(hits / visits)
+
+    def _record_interval_widths(self, watched_states: np.ndarray, widths: np.ndarray):
+        state_ids = self._simulator.state_space.state_ids[watched_states].tolist()
+        self.statistics.set_simulation_interval_widths(self._simulator.samples, dict(zip(state_ids, widths.tolist())))
@@ -1,13 +1,21 @@
+import logging
 import random
-from fractions import Fraction
-from typing import Dict, List, Set, Tuple, Union
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple, Union
 
+import numpy as np
 from z3 import ExprRef, RealVal
 
 import stormpy
-from pric3.state_graph import Probability, StateGraph, StateId
+from pric3.probability_table import ProbabilityTable
+from pric3.state_graph import ExplicitStateSpace, Probability, StateGraph, StateId
 from stormpy import PrismProgram
 
+logger = logging.getLogger(__name__)
+
+# The quantile of the standard normal distribution for 95% confidence intervals.
+WILSON_Z = 1.959963984540054
+
 StateStatsSource = Dict[StateId, Tuple[int, int]]
 """
 Input format for a SimulationResult.
@@ -26,6 +34,12 @@ class SimulationResult:
                 hits += 1
             self._state_stats[state] = (hits, visits + 1)
 
+    def merge(self, other: 'SimulationResult'):
+        """Add the hit/visit counters of another result to this one."""
+        for state, (other_hits, other_visits) in other._state_stats.items():
+            (hits, visits) = self._state_stats.get(state, (0, 0))
+            self._state_stats[state] = (hits + other_hits, visits + other_visits)
+
     def to_hit_probability_dict(self) -> Dict[StateId, ExprRef]:
         """Return the hit probability for each state."""
         return {
@@ -33,6 +47,10 @@ class SimulationResult:
             for state, (hits, visits) in self._state_stats.items()
         }
 
+    def items(self):
+        """Iterate over pairs of states and their (hits, visits) counters."""
+        return self._state_stats.items()
+
 
 def simulate_cpp(prism_program: PrismProgram, total_samples: int,
                  max_steps: int) -> SimulationResult:
@@ -67,20 +85,260 @@ def simulate(state_graph: StateGraph, total_samples: int,
                 break
 
             succs = state_graph.get_successor_distribution(state)
-            state = _sample_from_distribution(succs)
+            state = _sample_from_distribution(succs, state_graph.probabilities)
 
     return result
 
 
-def _sample_from_distribution(dist: List[Tuple[StateId, Probability]]
+class _WalkTables(NamedTuple):
+    """
+    The parts of an ExplicitStateSpace that are needed to simulate walks, in a form that is cheap to send to worker processes.
+
+    Attributes:
+        transition_pointers (np.ndarray): the transitions of the state with local index `r` are `transition_pointers[r]` to `transition_pointers[r + 1] - 1`.
+        successors (np.ndarray): the local index of the successor of each transition.
+        sampling_keys (np.ndarray): for each transition, the local index of its state plus the cumulative probability
+            of the state's transitions up to and including this one. The last key of a state is exactly `state + 1`.
+        goal_mask (np.ndarray): goal states.
+        stop_mask (np.ndarray): terminal states and frontier states, i.e. states where a walk ends without reaching the goal.
+        frontier_mask (np.ndarray): frontier states. Walks that end in a frontier state are discarded.
+    """
+    transition_pointers: np.ndarray
+    successors: np.ndarray
+    sampling_keys: np.ndarray
+    goal_mask: np.ndarray
+    stop_mask: np.ndarray
+    frontier_mask: np.ndarray
+
+
+def _walk_tables(state_space: ExplicitStateSpace) -> _WalkTables:
+    if np.any(np.diff(state_space.row_pointers) > 1):
+        raise Exception("simulate_batched: nondeterminism!")
+
+    # Every state has at most one choice, so the transitions of a state are the transitions of its choice.
+    choices_per_state = state_space.row_pointers
+    transition_pointers = state_space.choice_pointers[choices_per_state]
+    transition_states = np.repeat(np.arange(state_space.number_of_states, dtype=np.int64), np.diff(transition_pointers))
+
+    cumulative = np.cumsum(state_space.probabilities)
+    offsets = np.concatenate(([0.0], cumulative))[transition_pointers[:-1]]
+    cumulative_per_state = cumulative - offsets[transition_states]
+    # Make sure that rounding errors do not leave a gap at the end of a distribution.
+    last_transitions = transition_pointers[1:][np.diff(transition_pointers) > 0] - 1
+    cumulative_per_state[last_transitions] = 1.0
+
+    frontier_mask = ~state_space.explored_mask
+    return _WalkTables(transition_pointers=transition_pointers,
+                       successors=state_space.successors,
+                       sampling_keys=transition_states + cumulative_per_state,
+                       goal_mask=state_space.goal_mask,
+                       stop_mask=state_space.terminal_mask | frontier_mask,
+                       frontier_mask=frontier_mask)
+
+
+def _simulate_walks(tables: _WalkTables, start_states: np.ndarray, total_samples: int, max_steps: int, batch_size: int,
+                    seed: np.random.SeedSequence) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Simulate `total_samples` walks, `batch_size` walks at a time. Walk `i` starts in the state `start_states[i % len(start_states)]`.
+    Return the hit and visit counters of all states (indexed by local index).
+    """
+    rng = np.random.default_rng(seed)
+    number_of_states = len(tables.goal_mask)
+    hits = np.zeros(number_of_states, dtype=np.int64)
+    visits = np.zeros(number_of_states, dtype=np.int64)
+
+    for batch_start in range(0, total_samples, batch_size):
+        walks = min(batch_size, total_samples - batch_start)
+        current = start_states[np.arange(batch_start, batch_start + walks) % len(start_states)]
+        alive = np.arange(walks, dtype=np.int64)
+        visited_walks = []
+        visited_states = []
+        outcome = np.zeros(walks, dtype=np.int8) # 0: discarded, 1: hit goal, 2: did not hit goal
+
+        for _ in range(max_steps + 1):
+            if len(alive) == 0:
+                break
+            visited_walks.append(alive)
+            visited_states.append(current)
+
+            is_goal = tables.goal_mask[current]
+            is_stopped = tables.stop_mask[current]
+            outcome[alive[is_goal]] = 1
+            outcome[alive[is_stopped & ~tables.frontier_mask[current]]] = 2
+
+            running = ~(is_goal | is_stopped)
+            alive = alive[running]
+            current = current[running]
+            transitions = np.searchsorted(tables.sampling_keys, current + rng.random(len(current)), side='right')
+            # `current + random` may be rounded up to `current + 1`
+            transitions = np.minimum(transitions, tables.transition_pointers[current + 1] - 1)
+            current = tables.successors[transitions]
+
+        # each walk counts every state at most once
+        visited_walks_array = np.concatenate(visited_walks)
+        visited_states_array = np.concatenate(visited_states)
+        finished = outcome[visited_walks_array] != 0
+        pairs = np.unique(visited_walks_array[finished] * number_of_states + visited_states_array[finished])
+        pair_walks = pairs // number_of_states
+        pair_states = pairs % number_of_states
+        visits += np.bincount(pair_states, minlength=number_of_states)
+        hits += np.bincount(pair_states[outcome[pair_walks] == 1], minlength=number_of_states)
+
+    return hits, visits
+
+
+class BatchedSimulator:
+    """
+    Simulates many walks at once with NumPy on the state space explored by `StateGraph.explore_to_csr`,
+    and accumulates the hit/visit counters of all walks.
+
+    Walks that take more than `max_steps` steps or leave the explored state space are discarded.
+
+    Attributes:
+        state_space (ExplicitStateSpace): the explored state space.
+        hits (np.ndarray): the number of walks that visited a state and then reached a goal state (indexed by local index).
+        visits (np.ndarray): the number of (not discarded) walks that visited a state (indexed by local index).
+        samples (int): the number of walks simulated so far.
+    """
+
+    def __init__(self, state_graph: StateGraph, max_steps: int, *,
+                 state_limit: Optional[int] = None,
+                 workers: int = 1,
+                 seed: Optional[int] = None,
+                 batch_size: int = 4096):
+        """
+        Parameters:
+            state_limit: the maximum number of states to explore.
+            workers: the number of processes to distribute the walks to.
+            seed: the seed for the random number generators. Each worker and each call of `run` gets an independent stream derived from it.
+            batch_size: the number of walks that are simulated at once (per worker).
+        """
+        self.state_space = state_graph.explore_to_csr(state_limit)
+        self.max_steps = max_steps
+        self.workers = workers
+        self.batch_size = batch_size
+        self._tables = _walk_tables(self.state_space)
+        self._seed_sequence = np.random.SeedSequence(seed)
+        self.hits = np.zeros(self.state_space.number_of_states, dtype=np.int64)
+        self.visits = np.zeros(self.state_space.number_of_states, dtype=np.int64)
+        self.samples = 0
+
+    def run(self, total_samples: int, start_states: Optional[np.ndarray] = None):
+        """
+        Simulate `total_samples` walks. The walks start in the given states (local indices) in turn, by default in the initial state.
+        """
+        if start_states is None:
+            start_states = np.zeros(1, dtype=np.int64)
+        workers = self.workers
+        seeds = self._seed_sequence.spawn(workers)
+        samples_per_worker = [total_samples // workers + (1 if worker < total_samples % workers else 0) for worker in range(workers)]
+
+        if workers == 1:
+            results = [_simulate_walks(self._tables, start_states, total_samples, self.max_steps, self.batch_size, seeds[0])]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = [executor.submit(_simulate_walks, self._tables, start_states, samples, self.max_steps, self.batch_size, worker_seed)
+                           for samples, worker_seed in zip(samples_per_worker, seeds)]
+                results = [future.result() for future in futures]
+
+        for hits, visits in results:
+            self.hits += hits
+            self.visits += visits
+        self.samples += total_samples
+        logger.info("Simulated %s walks in %s states.", total_samples, self.state_space.number_of_states)
+
+    def run_adaptive(self, watched_states: np.ndarray, tolerance: float, max_samples: int,
+                     start_states: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Simulate walks in rounds until the Wilson score intervals of all watched states (local indices)
+        are narrower than `tolerance`, or until `max_samples` walks were simulated.
+        Return the final interval widths of the watched states.
+        """
+        round_size = self.batch_size * self.workers
+        simulated = 0
+        widths = self.interval_widths(watched_states)
+        while simulated < max_samples and len(widths) > 0 and np.max(widths) >= tolerance:
+            samples = min(round_size, max_samples - simulated)
+            self.run(samples, start_states)
+            simulated += samples
+            widths = self.interval_widths(watched_states)
+        return widths
+
+    def interval_widths(self, states: np.ndarray) -> np.ndarray:
+        """
+        Return the widths of the Wilson score intervals for the hit probabilities of the given states (local indices).
+        """
+        return wilson_interval_width(self.hits[states], self.visits[states])
+
+    def states_near_initial_state(self, depth: int) -> np.ndarray:
+        """
+        Return the local indices of the states at distance at most `depth` from the initial state
+        (see `estimable_states`).
+        """
+        tables = self._tables
+        near = {0}
+        layer = {0}
+        for _ in range(depth):
+            layer = {succ for state in layer
+                     for succ in tables.successors[tables.transition_pointers[state]:tables.transition_pointers[state + 1]].tolist()} - near
+            near |= layer
+        return self.estimable_states(np.array(sorted(near), dtype=np.int64))
+
+    def estimable_states(self, states: np.ndarray) -> np.ndarray:
+        """
+        Return the given states (local indices) without goal, terminal and frontier states
+        (whose hit probabilities are known or cannot be estimated).
+        """
+        tables = self._tables
+        return states[~(tables.goal_mask[states] | tables.stop_mask[states])]
+
+    def to_result(self, states: Optional[np.ndarray] = None) -> SimulationResult:
+        """
+        Return the counters of the given states (local indices), by default of all visited states.
+        """
+        if states is None:
+            states = np.flatnonzero(self.visits)
+        state_ids = self.state_space.state_ids[states].tolist()
+        return SimulationResult({
+            state_id: (hit_count, visit_count)
+            for state_id, hit_count, visit_count in zip(state_ids, self.hits[states].tolist(), self.visits[states].tolist())
+            if visit_count > 0
+        })
+
+
+def wilson_interval_width(hits: np.ndarray, visits: np.ndarray, z: float = WILSON_Z) -> np.ndarray:
+    """
+    Return the widths of the Wilson score intervals for hit probabilities (1 if there are no visits).
+
+    >>> wilson_interval_width(np.array([50, 0]), np.array([100, 0])).round(4)
+    array([0.1923, 1.    ])
+    """
+    visits = visits.astype(np.float64)
+    safe_visits = np.maximum(visits, 1.0)
+    ratio = hits / safe_visits
+    widths = 2 * z * np.sqrt(ratio * (1 - ratio) / safe_visits + z * z / (4 * safe_visits * safe_visits)) / (1 + z * z / safe_visits)
+    return np.where(visits > 0, widths, 1.0)
+
+
+def simulate_batched(state_graph: StateGraph, total_samples: int, max_steps: int, *,
+                     state_limit: Optional[int] = None,
+                     workers: int = 1,
+                     seed: Optional[int] = None,
+                     batch_size: int = 4096) -> SimulationResult:
+    """
+    Like `simulate`, but simulates many walks at once with a :py:class:`BatchedSimulator`.
+    """
+    simulator = BatchedSimulator(state_graph, max_steps, state_limit=state_limit, workers=workers, seed=seed, batch_size=batch_size)
+    simulator.run(total_samples)
+    return simulator.to_result()
+
+
+def _sample_from_distribution(dist: List[Tuple[StateId, Probability]], probabilities: ProbabilityTable
                               ) -> StateId:
     """Choose a random state from a distribution according to the probabilities."""
     rnd = random.random()
     for state, prob in dist:
-        # TODO: This is dirty
-        prob = Fraction( # type:ignore
-            str(prob.numerator) + "/" + # type:ignore
-            str(prob.denominator)) # type:ignore
+        prob = probabilities.to_fraction(prob) # type:ignore
         if rnd <= prob:
             return state
         rnd -= prob
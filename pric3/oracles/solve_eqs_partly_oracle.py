@@ -1,30 +1,23 @@
 
-from pric3.oracles.simulator import simulate, simulate_cpp
-from fractions import Fraction
+import logging
+from typing import List
+
 from pric3.oracles.oracle import Oracle
-from stormpy.storage import PrismModelType
+from pric3.oracles.value_iteration import reachability_boundary, value_iteration
+from pric3.state_graph import StateId
 from z3 import RealVal
-import numpy as np
+
+logger = logging.getLogger(__name__)
 
 
 class SolveEQSPartlyOracle(Oracle):
     def initialize(self):
-        states = set()
         self.oracle = dict()
 
-        states.add(self.state_graph.get_initial_state_id())
-
-        new_states = {succ[0] for state_id in states for succ in
-                      self.state_graph.get_filtered_successors(state_id) if succ[0] != -1}
-
         limit = self.settings.depth_for_partly_solving_lqs
-        i=0
-
-        while (not new_states <= states) and len(states)< limit:
-            i=i+1
-            states = states.union(new_states)
-            new_states = {succ[0] for state_id in states for succ in
-                          self.state_graph.get_filtered_successors(state_id) if succ[0] != -1}
+        ordered_states = self._states_to_solve(limit)
+        states = set(ordered_states)
+        self._state_space = self.state_graph.states_to_csr(ordered_states)
 
         print("Limit reached. len if states: %s" % len(states))
 
@@ -33,13 +26,30 @@ class SolveEQSPartlyOracle(Oracle):
             self._create_exact_arithmetic_oracle(states)
 
         elif self.settings.oracle_type == "solveeqspartly_inexact":
+            self._create_inexact_arithmetic_oracle(states)
 
-            # If we check an MDP, then this would require to solve an LP. TODO
-            if self.model_type == PrismModelType.MDP:
-                raise NotImplementedError("Ineaxt Partly-Solving-EQS-Oracle is not implemented.")
-
-            else:
-                self._create_inexact_arithmetic_oracle(states)
+    def _states_to_solve(self, limit: int) -> List[StateId]:
+        """
+        Return the states that get an equation, in breadth-first order: starting with the initial state,
+        whole layers of successors (that are neither goal nor terminal states) are added until there are at least `limit` states.
+        """
+        initial_state_id = self.state_graph.get_initial_state_id()
+        states = [initial_state_id]
+        known = {initial_state_id}
+        layer = [initial_state_id]
+        while len(layer) > 0 and len(states) < limit:
+            # the successors of the layer follow the layer in the state space
+            layer_space = self.state_graph.states_to_csr(layer)
+            relevant = ~(layer_space.goal_mask | layer_space.terminal_mask)
+            relevant[:len(layer)] = False
+            layer = [succ_id for succ_id in layer_space.state_ids[relevant].tolist() if succ_id not in known]
+            known.update(layer)
+            states.extend(layer)
+        return states
+
+    def _refines_by_value_iteration(self) -> bool:
+        # the exact oracle is built by refinement, and value iteration would only approximate the values
+        return self.settings.oracle_type != "solveeqspartly_exact" and super()._refines_by_value_iteration()
 
     def _create_exact_arithmetic_oracle(self, states):
 
@@ -55,55 +65,25 @@ class SolveEQSPartlyOracle(Oracle):
         :return:
         """
 
+        if self._load_value_from_table(state_id):
+            return
+
         #Design choice:
         self.oracle[state_id] = RealVal(self.settings.default_oracle_value)
 
 
     def _create_inexact_arithmetic_oracle(self, states):
+        """
+        Approximate the (maximal) reachability probabilities of the given states by value iteration
+        on the sub-model of these states. Successors outside of it have value 0.
+        For DTMCs, this is the solution of the equation system.
+        """
+        state_space = self._state_space
+        fixed_mask, fixed_values = reachability_boundary(state_space)
+        result = value_iteration(state_space, fixed_mask, fixed_values)
+        if not result.converged:
+            logger.warning("Value iteration did not converge after %s iterations.", result.iterations)
 
-        # Numpy needs a coefficient list. Build a map from indices to states.
-        index_to_state = dict()
-        state_to_index = dict()
-
-        rhs_list = []
-        coeff_list = []  # A list of lists, each element is a coefficient list
-
-        i = 0
-        for state in states:
-            index_to_state[i] = state
-            state_to_index[state] = i
-            i = i+1
-
-            succ_dist = self.state_graph.get_filtered_successors(state)
-
-            # The rhs of the equation for the state is -(sum of probs leading to a goal state)
-            rhs = sum([float(prob) for state_id, prob in succ_dist if state_id == -1])
-            rhs_list.append(-rhs)
-
-            coeff_list.append([0 for j in range(0, len(states))])
-
-
-        # Now go through every state again and build its coefficient list
-        for state in states:
-             # First set the coefficient of state to -1
-            coeff_list[state_to_index[state]][state_to_index[state]] = -1
-
-            succ_dist = self.state_graph.get_filtered_successors(state)
-
-            #Now add the probability for every non-target succ to its coefficient
-            for succ_id, prob in succ_dist:
-                if succ_id != -1 and succ_id in states:
-                    coeff_list[state_to_index[state]][state_to_index[succ_id]] += float(prob)
-
-
-        coeff_matrix = np.array(coeff_list)
-        rhs = np.array(rhs_list)
-
-        solution = np.linalg.solve(coeff_matrix, rhs)
-        #print(solution[state_to_index[self.state_graph.get_initial_state_id()]])
-
-        solution = solution.astype(float)
-        
         # Update oracle
         for state in states:
-            self.oracle[state] = RealVal(solution[state_to_index[state]])
+            self.oracle[state] = RealVal(float(result.values[state_space.state_indices[state]]))
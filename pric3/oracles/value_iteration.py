@@ -0,0 +1,384 @@
+"""
+Numerical computation of (maximal) reachability probabilities on an :py:class:`pric3.state_graph.ExplicitStateSpace`.
+
+The values of some states are fixed (see :py:func:`reachability_boundary`): goal states have value one,
+terminal states value zero and frontier states (whose successors are unknown) a given value.
+The values of all other states are the least fixed point of
+
+.. math:: x_s = \\max_{c \\in Choices(s)} \\sum_{s'} P(s, c, s') \\cdot x_{s'}
+
+which we approximate by Jacobi-style value iteration starting from below.
+Every iteration is a handful of vectorized NumPy operations, i.e. linear in the number of transitions.
+An upper bound can be obtained with the verification step of optimistic value iteration (:py:func:`optimistic_upper_bound`).
+
+:py:class:`IncrementalValueIteration` solves the same equations for a growing set of states
+and only recomputes the values that are affected by newly added states.
+"""
+
+from fractions import Fraction
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Set, Tuple
+
+import numpy as np
+
+from pric3.state_graph import ExplicitStateSpace, StateId
+
+DEFAULT_TOLERANCE = 1e-10
+DEFAULT_MAX_ITERATIONS = 100000
+DEFAULT_MAX_DENOMINATOR = 10**9
+
+
+class ValueIterationResult(NamedTuple):
+    """
+    Attributes:
+        values (np.ndarray): the computed value of every state (float64, indexed by local index).
+        iterations (int): the number of iterations that were done.
+        converged (bool): whether the values changed by less than the tolerance in the last iteration.
+    """
+    values: np.ndarray
+    iterations: int
+    converged: bool
+
+
+def reachability_boundary(state_space: ExplicitStateSpace, frontier_value: float = 0.0) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Return `(fixed_mask, fixed_values)` for reachability of the goal states:
+    goal states have value one, terminal states value zero and frontier states the value `frontier_value`.
+    """
+    frontier_mask = ~state_space.explored_mask
+    fixed_mask = state_space.goal_mask | state_space.terminal_mask | frontier_mask
+    fixed_values = np.zeros(state_space.number_of_states, dtype=np.float64)
+    fixed_values[frontier_mask] = frontier_value
+    fixed_values[state_space.goal_mask] = 1.0
+    return fixed_mask, fixed_values
+
+
+class _BellmanOperator:
+    """
+    Precomputed index arrays for applying the maximal reachability equations to a vector of values.
+    """
+
+    def __init__(self, state_space: ExplicitStateSpace, fixed_mask: np.ndarray, fixed_values: np.ndarray):
+        self.state_space = state_space
+        has_choices = np.diff(state_space.row_pointers) > 0
+        free_mask = ~fixed_mask
+        # States without choices that are not fixed can never reach a goal state and keep value zero.
+        self.base_values = np.where(fixed_mask, fixed_values, 0.0)
+        self.choice_starts = state_space.row_pointers[:-1][has_choices]
+        self.updated_states = np.flatnonzero(has_choices & free_mask)
+        self.selected_rows = free_mask[has_choices]
+        self.transition_choices = state_space.transition_choices()
+
+    def apply(self, values: np.ndarray) -> np.ndarray:
+        """
+        Return the new values of `updated_states`.
+        """
+        state_space = self.state_space
+        choice_values = np.bincount(self.transition_choices,
+                                    weights=state_space.probabilities * values[state_space.successors],
+                                    minlength=state_space.number_of_choices)
+        return np.maximum.reduceat(choice_values, self.choice_starts)[self.selected_rows]
+
+
+def value_iteration(state_space: ExplicitStateSpace,
+                    fixed_mask: np.ndarray,
+                    fixed_values: np.ndarray,
+                    *,
+                    initial_values: Optional[np.ndarray] = None,
+                    tolerance: float = DEFAULT_TOLERANCE,
+                    max_iterations: int = DEFAULT_MAX_ITERATIONS) -> ValueIterationResult:
+    """
+    Iterate the maximal reachability equations until the values change by less than `tolerance`.
+
+    Parameters:
+        state_space: the state space.
+        fixed_mask: the states whose values are not iterated (bool).
+        fixed_values: the values of the fixed states. Entries of the other states are ignored.
+        initial_values: the start values for the iteration. Defaults to zero, which yields the least fixed point.
+            Start values that are below the least fixed point (e.g. the result of an earlier iteration
+            on a smaller state space) lead to the same result.
+        tolerance: the convergence threshold on the maximum norm of the difference of two iterations.
+        max_iterations: the maximum number of iterations.
+    """
+    bellman = _BellmanOperator(state_space, fixed_mask, fixed_values)
+    updated_states = bellman.updated_states
+
+    values = bellman.base_values.copy()
+    if initial_values is not None:
+        values[updated_states] = initial_values[updated_states]
+
+    if len(updated_states) == 0:
+        return ValueIterationResult(values, 0, True)
+
+    for iteration in range(1, max_iterations + 1):
+        state_values = bellman.apply(values)
+        difference = np.max(np.abs(state_values - values[updated_states]))
+        values[updated_states] = state_values
+        if difference < tolerance:
+            return ValueIterationResult(values, iteration, True)
+
+    return ValueIterationResult(values, max_iterations, False)
+
+
+def optimistic_upper_bound(state_space: ExplicitStateSpace,
+                           fixed_mask: np.ndarray,
+                           fixed_values: np.ndarray,
+                           values: np.ndarray,
+                           epsilon: float) -> Optional[np.ndarray]:
+    """
+    The verification step of optimistic value iteration: guess the upper bound `values + epsilon`
+    (for the states that are not fixed) and return it if one application of the equations does not increase it.
+    By Knaster-Tarski, the guess is then an upper bound of the least fixed point.
+    Otherwise, return None.
+    """
+    bellman = _BellmanOperator(state_space, fixed_mask, fixed_values)
+    upper = bellman.base_values.copy()
+    upper[bellman.updated_states] = values[bellman.updated_states] + epsilon
+    if len(bellman.updated_states) > 0 and np.any(bellman.apply(upper) > upper[bellman.updated_states]):
+        return None
+    return upper
+
+
+def rationalize(value: float, max_denominator: int = DEFAULT_MAX_DENOMINATOR) -> Fraction:
+    """
+    Return a fraction with a small denominator that is close to the given float.
+
+    >>> rationalize(0.33333333333)
+    Fraction(1, 3)
+    """
+    return Fraction(value).limit_denominator(max_denominator)
+
+
+class IncrementalResult(NamedTuple):
+    """
+    Attributes:
+        changed_states (Set[StateId]): the states whose values were recomputed.
+        sweeps (int): the number of Gauss-Seidel sweeps that were done.
+        verified (bool): whether the verification step of optimistic value iteration succeeded for all recomputed states.
+    """
+    changed_states: Set[StateId]
+    sweeps: int
+    verified: bool
+
+
+class IncrementalValueIteration:
+    """
+    Maximal reachability values for a growing set of *member* states, referred to by their state ids.
+
+    Successors that are not members are *outside* states whose values are given by the caller.
+    After adding new members, :py:meth:`solve` only recomputes the values that can change:
+    those of the new members and of all members that can reach a new member.
+    These are processed strongly connected component by component in reverse topological order,
+    with Gauss-Seidel sweeps that start from the previous values.
+    New members start at zero. If all previous values are below the least fixed point
+    (e.g. if outside states had value zero before they became members), the result is the least fixed point.
+
+    If `epsilon` is given, the values of each recomputed component are checked to be upper bounds after raising them by epsilon.
+    The raised values are only returned by :py:meth:`upper_bound`, `values` stays the approximation of the least fixed point,
+    so that later calls of :py:meth:`solve` do not start above it (and do not add epsilon again).
+
+    Attributes:
+        values (Dict[StateId, float]): the current value of every member.
+    """
+
+    def __init__(self,
+                 tolerance: float = DEFAULT_TOLERANCE,
+                 max_sweeps: int = DEFAULT_MAX_ITERATIONS,
+                 epsilon: Optional[float] = None):
+        """
+        Parameters:
+            tolerance: the convergence threshold of the Gauss-Seidel sweeps in one component.
+            max_sweeps: the maximum number of sweeps per component.
+            epsilon: if not None, try to raise the values of each component by epsilon to an upper bound
+                (see :py:func:`optimistic_upper_bound`).
+        """
+        self.tolerance = tolerance
+        self.max_sweeps = max_sweeps
+        self.epsilon = epsilon
+        self.values: Dict[StateId, float] = dict()
+
+        # For every member, the list of its choices. A choice consists of the probability to reach a goal state
+        # and the distribution over the other successors (terminal states are left out).
+        self._choices: Dict[StateId, List[Tuple[float, List[Tuple[StateId, float]]]]] = dict()
+        # Maps members and outside states to the members that have them as a successor.
+        self._predecessors: Dict[StateId, Set[StateId]] = dict()
+        # Members that were added since the last call to solve.
+        self._pending: Set[StateId] = set()
+        # Members whose value plus epsilon is known to be an upper bound.
+        self._verified: Set[StateId] = set()
+
+    def __contains__(self, state_id: StateId) -> bool:
+        return state_id in self._choices
+
+    def __len__(self) -> int:
+        return len(self._choices)
+
+    def add_states(self, state_space: ExplicitStateSpace, values: Optional[np.ndarray] = None, verified: bool = False):
+        """
+        Add all states of the state space that are not frontier states as members (see :py:meth:`StateGraph.states_to_csr`),
+        except for those that are members already.
+
+        If `values` (indexed by local index) are given, they are taken as the solution for the new members.
+        Otherwise, the new members are solved in the next call of :py:meth:`solve`.
+        `verified` tells whether the given values plus epsilon are upper bounds (see :py:func:`optimistic_upper_bound`).
+        """
+        state_ids = state_space.state_ids.tolist()
+        row_pointers = state_space.row_pointers.tolist()
+        choice_pointers = state_space.choice_pointers.tolist()
+        successors = state_space.successors.tolist()
+        probabilities = state_space.probabilities.tolist()
+        goal_mask = state_space.goal_mask.tolist()
+        terminal_mask = state_space.terminal_mask.tolist()
+        explored_mask = state_space.explored_mask.tolist()
+
+        for index, state_id in enumerate(state_ids):
+            if not explored_mask[index] or state_id in self._choices:
+                continue
+
+            choices: List[Tuple[float, List[Tuple[StateId, float]]]] = []
+            if goal_mask[index]:
+                choices.append((1.0, []))
+            for choice in range(row_pointers[index], row_pointers[index + 1]):
+                goal_probability = 0.0
+                distribution = []
+                for transition in range(choice_pointers[choice], choice_pointers[choice + 1]):
+                    succ_index = successors[transition]
+                    if goal_mask[succ_index]:
+                        goal_probability += probabilities[transition]
+                    elif not terminal_mask[succ_index]:
+                        succ_id = state_ids[succ_index]
+                        distribution.append((succ_id, probabilities[transition]))
+                        self._predecessors.setdefault(succ_id, set()).add(state_id)
+                choices.append((goal_probability, distribution))
+            self._choices[state_id] = choices
+
+            if values is None:
+                self._pending.add(state_id)
+            else:
+                self.values[state_id] = float(values[index])
+                if verified:
+                    self._verified.add(state_id)
+
+    def upper_bound(self, state_id: StateId) -> float:
+        """
+        Return the value of the member, plus epsilon if that is known to be an upper bound.
+        """
+        if self.epsilon is not None and state_id in self._verified:
+            return self.values[state_id] + self.epsilon
+        return self.values[state_id]
+
+    def solve(self, outside_value: Callable[[StateId], float]) -> IncrementalResult:
+        """
+        Recompute the values of all members that are affected by the members added since the last call.
+
+        Parameters:
+            outside_value: returns the value of a state that is not a member. It is called at most once per state.
+        """
+        affected: Set[StateId] = set()
+        stack = list(self._pending)
+        while stack:
+            state_id = stack.pop()
+            if state_id not in affected:
+                affected.add(state_id)
+                stack.extend(self._predecessors.get(state_id, ()))
+        self._pending.clear()
+
+        outside_values: Dict[StateId, float] = dict()
+
+        def bellman(state_id: StateId, upper: bool = False) -> float:
+            best = 0.0
+            for goal_probability, distribution in self._choices[state_id]:
+                total = goal_probability
+                for succ_id, prob in distribution:
+                    value = self.values.get(succ_id)
+                    if value is None:
+                        value = outside_values.get(succ_id)
+                        if value is None:
+                            value = outside_value(succ_id)
+                            outside_values[succ_id] = value
+                    elif upper:
+                        value = self.upper_bound(succ_id)
+                    total += prob * value
+                if total > best:
+                    best = total
+            return best
+
+        sweeps = 0
+        verified = True
+        for component in self._components(affected):
+            for state_id in component:
+                self.values.setdefault(state_id, 0.0)
+                self._verified.discard(state_id)
+
+            is_trivial = len(component) == 1 and component[0] not in self._successors(component[0], affected)
+            for _ in range(self.max_sweeps):
+                sweeps += 1
+                difference = 0.0
+                for state_id in component:
+                    value = bellman(state_id)
+                    difference = max(difference, abs(value - self.values[state_id]))
+                    self.values[state_id] = value
+                if is_trivial or difference < self.tolerance:
+                    break
+
+            if self.epsilon is not None:
+                self._verified.update(component)
+                if any(bellman(state_id, upper=True) > self.upper_bound(state_id) for state_id in component):
+                    verified = False
+                    self._verified.difference_update(component)
+
+        return IncrementalResult(affected, sweeps, verified and self.epsilon is not None)
+
+    def _successors(self, state_id: StateId, states: Set[StateId]) -> Set[StateId]:
+        return {succ_id for _, distribution in self._choices[state_id] for succ_id, _ in distribution if succ_id in states}
+
+    def _components(self, states: Set[StateId]) -> List[List[StateId]]:
+        """
+        Return the strongly connected components of the subgraph induced by the given members
+        in reverse topological order (Tarjan's algorithm, without recursion).
+        """
+        index: Dict[StateId, int] = dict()
+        lowlink: Dict[StateId, int] = dict()
+        stack: List[StateId] = []
+        on_stack: Set[StateId] = set()
+        components: List[List[StateId]] = []
+        # the depth-first search stack of states with their remaining successors
+        work: List[Tuple[StateId, Iterator[StateId]]] = []
+
+        def visit(state_id: StateId):
+            index[state_id] = lowlink[state_id] = len(index)
+            stack.append(state_id)
+            on_stack.add(state_id)
+            work.append((state_id, iter(self._successors(state_id, states))))
+
+        for root in states:
+            if root in index:
+                continue
+            visit(root)
+            while work:
+                state_id, successors = work[-1]
+                descended = False
+                for succ_id in successors:
+                    if succ_id not in index:
+                        visit(succ_id)
+                        descended = True
+                        break
+                    if succ_id in on_stack:
+                        lowlink[state_id] = min(lowlink[state_id], index[succ_id])
+                if descended:
+                    continue
+
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    lowlink[parent] = min(lowlink[parent], lowlink[state_id])
+                if lowlink[state_id] == index[state_id]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member == state_id:
+                            break
+                    components.append(component)
+
+        return components
@@ -0,0 +1,173 @@
+"""
+Run PrIC3 with several settings in parallel and take the first definitive answer.
+
+The workers are forked from the main process after the model was parsed, so they share the parsed program.
+As soon as one worker proves or refutes the property, the others are terminated.
+Every worker sends its statistics back (terminated workers from their SIGTERM handler),
+and they are merged into one :py:class:`pric3.statistics.Statistics` record with :py:meth:`pric3.statistics.Statistics.merge_portfolio`.
+"""
+
+import json
+import logging
+import multiprocessing
+import multiprocessing.connection
+import os
+import signal
+from fractions import Fraction
+from typing import Any, Dict, List, Optional, cast
+
+import stormpy
+
+from pric3.input_program import InputProgram, set_global_expression_int_to_real
+from pric3.pric3 import PrIC3
+from pric3.settings import Settings
+from pric3.smt_program import SmtProgram
+from pric3.statistics import Statistics
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PORTFOLIO: List[Dict[str, Any]] = [
+    dict(forall_mode="macro", generalize=False),
+    dict(forall_mode="globals", generalize=True, int_to_real=True, generalization_method="Hybrid", max_num_ctgs=1),
+    dict(forall_mode="globals", generalize=True, int_to_real=True, generalization_method="Linear", max_num_ctgs=1),
+    dict(forall_mode="globals", generalize=True, int_to_real=True, generalization_method="Polynomial", max_num_ctgs=1),
+    dict(forall_mode="globals", generalize=True, int_to_real=True, generalization_method="Hybrid", max_num_ctgs=0),
+    dict(forall_mode="globals", generalize=True, int_to_real=True, generalization_method="Linear", max_num_ctgs=0),
+    dict(forall_mode="globals", generalize=True, int_to_real=True, generalization_method="Polynomial", max_num_ctgs=0),
+    dict(forall_mode="globals", generalize=True, int_to_real=True, generalization_method="Hybrid", max_num_ctgs=2),
+    dict(forall_mode="globals", generalize=True, int_to_real=True, generalization_method="Linear", max_num_ctgs=2),
+    dict(forall_mode="globals", generalize=True, int_to_real=True, generalization_method="Polynomial", max_num_ctgs=2),
+]
+"""
+The configurations of `benchmarks/rwth_cluster/generate_jobs.py`, as changes to the command-line settings.
+"""
+
+# How long to wait for the statistics of a terminated worker.
+_TERMINATE_TIMEOUT = 10
+
+
+def load_portfolio(filename: str) -> List[Dict[str, Any]]:
+    """
+    Load a portfolio from a JSON file containing a list of objects, which map setting names to values.
+    """
+    with open(filename) as file:
+        configs = json.load(file)
+    for config in configs:
+        if "default_oracle_value" in config:
+            config["default_oracle_value"] = Fraction(config["default_oracle_value"])
+    return configs
+
+
+def _send_result(connection, result: Optional[bool], statistics: Statistics):
+    # a SIGTERM must not interrupt sending the result
+    signal.pthread_sigmask(signal.SIG_BLOCK, {signal.SIGTERM})
+    statistics.pric3solverstats.materialize_queries()
+    connection.send((result, statistics))
+    connection.close()
+
+
+def _run_worker(index: int, storm_program: stormpy.PrismProgram, input_program: InputProgram, threshold: Fraction,
+                settings: Settings, args: Dict[str, Any], connection):
+    statistics = Statistics({**args, "portfolio_worker": index})
+
+    def sigterm_handler(signum, frame):
+        statistics.status = "sigterm"
+        _send_result(connection, None, statistics)
+        os._exit(1)
+
+    signal.signal(signal.SIGTERM, sigterm_handler)
+
+    result = None
+    try:
+        set_global_expression_int_to_real(settings.int_to_real)
+        if input_program is None:
+            input_program = InputProgram(storm_program)
+        smt_program = SmtProgram(input_program, settings.get_smt_settings())
+        result = PrIC3(smt_program, threshold, settings, statistics).run()
+        statistics.status = "done"
+    except MemoryError:
+        statistics.status = "oom"
+    except Exception as e:  # pylint: disable=broad-except
+        # one configuration crashing must not abort the whole portfolio
+        logger.exception("Portfolio worker %s failed", index)
+        statistics.status = "error: %s" % e
+    _send_result(connection, result, statistics)
+
+
+def run_portfolio(storm_program: stormpy.PrismProgram, input_program: InputProgram, threshold: Fraction,
+                  settings: Settings, configs: List[Dict[str, Any]], statistics: Statistics) -> Optional[bool]:
+    """
+    Run one worker process per configuration and return the first definitive answer,
+    or None if no worker returned one.
+
+    Parameters:
+        storm_program: the parsed program
+        input_program: the program as parsed with `settings.int_to_real`; it is reused by the workers with the same setting
+        threshold: the threshold
+        settings: the settings that are changed by each configuration
+        configs: the changes to the settings for each worker
+        statistics: the statistics to merge the statistics of the workers into
+    """
+    for config in configs:
+        unknown_settings = set(config.keys()) - set(Settings._fields)
+        if unknown_settings:
+            raise ValueError("Unknown settings in portfolio: %s" % ", ".join(sorted(unknown_settings)))
+
+    context = multiprocessing.get_context("fork")
+    processes = []
+    connections: Dict[multiprocessing.connection.Connection, int] = dict()
+    for index, config in enumerate(configs):
+        worker_settings = settings._replace(**config)
+        shared_input_program = input_program if worker_settings.int_to_real == settings.int_to_real else None
+        receiver, sender = context.Pipe(duplex=False)
+        process = context.Process(target=_run_worker,
+                                  args=(index, storm_program, shared_input_program, threshold, worker_settings,
+                                        statistics.args, sender))
+        process.start()
+        sender.close()
+        processes.append(process)
+        connections[receiver] = index
+        logger.info("Started portfolio worker %s (pid %s) with %s", index, process.pid, config)
+
+    results: List[Optional[bool]] = [None] * len(configs)
+    worker_statistics: List[Optional[Statistics]] = [None] * len(configs)
+
+    def receive(receiver):
+        index = connections.pop(receiver)
+        try:
+            results[index], worker_statistics[index] = receiver.recv()
+        except EOFError:
+            logger.info("Portfolio worker %s exited without a result", index)
+
+    winner = None
+    try:
+        while connections and winner is None:
+            # wait returns the connections it was given
+            for ready in multiprocessing.connection.wait(list(connections.keys())):
+                receiver = cast(multiprocessing.connection.Connection, ready)
+                index = connections[receiver]
+                receive(receiver)
+                if results[index] is not None and winner is None:
+                    winner = index
+    finally:
+        # also reached if the main process is terminated itself
+        for index in connections.values():
+            processes[index].terminate()
+        for receiver in list(connections.keys()):
+            if receiver.poll(_TERMINATE_TIMEOUT):
+                receive(receiver)
+            else:
+                connections.pop(receiver)
+        for process in processes:
+            process.join(_TERMINATE_TIMEOUT)
+            if process.is_alive():
+                process.kill()
+
+    statistics.merge_portfolio(configs, worker_statistics, winner)
+    if winner is None:
+        logger.critical("No portfolio worker returned a result.")
+        return None
+
+    logger.critical("Portfolio worker %s with %s: property %s.", winner, configs[winner],
+                    "holds" if results[winner] else "does not hold")
+    return results[winner]
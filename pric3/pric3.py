@@ -6,11 +6,16 @@ import z3
 from z3 import (BoolRef, Q, Real, RealVal, Solver, Sum, Z3_mk_ge, sat, And, Implies)
 
 from pric3.settings import Settings
+from pric3.frames import FrameStore
 from pric3.pric3_solver import PrIC3Solver
-from pric3.proof_obligations.obligation_queue import ObligationQueue
+from pric3.proof_obligations.obligation_history import ObligationHistory
+from pric3.proof_obligations.obligation_queue import pop_obligations_at_minimum_frame
+from pric3.proof_obligations.obligation_store import ObligationStore
 from pric3.proof_obligations.repushing_obligation_queue import RepushingObligationQueue
 from pric3.proof_obligations.naive_repushing_obligation_queue import NaiveRepushingObligationQueue
+from pric3.proof_obligations.prioritized_obligation_queue import PrioritizedObligationQueue
 from pric3.smt_program import SmtProgram, ForallMode
+from pric3.solver_pool import SolverPool
 from pric3.state_graph import StateGraph
 from pric3.state_probability_generator import StateProbabilityGenerator
 from pric3.statistics import Statistics
@@ -24,6 +29,13 @@ logger = logging.getLogger(__name__)
 
 z3.Z3_DEBUG = False
 
+# Fewer candidates are not worth sending to the solver pool.
+MIN_PARALLEL_CANDIDATES = 8
+
+# Outcomes of PrIC3._process_obligation
+_REFUTED = "refuted"
+_RESET = "reset"
+
 class PrIC3:
     """
     An instance of the PrIC3 algorithm.
@@ -53,18 +65,9 @@ class PrIC3:
             raise
 
         # Also initializes F_0
-        self.p_solver = PrIC3Solver(smt_program, self.statistics.pric3solverstats, settings.store_smt_calls, settings)
-
-        if not isinstance(threshold, Fraction):
-            raise TypeError("Threshold must be a fraction")
-
-        if not (threshold >= 0 and threshold <= 1):
-            raise ValueError("Threshold must be a probability")
-
-        self.threshold_frac = threshold
+        self.p_solver = settings.get_pric3_solver_class()(smt_program, self.statistics.pric3solverstats, settings.store_smt_calls, settings)
 
-        # convert given threshold to a z3 rational
-        self.threshold_z3 = Q(threshold.numerator, threshold.denominator)
+        self.set_threshold(threshold)
 
         # obtain initial state
         self.initial_state_id = self.state_graph.get_initial_state_id()
@@ -74,17 +77,48 @@ class PrIC3:
         # Intialize solver for refutation check
         self.refutation_solver = Solver()
 
+        # The smallest probabilities of obligations, shared by all obligation queues until the frames are reset
+        self.obligation_store = ObligationStore()
+
         logger.debug("Initialize state probability generator...")
-        self._state_probability_generator = StateProbabilityGenerator(self.state_graph, self.statistics, self.settings, self.input_program.model_type)
+        self._state_probability_generator = StateProbabilityGenerator(self.state_graph, self.statistics, self.settings, self.input_program.model_type, self.obligation_store)
 
         logger.debug("Initialize generalizer...")
-        self._generalizer = Generalizer(self.state_graph, self.smt_program, self.p_solver, self.statistics, self.settings)
+        self._generalizer = Generalizer(self.state_graph, self.smt_program, self.p_solver, self.statistics, self.settings, self.obligation_store)
+
+        self._solver_pool = SolverPool(settings.solver_workers) if settings.solver_workers > 1 else None
 
-    def run(self) -> bool:
+    def set_threshold(self, threshold: Fraction):
+        """
+        Set the threshold for the next call of :py:meth:`run`.
+        The state graph, the oracle and the statistics are kept, see :py:class:`pric3.threshold_sweep.ThresholdSweep`.
+        """
+        if not isinstance(threshold, Fraction):
+            raise TypeError("Threshold must be a fraction")
+
+        if not (threshold >= 0 and threshold <= 1):
+            raise ValueError("Threshold must be a probability")
+
+        self.threshold_frac = threshold
+
+        # convert given threshold to a z3 rational
+        self.threshold_z3 = Q(threshold.numerator, threshold.denominator)
+
+    def run(self, seed_frames: bool = False) -> bool:
+        """
+        Check the property for the current threshold.
+
+        If this instance was run before, the frames of the previous run are discarded unless `seed_frames` is set.
+        Seeding is only sound if the threshold did not decrease since the previous run.
+        """
         self.statistics.start_total_timer()
 
         logger.info("Start IC3")
-        result = self._run_ic3()
+        try:
+            result = self._run_ic3(seed_frames)
+        finally:
+            if self._solver_pool is not None:
+                self._solver_pool.shutdown()
         if result:
             logger.critical("Property holds.")
         else:
@@ -94,25 +128,24 @@ class PrIC3:
         if hasattr(self, 'inductiveness_verified'):
             self.statistics.inductiveness_verified = self.inductiveness_verified
         self._state_probability_generator.finalize_statistics()
+        self.statistics.pric3solverstats.materialize_queries()
         return result
 
     def reset(self):
-        self.p_solver = PrIC3Solver(self.smt_program, self.statistics.pric3solverstats, self.settings.store_smt_calls, self.settings)
+        self.p_solver = self.settings.get_pric3_solver_class()(self.smt_program, self.statistics.pric3solverstats, self.settings.store_smt_calls, self.settings)
 
         self.k = 1
 
         # Add new solver for Frame F_1
         self.p_solver.add_new_solver()
 
-        # store frames explicitly as sets of assertions
-        self.frames = [None, set()]
-
-        # Store pairs (state_id,   z3_check_arg_list (see relative inductiveness calls in pric3_solver) as tuple,  probability expressions as string   ) for efficient membership check
-        self.frames_explicit_set = [None, set()]
+        # store frames explicitly as sets of lemma ids
+        self.frame_store = FrameStore()
+        self.frame_store.add_frame()
 
-        RepushingObligationQueue.smallest_probability_for_state = dict()
-        ObligationQueue.smallest_probability_for_state = dict()
+        self.obligation_store.reset()
 
+        self._generalizer.p_solver = self.p_solver
         self._generalizer.reset()
 
 
@@ -120,22 +153,31 @@ class PrIC3:
         # self.state_graph.to_dot(1000000)
         self.statistics.print_statistics()
 
-    def _run_ic3(self):
+    def _run_ic3(self, seed_frames=False):
         """
 
+        :param seed_frames: continue with the frames of the previous run
         :return: True if property holds
         """
 
-        self.k = 1
+        if not hasattr(self, "frame_store"):
+            self.k = 1
 
-        # Add new solver for Frame F_1
-        self.p_solver.add_new_solver()
+            # Add new solver for Frame F_1
+            self.p_solver.add_new_solver()
+
+            # store frames explicitly as sets of lemma ids
+            self.frame_store = FrameStore()
+            self.frame_store.add_frame()
 
-        # store frames explicitly as sets of assertions
-        self.frames = [None, set()]
+        elif seed_frames:
+            # Every lemma is an upper bound that is inductive relative to the previous frame, which does not depend on the threshold.
+            # The lemmas for the initial state are bounded by the previous threshold, so the IC3-Invariants hold for any larger one.
+            # The smallest probabilities of obligations, however, were derived from the previous threshold.
+            self.obligation_store.reset()
 
-        # Store pairs (state_id, expressions) for efficient membership check
-        self.frames_explicit_set = [None, set()]
+        else:
+            self.reset()
 
         while True:
             refute = self.strengthen()
@@ -152,8 +194,7 @@ class PrIC3:
             # Initialize new Solver for F_{k+1}
             self.p_solver.add_new_solver()
 
-            self.frames.append(set())
-            self.frames_explicit_set.append(set())
+            self.frame_store.add_frame()
 
             # Increase counter
             self.k = self.k + 1
@@ -167,11 +208,11 @@ class PrIC3:
                 #logger.info("Inductive invariant:")
                 #logger.info(self.p_solver.solvers[self.inductive_frame_index].sexpr())
                 #logger.info("")
-                #logger.info(self.frames_explicit_set[self.inductive_frame_index])
+                #logger.info(list(self.frame_store.lemmas_of(self.inductive_frame_index)))
                 #print(self.p_solver.solvers[self.inductive_frame_index].sexpr())
 
                 #print("Final Frames:")
-                #print(self.frames_explicit_set)
+                #print(self.frame_store.lemmas)
 
 
                 if self.settings.check_inductiveness_if_property_holds:
@@ -192,7 +233,7 @@ class PrIC3:
 
 
             #print('Frames after iteration %s' % (self.k-1))
-            #print(self.frames_explicit_set)
+            #print(self.frame_store.lemmas)
             #print("")
             #print("")
 
@@ -213,14 +254,13 @@ class PrIC3:
         """
 
         :return: True if the property is refuted and False if it was possible to establish the IC3-Invariants
-                      for all frames in self.frames
+                      for all frames in self.frame_store
         """
 
         # Initialize obligation queue with the first proof obligation: Proof that the probability to reach a goal
         # state from the initial state in at most k steps is at most lambda
 
-        Q = self.obligation_queue_class()
-        Q.push_obligation(self.k, self.initial_state_id, self.threshold_z3, {self.initial_state_id})
+        Q = self._new_obligation_queue()
 
         #visited_states = Counter()
 
@@ -228,96 +268,164 @@ class PrIC3:
         while not Q.is_empty():
             # While Q is not empty
 
-            # Pop obligation with smallest index
-            (i, s, delta, history) = Q.pop_obligation()
-            self.statistics.add_considered_states(s)
-            #visited_states.update({s})
-            state_valuation = self.state_graph.get_state_valuation(s)
+            if self.settings.batch_strengthen and self._solver_pool is not None:
+                # Pop all obligations with the smallest index and check them in parallel
+                obligations = pop_obligations_at_minimum_frame(Q)
+                check_results = self._check_obligations(obligations)
+            else:
+                # Pop obligation with smallest index
+                obligations = [Q.pop_obligation()]
+                check_results = [None]
 
-            if i == 0:
-                # Need to repair F_0. Either refute or repair oracle and reset queue.
-                logger.debug("Need to repair F_0.")
+            for (i, s, delta, history), check_result in zip(obligations, check_results):
+                outcome = self._process_obligation(Q, i, s, delta, history, check_result)
 
-                states_for_refutation_test = self._state_probability_generator.refine_oracle(history)
+                if outcome in (_REFUTED, _RESET) and isinstance(Q, PrioritizedObligationQueue):
+                    self.statistics.add_obligation_queue_saved_checks(self.settings.obligation_queue_class, Q.checks_saved_by_order(i, s))
 
-                if self.check_refutation(states_for_refutation_test):
+                if outcome == _REFUTED:
+                    self.statistics.add_obligation_queue_counts(Q.merged_pushes, Q.get_length())
                     self.statistics.stop_total_timer()
                     return True
 
-                self.reset()
+                if outcome == _RESET:
+                    # The remaining obligations of the batch are discarded with the queue
+                    self.statistics.add_obligation_queue_counts(Q.merged_pushes, Q.get_length())
+                    Q = self._new_obligation_queue()
+                    #visited_states = Counter()
+                    break
 
-                Q = self.obligation_queue_class()
-                Q.push_obligation(self.k, self.initial_state_id, self.threshold_z3, {self.initial_state_id})
-                #visited_states = Counter()
+        self.statistics.add_obligation_queue_counts(Q.merged_pushes, 0)
+        return False
 
-            else:
-                # check Whetehr \Phi(F_{i-1})[s] > delta, i.e., whether updating frames would violate relative inductiveness.
+    def _new_obligation_queue(self):
+        """
+        Create an obligation queue containing the obligation for the initial state, the threshold and frame k.
+        """
+        if issubclass(self.obligation_queue_class, PrioritizedObligationQueue):
+            Q = self.obligation_queue_class(self.obligation_store, self._state_probability_generator.oracle, self.settings)
+        else:
+            Q = self.obligation_queue_class(self.obligation_store)
+        Q.push_obligation(self.k, self.initial_state_id, self.threshold_z3, ObligationHistory(self.initial_state_id))
+        return Q
 
-                state_args = state_valuation_to_z3_check_args(state_valuation)
+    def _check_obligations(self, obligations):
+        """
+        Check the relative inductiveness of obligations with the same frame index i > 0 against F_{i-1} on the solver pool.
 
-                check_result = self.p_solver.is_relative_inductive(i - 1, state_args, delta)
-                relative_inductive =  check_result == True
+        :return: For each obligation, None if it has to be checked by :py:meth:`_process_obligation` itself,
+                 otherwise a pair of the check result (True, or the chosen command of a counterexample) and the lemma log watermark of the check.
+        """
+        i = obligations[0][0]
+        if i == 0 or len(obligations) < MIN_PARALLEL_CANDIDATES:
+            return [None] * len(obligations)
+
+        watermark = self.p_solver.lemma_log_watermark()
+        results = self.p_solver.check_relative_inductive_batch(
+            i - 1, [(self.state_graph.get_state_args(s), delta) for (_i, s, delta, _history) in obligations],
+            self._solver_pool, self.smt_program.chosen_command)
+        self.statistics.add_batched_obligation_checks(len(obligations))
+        return [(result, watermark) for result in results]
+
+    def _process_obligation(self, Q, i, s, delta, history, check_result=None):
+        """
+        Process one obligation popped from the queue Q.
 
-                if not relative_inductive:
+        :param check_result: the result of :py:meth:`_check_obligations` for this obligation, or None.
+        :return: _REFUTED if the property is refuted, _RESET if the oracle was refined and the frames were reset, otherwise None.
+        """
+        self.statistics.add_considered_states(s)
+        #visited_states.update({s})
+        state_valuation = self.state_graph.get_state_valuation(s)
 
-                    # Get responsible command from solver model
-                    chosen_command = check_result[self.smt_program.chosen_command]
+        if i == 0:
+            # Need to repair F_0. Either refute or repair oracle and reset queue.
+            logger.debug("Need to repair F_0.")
 
-                    # Get probabilities for refining successors of s and action chosen_command in F_{i-1}
-                    (possible,
-                        dict_of_probs_for_succs) = self.get_probabilities(
-                            s, chosen_command, delta, history)
+            states_for_refutation_test = self._state_probability_generator.refine_oracle(history.to_set())
 
-                    if possible:
-                        # Push obligation for every (non-target) successor
-                        for succ_id in dict_of_probs_for_succs:
-                            Q.push_obligation(i - 1, succ_id,
-                                            dict_of_probs_for_succs[succ_id], history.union({succ_id}))
+            if self.check_refutation(states_for_refutation_test):
+                return _REFUTED
 
-                        # The relative_inductiveness_check for this obligation is necessarry iff state s is nondeterministic (i.e., if it has more than one enabled action)
-                        Q.push_obligation(i, s, delta, history)
+            self.reset()
+            return _RESET
 
-                    else:
+        # check Whetehr \Phi(F_{i-1})[s] > delta, i.e., whether updating frames would violate relative inductiveness.
 
-                        # It is not possible to get such probabilities, refine oracle and reset queue
-                        logger.debug("Not possible: getProbabilities(%s, %s)." %
-                                (state_valuation, delta))
-                        logger.debug(history)
-                        states_for_refutation_test = self._state_probability_generator.refine_oracle(history)
+        state_args = self.state_graph.get_state_args(s)
 
-                        if self.check_refutation(states_for_refutation_test):
-                            self.statistics.stop_total_timer()
-                            return True
+        if check_result is not None:
+            (check_result, watermark) = check_result
+            # A result checked in parallel stays valid if it is inductive, since F_{i-1} only became stronger since.
+            # A counterexample is only used if F_{i-1} did not change, which is what the sequential check would see.
+            # Counterexamples are z3 values, so results are compared to True by identity (z3 overloads == and !=).
+            if check_result is not True and self.p_solver.frame_changed_since(i - 1, watermark):
+                self.statistics.inc_batched_obligation_rechecks()
+                check_result = None
 
-                        self.reset()
-                        Q = self.obligation_queue_class()
+        if check_result is None:
+            check_result = self.p_solver.is_relative_inductive(i - 1, state_args, delta)
+            if check_result is not True:
+                # Get responsible command from solver model
+                check_result = check_result[self.smt_program.chosen_command]
 
-                        Q.push_obligation(
-                            self.k, self.initial_state_id, self.threshold_z3, {self.initial_state_id})
+        relative_inductive = check_result is True
 
-                # If relative_inductiveness check was not necessary or if updating frames does not violate relative inductiveness,
-                # we update the frames
-                # We do not check 'relative inductiveness check necessary' since this is unsound in the presence of cycles
-                if relative_inductive:
+        if not relative_inductive:
 
-                    if i < self.k and (type(Q) == RepushingObligationQueue or type(Q) == NaiveRepushingObligationQueue):
-                        Q.repush_obligation(i+1, s, delta, history)
+            chosen_command = check_result
 
-                    if self.settings.generalize:
-                        # We want to generalize the constraint (s,delta) and this generalization must
-                        # be inductive relative to F_{i-1}
-                        generalization_result = self._generalizer.generalize(i-1, s, delta)
+            # Get probabilities for refining successors of s and action chosen_command in F_{i-1}
+            (possible,
+                dict_of_probs_for_succs) = self.get_probabilities(
+                    s, chosen_command, delta, history)
 
-                    else:
-                        generalization_result = [(state_args, delta)]
+            if possible:
+                # Push obligation for every (non-target) successor
+                for succ_id in dict_of_probs_for_succs:
+                    Q.push_obligation(i - 1, succ_id,
+                                    dict_of_probs_for_succs[succ_id], history.extend(succ_id))
 
-                    self.update_frames(i, s, state_valuation, generalization_result)
+                # The relative_inductiveness_check for this obligation is necessarry iff state s is nondeterministic (i.e., if it has more than one enabled action)
+                Q.push_obligation(i, s, delta, history)
 
-                    # Consider this state for caching "States of the same kind) (generalization)
-                    if self.settings.generalize:
-                        self._generalizer.consider_state(s)
+            else:
 
-        return False
+                # It is not possible to get such probabilities, refine oracle and reset queue
+                logger.debug("Not possible: getProbabilities(%s, %s)." %
+                        (state_valuation, delta))
+                logger.debug(history)
+                states_for_refutation_test = self._state_probability_generator.refine_oracle(history.to_set())
+
+                if self.check_refutation(states_for_refutation_test):
+                    return _REFUTED
+
+                self.reset()
+                return _RESET
+
+        # If relative_inductiveness check was not necessary or if updating frames does not violate relative inductiveness,
+        # we update the frames
+        # We do not check 'relative inductiveness check necessary' since this is unsound in the presence of cycles
+        if relative_inductive:
+
+            if i < self.k and isinstance(Q, (RepushingObligationQueue, NaiveRepushingObligationQueue)):
+                Q.repush_obligation(i+1, s, delta, history)
+
+            if self.settings.generalize:
+                # We want to generalize the constraint (s,delta) and this generalization must
+                # be inductive relative to F_{i-1}
+                generalization_result = self._generalizer.generalize(i-1, s, delta)
+
+            else:
+                generalization_result = [(state_args, delta)]
+
+            self.update_frames(i, s, state_valuation, generalization_result)
+
+            # Consider this state for caching "States of the same kind) (generalization)
+            if self.settings.generalize:
+                self._generalizer.consider_state(s)
+
+        return None
 
 
 
@@ -339,35 +447,29 @@ class PrIC3:
         # print("Res : %s" % generalization_result)
         for (state_args_of_gen, probability_expression) in state_args_probability_expression_pairs:
 
-            frame_applied = self.smt_program.env.apply_to_state_valuation(self.smt_program.frame, state_valuation)
             state_args_as_tuple = tuple(state_args_of_gen)
 
-            # frame_applied = self.smt_program.env.apply_to_state_args(self.smt_program.frame,
-            # state_args_of_gen)
-
-            for j in range(up_to_frame_index, 0, -1):
-                # TODO: as string is faster than anything else, but still is super slow.
-                # TODO: use ordering between frames to reduce lookups?
-                # Note: As soon as we have a generalization, the deltas will be polynomials in the Z3 (program) variables.
-                if (state_id, state_args_as_tuple, probability_expression) not in self.frames_explicit_set[j]:
+            # Note: As soon as we have a generalization, the deltas will be polynomials in the Z3 (program) variables.
+            lemma_id = self.frame_store.intern(state_id, state_args_as_tuple, probability_expression,
+                                               lambda: self._frame_assertion(state_valuation, state_args_as_tuple, probability_expression))
 
-                    if self.smt_program.settings.forall_mode != ForallMode.FORALL_GLOBALS:
-                        to_add = self._ge_no_coerce(probability_expression, frame_applied)
-                        self.p_solver.add_assertion(j, to_add)
+            # The lemma is stored once with its level. It is new to the frames old_level + 1, ..., up_to_frame_index.
+            old_level = self.frame_store.add(up_to_frame_index, lemma_id)
+            self.p_solver.add_lemma(self.frame_store.lemmas[lemma_id].assertion, old_level, up_to_frame_index)
 
-                    else:
-                        state_constr = And(state_args_as_tuple)
-                        to_add = Implies(state_constr,
-                                         self._ge_no_coerce(probability_expression, frame_applied))
-                        #print("Adding assertion: %s" % self.smt_program.get_frame_leq_constraint_from_state_args(
-                        #    state_args_of_gen, probability_expression))
-                        self.p_solver.add_assertion(j, self.smt_program.get_frame_leq_constraint_from_state_args(
-                            state_args_of_gen, probability_expression))
+    def _frame_assertion(self, state_valuation, state_args_as_tuple, probability_expression):
+        """
+        Create the assertion that is added to a frame's solver for the lemma (state_args_as_tuple, probability_expression).
+        """
+        if self.smt_program.settings.forall_mode != ForallMode.FORALL_GLOBALS:
+            frame_applied = self.smt_program.env.apply_to_state_valuation(self.smt_program.frame, state_valuation)
+            return self._ge_no_coerce(probability_expression, frame_applied)
 
-                    self.frames[j].add(to_add)
+        else:
+            #print("Adding assertion: %s" % self.smt_program.get_frame_leq_constraint_from_state_args(
+            #    state_args_of_gen, probability_expression))
+            return self.smt_program.get_frame_leq_constraint_from_state_args(state_args_as_tuple, probability_expression)
 
-                    # TODO: What if frame_explicit contains "generalized" assertions?
-                    self.frames_explicit_set[j].add((state_id, state_args_as_tuple, probability_expression))
 
     def _ge_no_coerce(self, left, right):
         # TODO: add assertions for noncoerce
@@ -391,12 +493,13 @@ class PrIC3:
         """
         Propagation Phase of IC3.
 
+        Only the lemmas in F_i \\ F_{i+1} are candidates for propagation from F_i to F_{i+1}. The frame store maintains
+        exactly these differences, so equality of consecutive frames is an emptiness check.
+
         :return: True iff after propagation there is an i \in {1, ...,k-1} such that F_i = F_{i+1}
         """
 
-        # TODO: What if frame_explicit contains "generalized" assertions?
-        # TODO: The deltas in frames_explicit are strings. Make this more efficient?
-        # TODO: Use "probability_expression encoding" of frames. Obviates need to go through all assertions of a frame
+        # TODO: What if the frame store contains "generalized" assertions?
 
         self.statistics.start_propagation_timer()
 
@@ -404,52 +507,39 @@ class PrIC3:
         for i in range(1, self.k):
 
             if self.settings.propagate:
-                # For every assertion A in F_i ...
-                for (s, state_args_as_tuple, probability_expression) in self.frames_explicit_set[i]:
-                    #... which is not in F_{i+1}
-                    if (s, state_args_as_tuple, probability_expression) not in self.frames_explicit_set[i+1]:
-                        state_valuation = self.state_graph.get_state_valuation(s)
-
-                        # If adding A to F_{i+1} does not violate inductiveness ...
-                        #state_args = state_valuation_to_z3_check_args(state_valuation)
-                        #print('TRY to Propagate (%s, %s) to F_%s' % (state_args_as_tuple, probability_expression, i + 1))
-                        if self.p_solver.is_relative_inductive(i, state_args_as_tuple, probability_expression) == True:
-                            # Add it to F_{i+1}
-
-                            frame_applied = self.smt_program.env.apply_to_state_valuation(self.smt_program.frame, state_valuation)
-
-                            to_add = self._ge_no_coerce(probability_expression, frame_applied)
-
-                            #print('Propagate (%s, %s) to F_%s' % (state_args_as_tuple, to_add, i+1))
-
-                            if self.smt_program.settings.forall_mode != ForallMode.FORALL_GLOBALS:
-                                self.p_solver.add_assertion(i+1, to_add)
-
-                            else:
-                                state_constr = And(state_args_as_tuple)
-                                to_add = Implies(state_constr,
-                                                 self._ge_no_coerce(probability_expression, frame_applied))
-
-                                self.p_solver.add_assertion(i+1,
-                                                            self.smt_program.get_frame_leq_constraint_from_state_args(
-                                                                state_args_as_tuple, probability_expression))
-                            self.frames[i+1].add(to_add)
-
-                            #TODO: What if frame_explicit contains "generalized" assertions?
-                            self.frames_explicit_set[i+1].add((s, state_args_as_tuple, probability_expression))
-
-                            self.statistics.inc_propagation_counter()
-
-
-            if len(self.frames[i]) == len(self.frames[i+1]):
-                if self.frames[i] == self.frames[i+1]:
-                    self.inductive_frame_index = i
-                    self.statistics.stop_propagation_timer()
-                    return True
+                candidates = self.frame_store.only_in(i)
+
+                # The candidates are all checked against F_i, which does not change while propagating to F_{i+1}.
+                # So they can be checked in parallel. The results are applied in order.
+                inductive = None
+                if self._solver_pool is not None and len(candidates) >= MIN_PARALLEL_CANDIDATES:
+                    inductive = self.p_solver.are_relative_inductive(
+                        i, [(self.frame_store.lemmas[lemma_id].state_args, self.frame_store.lemmas[lemma_id].probability_expression) for lemma_id in candidates],
+                        self._solver_pool)
+
+                # For every assertion A in F_i which is not in F_{i+1} ...
+                for candidate_index, lemma_id in enumerate(candidates):
+                    lemma = self.frame_store.lemmas[lemma_id]
+
+                    # If adding A to F_{i+1} does not violate inductiveness ...
+                    #print('TRY to Propagate (%s, %s) to F_%s' % (lemma.state_args, lemma.probability_expression, i + 1))
+                    if inductive[candidate_index] if inductive is not None else \
+                            self.p_solver.is_relative_inductive(i, lemma.state_args, lemma.probability_expression) == True:
+                        # Add it to F_{i+1}
+                        #print('Propagate (%s, %s) to F_%s' % (lemma.state_args, lemma.assertion, i+1))
+                        self.frame_store.add(i+1, lemma_id)
+                        self.p_solver.add_lemma(lemma.assertion, i, i+1)
+
+                        self.statistics.inc_propagation_counter()
+
+            if self.frame_store.is_equal_to_next(i):
+                self.inductive_frame_index = i
+                self.statistics.stop_propagation_timer()
+                return True
 
-                else:
-                    pass
-                    #logger.debug("Frames %s and %s are not equal. Difference: %s" % (i, i+1, (self.frames_explicit_set[i] - self.frames_explicit_set[i+1])))
+            else:
+                pass
+                #logger.debug("Frames %s and %s are not equal. Difference: %s" % (i, i+1, self.frame_store.only_in(i)))
 
         self.statistics.stop_propagation_timer()
 
@@ -457,6 +547,7 @@ class PrIC3:
 
 
 
+
     # --------------------- Solver Operations ----------------------------------
 
 
@@ -519,10 +610,9 @@ class PrIC3:
         """
         # Iterate over each (state, delta) in the frame and check whether \Phi(frame)[state] > delta
         # If there is such a pair, then the frame is no inductive invariant
-        for (s, state_args_as_tuple, probability_expression) in self.frames_explicit_set[frame_index]:
-            #state_args = state_valuation_to_z3_check_args(self.state_graph.get_state_valuation(state_valuation))
-            if not self.p_solver.is_relative_inductive(frame_index, state_args_as_tuple, probability_expression, ignore_stats=True) == True:
-                logger.debug("Assertion (%s, %s) is not inductive." % (state_args_as_tuple, probability_expression))
+        for lemma in self.frame_store.lemmas_of(frame_index):
+            if not self.p_solver.is_relative_inductive(frame_index, lemma.state_args, lemma.probability_expression, ignore_stats=True) == True:
+                logger.debug("Assertion (%s, %s) is not inductive." % (lemma.state_args, lemma.probability_expression))
                 return False
 
         return True
@@ -534,9 +624,8 @@ class PrIC3:
         :param frame_index:
         :return:
         """
-        for (s, state_args_as_tuple, delta) in self.frames_explicit_set[frame_index + 1]:
-            #state_args = state_valuation_to_z3_check_args(self.state_graph.get_state_valuation(state_valuation))
-            if not self.p_solver.is_relative_inductive(frame_index, state_args_as_tuple, RealVal(delta), ignore_stats=True) == True:
+        for lemma in self.frame_store.lemmas_of(frame_index + 1):
+            if not self.p_solver.is_relative_inductive(frame_index, lemma.state_args, RealVal(lemma.probability_expression), ignore_stats=True) == True:
                 return False
 
         return True
@@ -2,6 +2,7 @@ import logging
 import time
 
 from z3 import *
+from pric3.inductiveness_cache import CounterexamplePool, InductivenessCache
 from pric3.utils import OneshotSolver
 
 logger = logging.getLogger(__name__)
@@ -17,12 +18,24 @@ class PrIC3Solver:
         self.solvers = []
         self.opt_solvers = []
 
+        # Every lemma is logged once as (assertion, from_level, to_level): it belongs to the frames from_level + 1, ..., to_level.
+        # The frame solvers are populated lazily from this log, see _solver.
+        self._lemma_log = []
+        self._synced_log_entries = []
+        # For each frame, the length of the lemma log after the last lemma was added to it (0 if there is none).
+        self._frame_versions = []
+
+        self._inductiveness_cache = InductivenessCache() if settings.inductiveness_cache else None
+        self._counterexample_pool = CounterexamplePool(settings.counterexample_pool_size) if settings.counterexample_pool_size > 0 else None
+
         self.initialize_f0()
         # Phi Applied remains constant.
         self._phi_applied = self.smt_program.env.apply_to_state_valuation(self.smt_program.phi)
         #self._fresh_initialized_solver = Solver()
         #self.initialize_solver(self._fresh_initialized_solver)
         self.stats = stats
+        self.stats.solver_backend = settings.solver_backend
+        self.stats.query_capture = settings.query_capture
         self._calls = 0
         self._store_check_calls = store_smt_calls
         self._stored_calls = []
@@ -32,12 +45,15 @@ class PrIC3Solver:
         solver = OneshotSolver() if self.settings.generalize else Solver()
         self.initialize_solver(solver)
         self.solvers.append(solver)
+        self._synced_log_entries.append(0)
         #print(solver.sexpr())
 
     def initialize_f0(self):
         #solver = OneshotSolver(SolverFor("QF_NRA"))
         solver = OneshotSolver() if self.settings.generalize else Solver()
         self.solvers.append(solver)
+        # F_0 never contains lemmas.
+        self._synced_log_entries.append(None)
 
         self.initialize_solver(solver)
         solver.add(self.get_f_0())
@@ -63,9 +79,109 @@ class PrIC3Solver:
 
 
     def add_assertion(self, frame_index, assertion):
-        self.solvers[frame_index].add(assertion)
+        self.add_lemma(assertion, frame_index - 1, frame_index)
+
+    def add_lemma(self, assertion, from_level, to_level):
+        """
+        Add an assertion to the frames from_level + 1, ..., to_level.
+        The solvers are updated on their next use.
+        """
+        self._log_lemma(assertion, from_level, to_level)
+
+    def _log_lemma(self, assertion, from_level, to_level):
+        if from_level < to_level:
+            self._lemma_log.append((assertion, from_level, to_level))
+            if len(self._frame_versions) <= to_level:
+                self._frame_versions.extend([0] * (to_level + 1 - len(self._frame_versions)))
+            for frame_index in range(from_level + 1, to_level + 1):
+                self._frame_versions[frame_index] = len(self._lemma_log)
+
+    def frame_version(self, frame_index):
+        """
+        Return the length of the lemma log after the last lemma was added to the given frame.
+        """
+        return self._frame_versions[frame_index] if frame_index < len(self._frame_versions) else 0
+
+    def _solver(self, frame_index):
+        """
+        Return the solver for the given frame after adding all lemmas that were logged since its last use.
+        """
+        solver = self.solvers[frame_index]
+        synced = self._synced_log_entries[frame_index]
+        if synced is not None and synced < len(self._lemma_log):
+            for (assertion, from_level, to_level) in self._lemma_log[synced:]:
+                if from_level < frame_index <= to_level:
+                    solver.add(assertion)
+            self._synced_log_entries[frame_index] = len(self._lemma_log)
+        return solver
+
+    def _assumptions(self, frame_index):
+        """
+        Return the assumptions under which queries for the given frame are checked.
+        """
+        return []
+
+    def _query_handle(self, frame_index, query):
+        """
+        Return a cheap handle for a query that can be turned into SMT2 text later, see :py:class:`QueryHandle`.
+        """
+        return QueryHandle(self, frame_index, len(self._lemma_log), query)
+
+    def query_to_smt2(self, frame_index, log_watermark, query):
+        """
+        Return the SMT2 text of a query for the given frame, where the frame only contains the lemmas from
+        the first `log_watermark` entries of the lemma log.
+        """
+        solver = Solver()
+        self.initialize_solver(solver)
+        if frame_index == 0:
+            solver.add(self.get_f_0())
+        for (assertion, from_level, to_level) in self._lemma_log[:log_watermark]:
+            if from_level < frame_index <= to_level:
+                solver.add(assertion)
+        solver.add(query)
+        return solver.sexpr()
+
+    def frame_assertions(self, frame_index):
+        """
+        Return a list of assertions that is equisatisfiable to the given frame (including the program encoding).
+        """
+        return list(self._solver(frame_index).assertions()) + self._assumptions(frame_index)
 
     def is_relative_inductive(self, frame_index, state_args, expression, ignore_stats = False):
+        """
+        Checks for relative inductiveness, see :py:meth:`check_relative_inductive`.
+        If `settings.inductiveness_cache` is set, results of previous checks are reused if they hold for this check by monotonicity,
+        and with `settings.counterexample_pool_size` > 0, recent counterexamples for the frame are tried before the solver is called,
+        see :py:mod:`pric3.inductiveness_cache`.
+        """
+        if self._inductiveness_cache is not None:
+            result = self._inductiveness_cache.lookup(frame_index, state_args, expression, self.frame_version(frame_index))
+            if result is not None:
+                if not ignore_stats:
+                    self.stats.inc_inductiveness_cache_hits(result is True)
+                return result
+            if not ignore_stats:
+                self.stats.inc_inductiveness_cache_misses()
+
+        log_watermark = len(self._lemma_log)
+        result = None
+        if self._counterexample_pool is not None:
+            result = self._counterexample_pool.lookup(frame_index, And(_lt_no_coerce(expression, self._phi_applied), *state_args),
+                                                      self.frame_version(frame_index))
+            if result is not None and not ignore_stats:
+                self.stats.inc_counterexample_pool_hits()
+
+        if result is None:
+            result = self.check_relative_inductive(frame_index, state_args, expression, ignore_stats)
+            if result is not True and self._counterexample_pool is not None:
+                self._counterexample_pool.add(frame_index, result, log_watermark)
+
+        if self._inductiveness_cache is not None:
+            self._inductiveness_cache.add(frame_index, state_args, expression, result, log_watermark)
+        return result
+
+    def check_relative_inductive(self, frame_index, state_args, expression, ignore_stats = False):
         """
         Checks for relative inductiveness.
         A frame index is not relative inductive iff
@@ -78,6 +194,8 @@ class PrIC3Solver:
         :return: If not return_model_if_sat: If relative inductivity holds, we return True. Otherwise, we return the command-index of a
         """
 
+        solver = self._solver(frame_index)
+
         if not ignore_stats:
             self.stats.start_check_relative_inductiveness_timer()
         # Assert that the free z3_program_variables satisfy state_formula
@@ -86,20 +204,22 @@ class PrIC3Solver:
 
         #TODO: use assumptions again.
 
+        query = And(_lt_no_coerce(expression, self._phi_applied), *state_args)
+
         res = None
         try:
-            self.solvers[frame_index].push()
-            self.solvers[frame_index].add(And(_lt_no_coerce(expression, self._phi_applied), *state_args))
-            res = self.solvers[frame_index].check()
+            solver.push()
+            solver.add(query)
+            res = solver.check(*self._assumptions(frame_index))
         finally:
             if not ignore_stats:
-                self.stats.add_query(self.solvers[frame_index], time.time() - self.stats._check_relative_inductiveness_timer, res)
+                self.stats.add_query(self._query_handle(frame_index, query), time.time() - self.stats._check_relative_inductiveness_timer, res)
 
             if not ignore_stats:
                 self.stats.stop_check_relative_inductiveness_timer(res != sat)
 
         if res == unknown:
-            print(self.solvers[frame_index].sexpr())
+            print(solver.sexpr())
             raise Exception("is_relative_inductive: Result of SMT Call is UNKNOWN")
 
 
@@ -111,9 +231,9 @@ class PrIC3Solver:
         # In case we generalize and use reals instead of ints, we have to ensure that the program variables are assgined integer values.
         if res == sat and (self.settings.generalize and self.settings.int_to_real):
 
-            model = self.solvers[frame_index].model()
+            model = solver.model()
 
-            self.solvers[frame_index].pop()
+            solver.pop()
 
             # If we generalize and use real numbers, then we have to ensure that we get an integer solution as a counter example to inductivity
             # If we do not generalize or do not use reals, then this is ensured.
@@ -139,47 +259,114 @@ class PrIC3Solver:
                     to_assert = to_assert + [Or(var.variable >= RealVal(math.ceil(model[var.variable].as_fraction())),
                                                 var.variable <= RealVal(math.floor(model[var.variable].as_fraction()))) for var in self.smt_program.input_program.module.integer_variables]
 
-                    self.solvers[frame_index].push()
-                    self.solvers[frame_index].add(And(_lt_no_coerce(expression, self._phi_applied), *state_args))
-                    self.solvers[frame_index].add(And(to_assert))
+                    solver.push()
+                    solver.add(And(_lt_no_coerce(expression, self._phi_applied), *state_args))
+                    solver.add(And(to_assert))
 
                     if not ignore_stats:
                         self.stats.start_check_relative_inductiveness_timer()
 
                     try:
-                        res = self.solvers[frame_index].check(And(_lt_no_coerce(expression, self._phi_applied), *state_args))
+                        res = solver.check(And(_lt_no_coerce(expression, self._phi_applied), *state_args), *self._assumptions(frame_index))
                     finally:
                         if not ignore_stats:
-                            self.stats.add_query(self.solvers[frame_index], time.time() - self.stats._check_relative_inductiveness_timer, res)
+                            self.stats.add_query(self._query_handle(frame_index, And(query, *to_assert)), time.time() - self.stats._check_relative_inductiveness_timer, res)
 
                         if not ignore_stats:
                             self.stats.stop_check_relative_inductiveness_timer(res != sat)
 
                     # Check if counterexample still exists
                     if res == sat:
-                        model = self.solvers[frame_index].model()
-                        self.solvers[frame_index].pop()
+                        model = solver.model()
+                        solver.pop()
                         continue
 
                     else:
                         if res == unknown:
-                            print(self.solvers[frame_index].sexpr())
+                            print(solver.sexpr())
                             assert False
-                        self.solvers[frame_index].pop()
+                        solver.pop()
                         return True
 
             return model
 
         else:
-            if res == sat: model = self.solvers[frame_index].model()
-            self.solvers[frame_index].pop()
+            if res == sat: model = solver.model()
+            solver.pop()
 
         return True if res == unsat else model
 
 
+    def lemma_log_watermark(self):
+        """
+        Return a watermark for :py:meth:`frame_changed_since`.
+        """
+        return len(self._lemma_log)
+
+    def frame_changed_since(self, frame_index, log_watermark):
+        """
+        Return whether lemmas were added to the given frame since the watermark was taken.
+        """
+        return self.frame_version(frame_index) > log_watermark
+
+    def check_relative_inductive_batch(self, frame_index, candidates, pool, model_constant=None):
+        """
+        Check several candidates (pairs of state_args and expression, see :py:meth:`is_relative_inductive`)
+        against the same frame in parallel on the processes of a :py:class:`pric3.solver_pool.SolverPool`.
+
+        A candidate whose check is not conclusive on a worker is checked again with :py:meth:`is_relative_inductive`:
+        if it is unknown, or if it is sat when generalizing with reals, since the counterexample then has to be integral.
+        Candidates with a result in the inductiveness cache are not sent to the workers.
+
+        :return: For each candidate in order, True if it is relative inductive, and otherwise the value of `model_constant`
+                 in a counterexample (or None if `model_constant` is None).
+        """
+        def counterexample_value(model):
+            return None if model_constant is None else model[model_constant]
+
+        results = [None] * len(candidates)
+        pending = []
+        for index, (state_args, expression) in enumerate(candidates):
+            cached = None
+            if self._inductiveness_cache is not None:
+                cached = self._inductiveness_cache.lookup(frame_index, state_args, expression, self.frame_version(frame_index))
+            if cached is None:
+                pending.append(index)
+            else:
+                self.stats.inc_inductiveness_cache_hits(cached is True)
+                results[index] = True if cached is True else counterexample_value(cached)
+        if self._inductiveness_cache is not None:
+            self.stats.inc_inductiveness_cache_misses(len(pending))
+
+        queries = [And(_lt_no_coerce(candidates[index][1], self._phi_applied), *candidates[index][0]) for index in pending]
+        worker_results = pool.check(_to_sexpr(*self.frame_assertions(frame_index)), [_to_sexpr(query) for query in queries],
+                                    None if model_constant is None else str(model_constant))
+
+        for index, query, (res, time_seconds, value) in zip(pending, queries, worker_results):
+            (state_args, expression) = candidates[index]
+            if res == "unknown" or (res == "sat" and self.settings.generalize and self.settings.int_to_real):
+                check_result = self.is_relative_inductive(frame_index, state_args, expression)
+                results[index] = True if check_result is True else counterexample_value(check_result)
+                continue
+            res = unsat if res == "unsat" else sat
+            self.stats.add_query(self._query_handle(frame_index, query), time_seconds, res)
+            self.stats.add_check_relative_inductiveness_time(time_seconds, res == unsat)
+            self._calls += 1
+            if res == unsat and self._inductiveness_cache is not None:
+                # Only the value of model_constant is sent back for sat results, so only unsat results are cached
+                self._inductiveness_cache.add(frame_index, state_args, expression, True, len(self._lemma_log))
+            results[index] = True if res == unsat else None if value is None else IntVal(value)
+        return results
+
+    def are_relative_inductive(self, frame_index, candidates, pool):
+        """
+        Like :py:meth:`check_relative_inductive_batch`, but return a list of bools.
+        """
+        return [result is True for result in self.check_relative_inductive_batch(frame_index, candidates, pool)]
+
     def get_highest_phi(self, frame_index, state_args):
         opt = Optimize()
-        opt.add(self.solvers[frame_index].assertions())
+        opt.add(self.frame_assertions(frame_index))
         opt.add(state_args)
         opt_var = Real('opt')
         opt.add(opt_var == self._phi_applied)
@@ -192,7 +379,7 @@ class PrIC3Solver:
             return m[opt_var]
 
     def _store_call(self, frame_index, state_valuation, satisfiable, *assumptions):
-        self._stored_calls.append((";Frame index {}\n;State valuation {}\n;Satisfiable:{}\n".format(frame_index, state_valuation,satisfiable)+ self.solvers[frame_index].sexpr() + "\n" + _to_sexpr(assumptions), satisfiable))
+        self._stored_calls.append((";Frame index {}\n;State valuation {}\n;Satisfiable:{}\n".format(frame_index, state_valuation,satisfiable)+ self.solvers[frame_index].sexpr() + "\n" + _to_sexpr(*assumptions), satisfiable))
 
     def print_solver_assertions(self, solver):
         for ass in solver.assertions():
@@ -201,9 +388,90 @@ class PrIC3Solver:
     def export_solver_stacks(self, prefix):
         for i, stored in enumerate(self._stored_calls):
             _smt_formula_to_file(prefix + "_stored_" + str(i) + ".smt2", stored[0], stored[1])
-        for i, solver in enumerate(self.solvers):
+        for i in range(len(self.solvers)):
+            _export_solver_stack(self._solver(i), prefix + "_stack_" + str(i) + ".smt2")
+
+
+class QueryHandle:
+    """
+    A relative inductiveness query that was recorded by the statistics (see :py:meth:`pric3.statistics.Pric3SolverStatistics.add_query`).
+
+    Only the frame index, a watermark into the solver's lemma log and the query formula are stored.
+    The (expensive) SMT2 serialization is done by :py:meth:`materialize`.
+    """
+
+    def __init__(self, p_solver, frame_index, log_watermark, query):
+        self._p_solver = p_solver
+        self.frame_index = frame_index
+        self.log_watermark = log_watermark
+        self._query = query
+
+    def materialize(self) -> str:
+        return self._p_solver.query_to_smt2(self.frame_index, self.log_watermark, self._query)
+
+
+class ActivationLiteralPrIC3Solver(PrIC3Solver):
+    """
+    Like :py:class:`PrIC3Solver`, but all frames share one incremental solver.
+
+    The program encoding is added only once.
+    Each frame i gets an activation literal act_i, and a lemma with level L (see :py:class:`pric3.frames.FrameStore`)
+    is asserted as act_L => lemma.
+    A query for frame i >= 1 is checked under the assumptions act_i, ..., act_k, i.e. exactly the lemmas of F_i are enabled.
+    F_0 is guarded by act_0, queries for frame 0 only assume act_0.
+
+    Lemmas learned by the solver are thus shared between all frames.
+    With `settings.generalize`, the shared solver is a :py:class:`pric3.utils.OneshotSolver` like the frame solvers of :py:class:`PrIC3Solver`,
+    since incremental solving is slow with the nonlinear generalizations. Then nothing is learned across checks.
+    """
+
+    def initialize_f0(self):
+        solver = OneshotSolver() if self.settings.generalize else Solver()
+        self._activation_literals = [Bool("__act_F_0")]
+
+        self.initialize_solver(solver)
+        solver.add(Implies(self._activation_literals[0], self.get_f_0()))
+
+        # Every frame index refers to the same solver.
+        self.solvers.append(solver)
+
+    def add_new_solver(self):
+        self._activation_literals.append(Bool("__act_F_%s" % len(self._activation_literals)))
+        self.solvers.append(self.solvers[0])
+
+    def add_lemma(self, assertion, from_level, to_level):
+        if from_level < to_level:
+            # The log is only used to reconstruct queries (see query_to_smt2) and for the frame versions.
+            self._log_lemma(assertion, from_level, to_level)
+            # Enabled exactly by the queries for the frames 1, ..., to_level.
+            self.solvers[0].add(Implies(self._activation_literals[to_level], assertion))
+
+    def _solver(self, frame_index):
+        return self.solvers[0]
+
+    def _assumptions(self, frame_index):
+        if frame_index == 0:
+            return [self._activation_literals[0]]
+        return self._activation_literals[frame_index:]
+
+    def _store_call(self, frame_index, state_valuation, satisfiable, *assumptions):
+        super()._store_call(frame_index, state_valuation, satisfiable, *(list(assumptions) + self._assumptions(frame_index)))
+
+    def export_solver_stacks(self, prefix):
+        for i, stored in enumerate(self._stored_calls):
+            _smt_formula_to_file(prefix + "_stored_" + str(i) + ".smt2", stored[0], stored[1])
+        for i in range(len(self.solvers)):
+            # Only used to print the frame, a OneshotSolver would only print its last check
+            solver = Solver()
+            solver.add(self.frame_assertions(i))
             _export_solver_stack(solver, prefix + "_stack_" + str(i) + ".smt2")
 
+
+PRIC3_SOLVER_BACKENDS = {"frames": PrIC3Solver, "activation": ActivationLiteralPrIC3Solver}
+"""
+Available implementations of the relative inductiveness checks, selected with `--solver-backend`.
+"""
+
 def _smt_formula_to_file(path, formula, satisfiable):
     with open(path, 'w') as file:
         logger.debug("Writing to %s... (satisfiable problem: %s)" % (path, satisfiable))
@@ -216,7 +484,7 @@ def _smt_formula_to_file(path, formula, satisfiable):
 def _export_solver_stack(solver, path):
     _smt_formula_to_file(path, solver.sexpr(), True)
 
-def _to_sexpr(self, *expr):
+def _to_sexpr(*expr):
     # Somehow, this seems necessary on some low-level formulae
     tmpsolve = z3.Solver()
     tmpsolve.add(expr)
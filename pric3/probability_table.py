@@ -0,0 +1,92 @@
+"""
+Interning of exact probabilities, see :py:class:`ProbabilityTable`.
+"""
+
+from fractions import Fraction
+from typing import Any, Dict, List, NewType, Optional
+
+import z3
+
+from pric3.utils import attach_newtype_declaration_module
+
+ProbabilityId = NewType('ProbabilityId', int)
+"""
+The id of an interned probability.
+"""
+attach_newtype_declaration_module(ProbabilityId, __name__)
+
+
+class ProbabilityTable:
+    """
+    Assigns an id to each distinct probability and caches its representations,
+    so each of them is computed from the probability's text at most once.
+
+    Values are accepted in any representation whose `str` is a valid argument for `Fraction`,
+    e.g. storm's rationals, `Fraction` or floats (which are read as their shortest decimal representation, like `z3.RealVal` does).
+
+    Every :py:class:`pric3.state_graph.StateGraph` has one table, which is shared by all components that use the graph.
+    """
+
+    def __init__(self):
+        self._ids: Dict[str, ProbabilityId] = dict()
+        self._fractions: List[Fraction] = []
+        self._floats: List[float] = []
+        self._z3_values: List[Optional[z3.RatNumRef]] = []
+
+    def __len__(self) -> int:
+        return len(self._fractions)
+
+    def intern(self, probability: Any) -> ProbabilityId:
+        """
+        Return the id of the given probability.
+
+        .. doctest::
+
+            >>> table = ProbabilityTable()
+            >>> table.intern(Fraction(1, 2)) == table.intern("1/2")
+            True
+            >>> table.fraction(table.intern(0.1))
+            Fraction(1, 10)
+        """
+        text = str(probability)
+        probability_id = self._ids.get(text)
+        if probability_id is None:
+            fraction = probability if isinstance(probability, Fraction) else Fraction(text)
+            probability_id = self._ids.get(str(fraction))
+            if probability_id is None:
+                probability_id = ProbabilityId(len(self._fractions))
+                self._fractions.append(fraction)
+                self._floats.append(float(fraction))
+                self._z3_values.append(None)
+                self._ids[str(fraction)] = probability_id
+            self._ids[text] = probability_id
+        return probability_id
+
+    def fraction(self, probability_id: ProbabilityId) -> Fraction:
+        return self._fractions[probability_id]
+
+    def float_value(self, probability_id: ProbabilityId) -> float:
+        return self._floats[probability_id]
+
+    def z3_value(self, probability_id: ProbabilityId) -> z3.RatNumRef:
+        """
+        Return the probability as a z3 rational. The z3 value is created on first use.
+        """
+        value = self._z3_values[probability_id]
+        if value is None:
+            fraction = self._fractions[probability_id]
+            value = z3.Q(fraction.numerator, fraction.denominator)
+            self._z3_values[probability_id] = value
+        return value
+
+    def to_z3(self, probability: Any) -> z3.RatNumRef:
+        """
+        Shorthand for `z3_value(intern(probability))`.
+        """
+        return self.z3_value(self.intern(probability))
+
+    def to_fraction(self, probability: Any) -> Fraction:
+        """
+        Shorthand for `fraction(intern(probability))`.
+        """
+        return self._fractions[self.intern(probability)]
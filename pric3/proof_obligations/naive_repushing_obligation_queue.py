@@ -4,17 +4,29 @@
 """
 
 from heapq import *
+from typing import List, Tuple
+
+import z3
+
+from pric3.proof_obligations.obligation_history import ObligationHistory
+from pric3.proof_obligations.obligation_store import ObligationStore
+from pric3.state_graph import StateId
 
 
 class NaiveRepushingObligationQueue():
 
-    def __init__(self):
+    def __init__(self, store: ObligationStore):
+        # Only used by others to look up the smallest probability of a state (e.g. the generalizer).
+        self.store = store
         self._tie_breaker = 0
-        self.Q = []
+        # Obligations are never merged
+        self.merged_pushes = 0
+        self.Q: List[Tuple[int, int, StateId, z3.ArithRef, ObligationHistory]] = []
         heapify(self.Q)
 
 
     def push_obligation(self, i, s, delta, history):
+        self.store.record(s, delta)
         self._tie_breaker += 1
         heappush(self.Q, (i, self._tie_breaker, s, delta, history))
 
@@ -24,6 +36,9 @@ class NaiveRepushingObligationQueue():
         (i, _tie, s, delta, history) = heappop(self.Q)
         return (i, s, delta, history)
 
+    def minimum_frame_index(self):
+        return self.Q[0][0]
+
     def get_length(self):
         return len(self.Q)
 
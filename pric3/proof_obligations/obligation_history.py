@@ -0,0 +1,60 @@
+"""
+The states visited on the way from the initial state to an obligation.
+
+Successor obligations extend the history of their parent obligation by one state, so histories are stored as immutable
+parent-pointer chains: extending a history takes constant time and memory, and all obligations on a path share its prefix.
+A history is only turned into a set when the oracle is refined with it.
+"""
+
+from typing import Iterator, Optional, Set
+
+from pric3.state_graph import StateId
+
+
+class ObligationHistory:
+    """
+    An immutable set of visited states, represented by the last visited state and the history before it.
+
+    .. doctest::
+
+        >>> history = ObligationHistory(0).extend(1).extend(2)
+        >>> 1 in history, 3 in history
+        (True, False)
+        >>> sorted(history.to_set())
+        [0, 1, 2]
+    """
+
+    __slots__ = ["state_id", "parent", "depth"]
+
+    state_id: StateId
+    parent: Optional["ObligationHistory"]
+    depth: int
+
+    def __init__(self, state_id: StateId, parent: Optional["ObligationHistory"] = None):
+        self.state_id = state_id
+        self.parent = parent
+        self.depth = 1 if parent is None else parent.depth + 1
+
+    def extend(self, state_id: StateId) -> "ObligationHistory":
+        """
+        Return the history with the state added. This history is not changed.
+        """
+        return ObligationHistory(state_id, self)
+
+    def __iter__(self) -> Iterator[StateId]:
+        """
+        Iterate over the states from the last visited one back to the first one. States visited more than once are repeated.
+        """
+        history: Optional[ObligationHistory] = self
+        while history is not None:
+            yield history.state_id
+            history = history.parent
+
+    def __contains__(self, state_id) -> bool:
+        return any(visited == state_id for visited in self)
+
+    def to_set(self) -> Set[StateId]:
+        return set(self)
+
+    def __repr__(self):
+        return "ObligationHistory(%s)" % sorted(self.to_set())
@@ -1,50 +1,48 @@
 from heapq import *
+from typing import List, Set, Tuple
 
-from pric3.utils import *
-
-from z3 import *
+from pric3.proof_obligations.obligation_history import ObligationHistory
+from pric3.proof_obligations.obligation_store import ObligationStore
+from pric3.state_graph import StateId
 
 
 class ObligationQueue():
-    smallest_probability_for_state = None
 
-    def __init__(self):
-        self.Q = []
+    def __init__(self, store: ObligationStore):
+        self.Q: List[Tuple[int, StateId, ObligationHistory]] = []
         heapify(self.Q)
 
-        # TODO: We might want to avoid a static dict here. However, this dict shall survive multiple instances of this class as long as we do not refine the oracle.
-        # On Refining the oracle, this dict is reset
-        # Stores for each state the smallest probability seen
-
-        if ObligationQueue.smallest_probability_for_state is None:
-            ObligationQueue.smallest_probability_for_state = dict()
-
-        self.compare_solver = Solver()
+        # Stores for each state the smallest probability seen.
+        # The store survives multiple instances of this class as long as we do not refine the oracle.
+        self.store = store
 
         # Store pairs (frame_index, state) to indicate that there is an obligation of this form in the queue
-        self.obligations_for_frame = set()
+        self.obligations_for_frame: Set[Tuple[int, StateId]] = set()
+
+        # How many pushed obligations were merged into an obligation for the same frame and state
+        self.merged_pushes = 0
 
     def push_obligation(self, i, s, delta, history):
 
-        # TODO: Does this take too much time?
         # First check whether delta is the new smallest probability for that state.
-        if s in ObligationQueue.smallest_probability_for_state:
-            if z3_values_check_gt(ObligationQueue.smallest_probability_for_state[s], delta):
-                # This makes relative inductivity checks necesarry again
-                ObligationQueue.smallest_probability_for_state[s] = delta
-        else:
-            ObligationQueue.smallest_probability_for_state[s] = delta
+        # This makes relative inductivity checks necesarry again
+        self.store.record(s, delta)
 
         # We must only push this obligation if it does not exist
         if (i, s) not in self.obligations_for_frame:
             self.obligations_for_frame.add((i, s))
             heappush(self.Q, (i, s, history))
+        else:
+            self.merged_pushes += 1
 
     def pop_obligation(self):
         (i, s, history) = heappop(self.Q)
-        self.obligations_for_frame.remove((i, s, history))
+        self.obligations_for_frame.remove((i, s))
+
+        return (i, s, self.store[s], history)
 
-        return (i, s, ObligationQueue.smallest_probability_for_state[s])
+    def minimum_frame_index(self):
+        return self.Q[0][0]
 
     def get_length(self):
         return len(self.Q)
@@ -54,4 +52,16 @@ class ObligationQueue():
 
     def repush_obligation(self, i, s, delta, history):
         # This obligation queue does not repush
-        pass
\ No newline at end of file
+        pass
+
+
+def pop_obligations_at_minimum_frame(queue):
+    """
+    Pop all obligations with the smallest frame index from a non-empty queue, in the order in which
+    `queue.pop_obligation` would return them.
+    """
+    obligations = [queue.pop_obligation()]
+    i = obligations[0][0]
+    while not queue.is_empty() and queue.minimum_frame_index() == i:
+        obligations.append(queue.pop_obligation())
+    return obligations
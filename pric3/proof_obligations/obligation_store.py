@@ -0,0 +1,70 @@
+"""
+The smallest probability (delta) seen for each state in the obligations of one PrIC3 run.
+
+The obligation queues record every pushed delta here, and return the smallest one when an obligation is popped.
+The store outlives the queues of the run (a new queue is created for every call of `PrIC3.strengthen`), and it is reset
+together with the frames when the oracle is refined.
+
+Deltas are z3 rationals everywhere else, but they are compared here as `Fraction`s, which does not need the z3 API.
+"""
+
+from fractions import Fraction
+from typing import List, Optional
+
+import z3
+
+
+def delta_to_fraction(delta: z3.ArithRef) -> Fraction:
+    if z3.is_int_value(delta):
+        return Fraction(delta.as_long())
+    return delta.as_fraction()
+
+
+class ObligationStore:
+    """
+    The smallest delta per state, in lists indexed by state id (state ids are dense).
+    """
+
+    def __init__(self):
+        self._smallest_fractions: List[Optional[Fraction]] = []
+        self._smallest_deltas: List[Optional[z3.ArithRef]] = []
+
+    def __contains__(self, state_id) -> bool:
+        return state_id < len(self._smallest_fractions) and self._smallest_fractions[state_id] is not None
+
+    def __getitem__(self, state_id) -> z3.ArithRef:
+        """
+        Return the smallest delta recorded for the state.
+        """
+        if state_id not in self:
+            raise KeyError(state_id)
+        return self._smallest_deltas[state_id]
+
+    def smallest_fraction(self, state_id) -> Fraction:
+        """
+        Like `store[state_id]`, but as a Fraction.
+        """
+        if state_id not in self:
+            raise KeyError(state_id)
+        return self._smallest_fractions[state_id]
+
+    def record(self, state_id, delta: z3.ArithRef) -> bool:
+        """
+        Record a delta for the state. Return True iff it is smaller than all deltas recorded for the state so far (or the first one).
+        """
+        missing = state_id + 1 - len(self._smallest_fractions)
+        if missing > 0:
+            self._smallest_fractions.extend([None] * missing)
+            self._smallest_deltas.extend([None] * missing)
+
+        fraction = delta_to_fraction(delta)
+        smallest = self._smallest_fractions[state_id]
+        if smallest is not None and smallest <= fraction:
+            return False
+        self._smallest_fractions[state_id] = fraction
+        self._smallest_deltas[state_id] = delta
+        return True
+
+    def reset(self):
+        self._smallest_fractions = []
+        self._smallest_deltas = []
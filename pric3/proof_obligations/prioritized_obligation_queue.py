@@ -0,0 +1,150 @@
+"""
+   RepushingObligationQueues which order the obligations of a frame by a priority instead of by state id.
+   Obligations are still processed frame by frame (smallest frame index first), only the order within a frame changes.
+
+   Policies:
+
+   * :py:class:`OracleValueObligationQueue`: states with a larger oracle value first.
+   * :py:class:`DeltaGapObligationQueue`: obligations whose delta is furthest below the oracle value of the state first.
+   * :py:class:`DepthBoundedObligationQueue`: breadth-first by the length of the history, up to a bound.
+"""
+
+from abc import ABC, abstractmethod
+from fractions import Fraction
+from heapq import heappop, heappush
+from typing import Any, Dict, List, Set, Tuple
+
+from pric3.proof_obligations.obligation_store import ObligationStore, delta_to_fraction
+from pric3.proof_obligations.repushing_obligation_queue import RepushingObligationQueue
+from pric3.state_graph import StateId
+
+
+class PrioritizedObligationQueue(RepushingObligationQueue, ABC):
+    """
+    Obligations of the same frame with a smaller priority are popped first, ties are broken by state id.
+
+    The oracle is a :py:class:`pric3.oracles.oracle.Oracle` (not imported here, since the oracles import the settings, which import the queues).
+    The priority of an obligation depends on the smallest delta of its state and on its history. When a smaller delta is pushed for a state,
+    all obligations of the state in the queue get a new heap entry with the new priority, and their old entries are skipped when they are popped.
+    """
+
+    def __init__(self, store: ObligationStore, oracle, settings):
+        super().__init__(store)
+        self.oracle = oracle
+        self.settings = settings
+
+        # The current heap entry of every obligation in the queue, and the frame indices of the obligations of each state
+        self._entry_for_obligation: Dict[Tuple[int, StateId], Tuple[int, Any, StateId]] = dict()
+        self._frames_for_state: Dict[StateId, Set[int]] = dict()
+
+        # The popped obligations, and for each obligation the number of pops before it was pushed and before it was popped.
+        # Used by checks_saved_by_order.
+        self._popped: List[Tuple[int, StateId]] = []
+        self._pushed_at: Dict[Tuple[int, StateId], int] = dict()
+        self._popped_at: Dict[Tuple[int, StateId], Tuple[int, int]] = dict()
+
+    @abstractmethod
+    def priority(self, s, delta, history):
+        """
+        Return the priority of an obligation for state s with the given (smallest) delta and history.
+        """
+        pass
+
+    def _oracle_value(self, s) -> Fraction:
+        return delta_to_fraction(self.oracle.get_oracle_value(s))
+
+    def push_obligation(self, i, s, delta, history):
+        smaller = self.store.record(s, delta)
+
+        if (i, s) in self.obligations_for_frame:
+            self.merged_pushes += 1
+            if not smaller:
+                return
+        else:
+            self.obligations_for_frame.add((i, s))
+            self._frames_for_state.setdefault(s, set()).add(i)
+            self._pushed_at[(i, s)] = len(self._popped)
+        self.history_for_obligation[(i, s)] = history
+
+        # The priorities of all obligations of the state depend on its smallest delta
+        for j in self._frames_for_state[s] if smaller else [i]:
+            self._push_entry(j, s)
+
+    def _push_entry(self, i, s):
+        entry = (i, self.priority(s, self.store[s], self.history_for_obligation[(i, s)]), s)
+        self._entry_for_obligation[(i, s)] = entry
+        heappush(self.Q, entry)
+
+    def _drop_outdated_entries(self):
+        # Entries are compared by identity, an outdated entry may be equal to the current one
+        while self.Q[0] is not self._entry_for_obligation.get((self.Q[0][0], self.Q[0][-1])):
+            heappop(self.Q)
+
+    def pop_obligation(self):
+        self._drop_outdated_entries()
+        (i, _priority, s) = heappop(self.Q)
+        del self._entry_for_obligation[(i, s)]
+        self._frames_for_state[s].remove(i)
+        if not self._frames_for_state[s]:
+            del self._frames_for_state[s]
+        self.obligations_for_frame.remove((i, s))
+        history = self.history_for_obligation.pop((i, s))
+
+        self._popped_at[(i, s)] = (self._pushed_at.pop((i, s)), len(self._popped))
+        self._popped.append((i, s))
+
+        return (i, s, self.store[s], history)
+
+    def minimum_frame_index(self):
+        self._drop_outdated_entries()
+        return self.Q[0][0]
+
+    def get_length(self):
+        return len(self.obligations_for_frame)
+
+    def is_empty(self):
+        return len(self.obligations_for_frame) == 0
+
+    def checks_saved_by_order(self, i, s) -> int:
+        """
+        Estimate how many relative inductiveness checks this order saved compared to the order of the
+        :py:class:`RepushingObligationQueue` (by frame index and state id) when the popped obligation (i, s) failed
+        (the oracle was refined or the property refuted), which discards the queue. Negative if the order cost checks.
+
+        The baseline order would still have popped the obligations in the queue that come before (i, s), but not the obligations
+        after (i, s) that were popped while (i, s) was in the queue. Each of these pops costs a check (for frames i > 0).
+        """
+        (pushed_at, popped_at) = self._popped_at[(i, s)]
+        skipped = sum(1 for obligation in self.obligations_for_frame if obligation < (i, s) and obligation[0] > 0)
+        spent = sum(1 for obligation in self._popped[pushed_at:popped_at] if obligation > (i, s) and obligation[0] > 0)
+        return skipped - spent
+
+
+class OracleValueObligationQueue(PrioritizedObligationQueue):
+    """
+    States which are more likely to reach the goal are checked first. Their obligations fail most often,
+    so the oracle is refined (and the queue reset) before many checks for other states are spent.
+    """
+
+    def priority(self, s, delta, history):
+        return -self._oracle_value(s)
+
+
+class DeltaGapObligationQueue(PrioritizedObligationQueue):
+    """
+    Obligations whose delta is far below the oracle value of the state are checked first, since they are the least likely
+    to be relatively inductive.
+    """
+
+    def priority(self, s, delta, history):
+        return delta_to_fraction(delta) - self._oracle_value(s)
+
+
+class DepthBoundedObligationQueue(PrioritizedObligationQueue):
+    """
+    Obligations closer to the initial state are checked first. Obligations deeper than `settings.obligation_depth_bound`
+    are all ordered by state id, after the shallower ones.
+    """
+
+    def priority(self, s, delta, history):
+        return min(history.depth, self.settings.obligation_depth_bound + 1)
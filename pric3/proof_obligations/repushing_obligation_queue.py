@@ -5,62 +5,47 @@
 """
 
 from heapq import *
-from pric3.utils import *
+from typing import Dict, List, Set, Tuple
 
-from z3 import *
+from pric3.proof_obligations.obligation_history import ObligationHistory
+from pric3.proof_obligations.obligation_store import ObligationStore
+from pric3.state_graph import StateId
 
-# TODO: We do not need to store the delta in obligations anymore
-# Note: We do not have to store the delta in the obligations anymre since they are taken from RepushingObligationQueue.smallest_probability_for_state
+# Note: We do not have to store the delta in the obligations anymore since they are taken from the obligation store
 class RepushingObligationQueue():
 
-
-    smallest_probability_for_state = None
-
-    def __init__(self):
-        self.Q = []
+    def __init__(self, store: ObligationStore):
+        # Entries start with the frame index and end with the state (subclasses may add a priority in between)
+        self.Q: List[tuple] = []
         heapify(self.Q)
 
-        # TODO: We might want to avoid a static dict here. However, this dict shall survive multiple instances of this class as long as we do not refine the oracle.
-        # On Refining the oracle, this dict is reset
-        # Stores for each state the smallest probability seen
-
-        if RepushingObligationQueue.smallest_probability_for_state is None:
-            RepushingObligationQueue.smallest_probability_for_state = dict()
-
-        self.compare_solver = Solver()
+        # Stores for each state the smallest probability seen.
+        # The store survives multiple instances of this class as long as we do not refine the oracle.
+        self.store = store
 
         # Store pairs (frame_index, state) to indicate that there is an obligation of this form in the queue
-        self.obligations_for_frame = set()
-        self.history_for_obligation= dict()
+        self.obligations_for_frame: Set[Tuple[int, StateId]] = set()
+        self.history_for_obligation: Dict[Tuple[int, StateId], ObligationHistory] = dict()
+
+        # How many pushed obligations were merged into an obligation for the same frame and state
+        self.merged_pushes = 0
 
 
     def push_obligation(self, i, s, delta, history):
 
-        #TODO: Does this take too much time?
         # First check whether delta is the new smallest probability for that state.
-
         # Note: it suffices to store the history for the state with the smallest delta.
-        if s in RepushingObligationQueue.smallest_probability_for_state:
-            if z3_values_check_gt(RepushingObligationQueue.smallest_probability_for_state[s], delta):
-                    # This makes relative inductivity checks necesarry again
-                    RepushingObligationQueue.smallest_probability_for_state[s] = delta
-
-                    self.history_for_obligation[(i,s)] = history
-
-            else:
-                if (i,s) not in self.history_for_obligation:
-                    self.history_for_obligation[(i,s)] = history
-
-        else:
-            RepushingObligationQueue.smallest_probability_for_state[s] = delta
-            self.history_for_obligation[(i,s)] = history
+        # A new smallest delta makes relative inductivity checks necesarry again
+        if self.store.record(s, delta) or (i, s) not in self.history_for_obligation:
+            self.history_for_obligation[(i, s)] = history
 
 
         # We must only push this obligation if it does not exist
         if (i, s) not in self.obligations_for_frame:
             self.obligations_for_frame.add((i, s))
             heappush(self.Q, (i, s))
-
+        else:
+            self.merged_pushes += 1
 
     def pop_obligation(self):
         (i, s) = heappop(self.Q)
@@ -68,7 +53,10 @@ class RepushingObligationQueue():
         self.obligations_for_frame.remove((i, s))
         del self.history_for_obligation[(i,s)]
 
-        return (i, s, RepushingObligationQueue.smallest_probability_for_state[s], history)
+        return (i, s, self.store[s], history)
+
+    def minimum_frame_index(self):
+        return self.Q[0][0]
 
     def get_length(self):
         return len(self.Q)
@@ -80,6 +68,3 @@ class RepushingObligationQueue():
     def repush_obligation(self, i, s, delta, history):
         # When repushing an obligation, it is always necessary to check for relative inductiveness.
         self.push_obligation(i, s, delta, history)
-
-
-
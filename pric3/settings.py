@@ -1,14 +1,18 @@
 import json
 from fractions import Fraction
-from typing import Any, Dict, NamedTuple
+from typing import Any, Dict, NamedTuple, Optional
 
 from pric3.smt_program import ForallMode, SmtSettings
 from pric3.proof_obligations.obligation_queue import ObligationQueue
 from pric3.proof_obligations.repushing_obligation_queue import RepushingObligationQueue
 from pric3.proof_obligations.naive_repushing_obligation_queue import NaiveRepushingObligationQueue
+from pric3.proof_obligations.prioritized_obligation_queue import OracleValueObligationQueue, DeltaGapObligationQueue, DepthBoundedObligationQueue
 from pric3.generalization.generalizer import Generalizer
+from pric3.pric3_solver import PRIC3_SOLVER_BACKENDS
 
-OBLIGATION_QUEUE_CLASSES = {"ObligationQueue": ObligationQueue, "RepushingObligationQueue" : RepushingObligationQueue, "NaiveRepushingObligationQueue" : NaiveRepushingObligationQueue}
+OBLIGATION_QUEUE_CLASSES = {"ObligationQueue": ObligationQueue, "RepushingObligationQueue" : RepushingObligationQueue, "NaiveRepushingObligationQueue" : NaiveRepushingObligationQueue,
+                            "OracleValueObligationQueue": OracleValueObligationQueue, "DeltaGapObligationQueue": DeltaGapObligationQueue,
+                            "DepthBoundedObligationQueue": DepthBoundedObligationQueue}
 GENERALIZATION_METHOD = {"Polynomial": Generalizer.polynomial_generalization, "Linear": Generalizer.linear_generalization, "Hybrid": Generalizer.hybrid_generalization}
 
 # Adding new settings: Add a setting here in the Settings class,
@@ -21,7 +25,7 @@ class Settings(NamedTuple):
     obligation_queue_class: str
     oracle_type: str # either [perfect, simulation, modelchecking, solveeqspartly, file]
     depth_for_partly_solving_lqs: int
-    simulator: str # with python 3.8: Literal["cpp", "py"]
+    simulator: str # with python 3.8: Literal["cpp", "py", "batched"]
     number_simulations_for_oracle: int
     max_number_steps_per_simulation: int
     propagate: bool
@@ -34,6 +38,21 @@ class Settings(NamedTuple):
     generalization_method: str
     use_states_of_same_kind: bool
     max_num_ctgs: int
+    solver_backend: str = "frames" # one of PRIC3_SOLVER_BACKENDS
+    query_capture: str = "deferred" # with python 3.8: Literal["eager", "deferred", "off"]
+    oracle_refinement: str = "exact" # with python 3.8: Literal["exact", "value_iteration"]
+    simulation_workers: int = 1
+    simulation_seed: Optional[int] = None
+    simulation_state_limit: int = 1000000
+    simulation_tolerance: Optional[float] = None
+    oracle_cache: Optional[str] = None
+    oracle_file: str = "oracle.pr"
+    solver_workers: int = 1
+    batch_strengthen: bool = False
+    obligation_depth_bound: int = 100 # for the DepthBoundedObligationQueue
+    inductiveness_cache: bool = True
+    counterexample_pool_size: int = 8 # counterexamples kept per frame, 0 to disable
+    simulation_walk_budget: Optional[int] = None # total walks of the adaptive simulation oracle
 
     @staticmethod
     def load(filename: str, args: Dict[str, Any]) -> 'Settings':
@@ -61,6 +80,9 @@ class Settings(NamedTuple):
     def get_obligation_queue_class(self):
         return OBLIGATION_QUEUE_CLASSES[self.obligation_queue_class]
 
+    def get_pric3_solver_class(self):
+        return PRIC3_SOLVER_BACKENDS[self.solver_backend]
+
     def get_smt_settings(self) -> SmtSettings:
         return SmtSettings(forall_mode=ForallMode.from_str(self.forall_mode), inline_goal=self.inline_goal)
 
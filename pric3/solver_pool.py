@@ -0,0 +1,88 @@
+"""
+Check independent SMT queries against a fixed set of assertions on worker processes.
+
+The assertions (e.g. a frame, see :py:meth:`pric3.pric3_solver.PrIC3Solver.frame_assertions`) and the queries are sent as SMT2 text.
+Each worker parses them into its own z3 context, and keeps a solver for the most recent assertions so that
+consecutive batches against the same frame do not parse it again.
+"""
+
+import time
+from concurrent.futures import ProcessPoolExecutor
+from fractions import Fraction
+from typing import List, Optional, Tuple
+
+from z3 import ModelRef, Solver, parse_smt2_string, sat
+
+CHUNKS_PER_WORKER = 4
+
+# The solver of this worker process for the assertions it received last, see _check_queries.
+_worker_assertions: Optional[str] = None
+_worker_solver: Optional[Solver] = None
+
+
+def _model_value(model: ModelRef, constant: str) -> Optional[int]:
+    for declaration in model.decls():
+        if declaration.name() == constant:
+            return int(Fraction(model[declaration].as_string()))
+    return None
+
+
+def _check_queries(assertions: str, queries: List[str], model_constant: Optional[str]) -> List[Tuple[str, float, Optional[int]]]:
+    global _worker_assertions, _worker_solver
+    solver = _worker_solver
+    if solver is None or assertions != _worker_assertions:
+        solver = Solver()
+        solver.from_string(assertions)
+        _worker_solver = solver
+        _worker_assertions = assertions
+
+    results = []
+    for query in queries:
+        start = time.time()
+        solver.push()
+        # The query text declares the constants of the frame again, which the solver's own parser rejects (z3 >= 4.12).
+        # A separate parser creates the same declarations, since z3 identifies them by name and sort.
+        solver.add(parse_smt2_string(query))
+        result = solver.check()
+        elapsed = time.time() - start
+        value = _model_value(solver.model(), model_constant) if result == sat and model_constant is not None else None
+        solver.pop()
+        results.append((str(result), elapsed, value))
+    return results
+
+
+class SolverPool:
+    """
+    A pool of worker processes for SMT queries. The processes are started on first use.
+
+    Attributes:
+        workers (int): the number of worker processes.
+    """
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def check(self, assertions: str, queries: List[str], model_constant: Optional[str] = None) -> List[Tuple[str, float, Optional[int]]]:
+        """
+        Check each query together with the assertions (both SMT2 text).
+        Return the result ("sat", "unsat" or "unknown"), the time the check took and, for sat queries,
+        the integral value of the constant named `model_constant` in the model, for each query in the order of the queries.
+        """
+        if len(queries) == 0:
+            return []
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        # a few chunks per worker to balance the load
+        chunk_size = -(-len(queries) // (CHUNKS_PER_WORKER * self.workers))
+        futures = [self._executor.submit(_check_queries, assertions, queries[start:start + chunk_size], model_constant)
+                   for start in range(0, len(queries), chunk_size)]
+        return [result for future in futures for result in future.result()]
+
+    def shutdown(self):
+        """
+        Stop the worker processes. They are started again on the next use.
+        """
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
@@ -3,15 +3,19 @@ Interactively explore the state space of a program using :py:class:`StateGraph`.
 
 It is implemented using :py:class:`stormpy.StateGenerator`.
 """
+from array import array
 from collections.abc import Sequence
-from typing import Dict, List, NewType, Set, Tuple
+from fractions import Fraction
+from typing import Dict, Iterable, List, NamedTuple, NewType, Optional, Set, Tuple
 
+import numpy as np
 import z3
 from graphviz import Digraph
 
 import stormpy
 from pric3.input_program import InputProgram, InputCommand, InputVariable
-from pric3.utils import attach_newtype_declaration_module, concat_generators
+from pric3.probability_table import ProbabilityTable
+from pric3.utils import attach_newtype_declaration_module, concat_generators, eq_no_coerce
 
 StateId = NewType('StateId', int)
 """
@@ -35,6 +39,73 @@ A probability distribution of choices.
 """
 
 
+class ExplicitStateSpace(NamedTuple):
+    """
+    A (partially) explored state space in compressed sparse row (CSR) format,
+    see :py:meth:`StateGraph.explore_to_csr` and :py:meth:`StateGraph.states_to_csr`.
+
+    States are referred to by their *local index* (the position in `state_ids`).
+    In the result of `explore_to_csr`, the initial state has local index 0.
+    The choices of the state with local index `r` are `row_pointers[r]` to `row_pointers[r + 1] - 1`,
+    and the transitions of choice `c` are `choice_pointers[c]` to `choice_pointers[c + 1] - 1`.
+
+    Goal states, terminal states and states that were not expanded (the *frontier*) have no choices.
+    Transitions are not filtered, i.e. successors may be goal or terminal states.
+
+    Attributes:
+        state_ids (np.ndarray): the state ids (int64), indexed by local index.
+        state_indices (Dict[StateId, int]): maps state ids to their local index.
+        row_pointers (np.ndarray): choice offsets of each state (int64, length `number of states + 1`).
+        choice_pointers (np.ndarray): transition offsets of each choice (int64, length `number of choices + 1`).
+        choice_commands (np.ndarray): the position of a command that generated the choice in the InputProgram's command list (int64), or -1.
+        successors (np.ndarray): the local index of the successor of each transition (int64).
+        probabilities (np.ndarray): the probability of each transition (float64).
+        exact_probabilities (np.ndarray): the probability of each transition as a `Fraction` (object).
+        goal_mask (np.ndarray): which states are goal states (bool).
+        terminal_mask (np.ndarray): which states are terminal states (bool). Always False for frontier states.
+        explored_mask (np.ndarray): False for frontier states, i.e. states whose successors are unknown (bool).
+            This is True for all goal and terminal states.
+    """
+    state_ids: np.ndarray
+    state_indices: Dict[StateId, int]
+    row_pointers: np.ndarray
+    choice_pointers: np.ndarray
+    choice_commands: np.ndarray
+    successors: np.ndarray
+    probabilities: np.ndarray
+    exact_probabilities: np.ndarray
+    goal_mask: np.ndarray
+    terminal_mask: np.ndarray
+    explored_mask: np.ndarray
+
+    @property
+    def number_of_states(self) -> int:
+        return len(self.state_ids)
+
+    @property
+    def number_of_choices(self) -> int:
+        return len(self.choice_commands)
+
+    def choice_states(self) -> np.ndarray:
+        """
+        Return the local index of the state each choice belongs to.
+        """
+        return np.repeat(np.arange(self.number_of_states, dtype=np.int64), np.diff(self.row_pointers))
+
+    def transition_choices(self) -> np.ndarray:
+        """
+        Return the choice each transition belongs to.
+        """
+        return np.repeat(np.arange(self.number_of_choices, dtype=np.int64), np.diff(self.choice_pointers))
+
+
+# Bits of the per-state flags in StateGraph._state_flags.
+_GOAL_KNOWN = 1
+_GOAL = 2
+_TERMINAL_KNOWN = 4
+_TERMINAL = 8
+
+
 class StateGraphChoice:
     """
     A choice as a result of a nondeterministic program.
@@ -47,10 +118,21 @@ class StateGraphChoice:
         distribution (StateDistribution): the probability distribution associated with this choice.
     """
 
-    def __init__(self, input_program: InputProgram, choice: stormpy.GeneratorChoice):
-        # pylint: disable=cell-var-from-loop
-        self.origins = [next(filter(lambda command: command.global_index == global_index, input_program.module.commands)) for global_index in choice.origins]
-        self.distribution = choice.distribution
+    __slots__ = ("origins", "distribution")
+
+    def __init__(self, origins: List[InputCommand], distribution: StateDistribution):
+        self.origins = origins
+        self.distribution = distribution
+
+    @staticmethod
+    def from_generator_choices(input_program: InputProgram, choices: Iterable[stormpy.GeneratorChoice]) -> List['StateGraphChoice']:
+        """
+        Create the choices for all of storm's choices of an expanded state.
+        The origins are looked up in the module's `commands_by_global_index`.
+        """
+        commands = input_program.module.commands_by_global_index
+        return [StateGraphChoice([commands[global_index] for global_index in choice.origins], choice.distribution)
+                for choice in choices]
 
 class StateGraphBehavior(Sequence):
     """
@@ -62,6 +144,8 @@ class StateGraphBehavior(Sequence):
         choices (List[StateGraphChoice]): the choices that can be done from a state.
     """
 
+    __slots__ = ("_input_program", "choices")
+
     def __init__(self, input_program: InputProgram, choices: List[StateGraphChoice]):
         self._input_program = input_program
         self.choices = choices
@@ -119,8 +203,15 @@ class StateGraph:
     """
     Interactive exploration of the state graph of an InputProgram.
 
+    State valuations are stored in a dense table with one int array per variable (booleans are stored as 0/1),
+    indexed by state id. The Z3 representations of valuations are created lazily and cached.
+    Whether a state is a goal state or a terminal state is computed at most once per state and
+    stored in a compact table of bit flags.
+
     Attributes:
         input_program (InputProgram): The program this graph is for.
+        valuation_variables (List[InputVariable]): The variables of a state valuation, in the order of the columns of the valuation table.
+        probabilities (ProbabilityTable): The transition probabilities seen so far, see :py:mod:`pric3.probability_table`.
     """
     def __init__(self, input_program: InputProgram):
         self.input_program = input_program
@@ -128,43 +219,108 @@ class StateGraph:
             input_program.prism_program)
         self._successors_filtered_cache: Dict[StateId, StateGraphBehavior] = dict()
 
+        self.valuation_variables: List[InputVariable] = list(input_program.module.variables.values())
+        self._valuation_column: Dict[str, int] = {var.name: column for column, var in enumerate(self.valuation_variables)}
+        self._is_boolean_column = [var in input_program.module.boolean_variables for var in self.valuation_variables]
+        self._valuation_table: List[array] = [array('q') for _ in self.valuation_variables]
+        self._valuation_known = bytearray()
+        self._z3_values: Dict[Tuple[int, int], z3.ExprRef] = dict()
+        self._z3_valuations: Dict[StateId, Dict[InputVariable, z3.ExprRef]] = dict()
+        self._z3_state_args: Dict[StateId, Tuple[z3.BoolRef, ...]] = dict()
+        self._state_flags = bytearray()
+        self.probabilities = ProbabilityTable()
+
     def get_initial_state_id(self) -> StateId:
         """
         Return the initial state's ID.
         """
         return self.state_generator.load_initial_state()
 
-    def _get_state_valuation_list(self, state_id: StateId) -> List[Tuple[stormpy.PrismVariable, z3.ExprRef]]:
+    def _load_state_valuation(self, state_id: StateId):
+        """
+        Write the valuation of the given state into the valuation table.
+        """
+        missing = state_id + 1 - len(self._valuation_known)
+        if missing > 0:
+            self._valuation_known.extend(bytes(missing))
+            for values in self._valuation_table:
+                values.frombytes(bytes(missing * values.itemsize))
+
         self.state_generator.load(state_id)
         storm_valuation = self.state_generator.current_state_to_valuation()
         all_valuations = concat_generators(
             storm_valuation.boolean_values.items(),
             storm_valuation.integer_values.items())
-        all_valuations = filter(
-            lambda pair: pair[0].name not in self.input_program.constants,
-            all_valuations)
-        return all_valuations
+        for var, value in all_valuations:
+            column = self._valuation_column.get(var.name)
+            # constants are not part of the valuation
+            if column is not None:
+                self._valuation_table[column][state_id] = int(value)
+        self._valuation_known[state_id] = 1
+
+    def get_valuation_column(self, variable: InputVariable) -> int:
+        """
+        Return the position of the variable in the tuples returned by `get_state_int_valuation`.
+        """
+        return self._valuation_column[variable.name]
+
+    def get_state_int_valuation(self, state_id: StateId) -> Tuple[int, ...]:
+        """
+        Return the valuation of the given state as a tuple of ints (ordered like `valuation_variables`).
+        Booleans are represented as 0 and 1.
+        """
+        if state_id >= len(self._valuation_known) or not self._valuation_known[state_id]:
+            self._load_state_valuation(state_id)
+        return tuple(values[state_id] for values in self._valuation_table)
+
+    def _to_z3_value(self, column: int, value: int) -> z3.ExprRef:
+        z3_value = self._z3_values.get((column, value))
+        if z3_value is None:
+            if self._is_boolean_column[column]:
+                z3_value = z3.BoolVal(bool(value))
+            else:
+                z3_value = self.input_program.module.translate_expression(value)
+            self._z3_values[(column, value)] = z3_value
+        return z3_value
 
     def get_state_valuation(self, state_id: StateId
                             ) -> Dict[InputVariable, z3.ExprRef]:
         """
         Return a dict that maps variables to Z3 expressions for the given state ID.
-        """
-        all_valuations = self._get_state_valuation_list(state_id)
 
-        return {
-            self.input_program.module.lookup_variable(var):
-            self.input_program.module.translate_expression(value)
-            for var, value in all_valuations
-        }
+        The dict is cached and must not be modified.
+        """
+        valuation = self._z3_valuations.get(state_id)
+        if valuation is None:
+            int_valuation = self.get_state_int_valuation(state_id)
+            valuation = {
+                var: self._to_z3_value(column, int_valuation[column])
+                for column, var in enumerate(self.valuation_variables)
+            }
+            self._z3_valuations[state_id] = valuation
+        return valuation
+
+    def get_state_args(self, state_id: StateId) -> Tuple[z3.BoolRef, ...]:
+        """
+        Return the state args (see `pric3.utils.state_valuation_to_z3_check_args`) for the given state ID.
+        The result is cached.
+        """
+        state_args = self._z3_state_args.get(state_id)
+        if state_args is None:
+            state_args = tuple(eq_no_coerce(var.variable, val) for var, val in self.get_state_valuation(state_id).items())
+            self._z3_state_args[state_id] = state_args
+        return state_args
 
     def get_successors(self, state_id: StateId) -> StateGraphBehavior:
         """
         Generate the successor states of a state.
         """
         self.state_generator.load(state_id)
-        choices = [StateGraphChoice(self.input_program, choice) for choice in self.state_generator.expand()]
-        return StateGraphBehavior(self.input_program, choices)
+        choices = StateGraphChoice.from_generator_choices(self.input_program, self.state_generator.expand())
+        behavior = StateGraphBehavior(self.input_program, choices)
+        # We get the terminal flag for free with each expansion.
+        self._set_flag(state_id, _TERMINAL_KNOWN, _TERMINAL, self._is_terminal_behavior(state_id, behavior))
+        return behavior
 
     def get_successor_distribution(self, state_id: StateId) -> StateDistribution:
         """
@@ -179,19 +335,20 @@ class StateGraph:
 
     def filter_choice(self, choice: StateGraphChoice):
         """
-        Changes the choice's distribution in two ways:
+        Changes the choice's distribution in three ways:
             * goal states are mapped to ID -1,
-            * terminal states are not included in the the distributions.
+            * terminal states are not included in the the distributions,
+            * probabilities are replaced by the z3 rationals from `probabilities`.
         """
         def gen_distribution():
             # pylint: disable=cell-var-from-loop
             for succ_id, prob in choice.distribution:
                 # goal states get ID = -1
                 if self.is_goal_state(succ_id):
-                    yield (-1, prob)
+                    yield (-1, self.probabilities.to_z3(prob))
                 # filter terminal states
                 elif not self.is_terminal_state(succ_id):
-                    yield (succ_id, prob)
+                    yield (succ_id, self.probabilities.to_z3(prob))
 
         choice.distribution = list(gen_distribution())
 
@@ -216,25 +373,157 @@ class StateGraph:
         """
         return self.get_successors_filtered(state_id).extract_deterministic()
 
+    def _get_flag(self, state_id: StateId, known_bit: int, value_bit: int):
+        """
+        Return the flag's value, or None if it was not computed yet.
+        """
+        if state_id >= len(self._state_flags):
+            return None
+        flags = self._state_flags[state_id]
+        if not flags & known_bit:
+            return None
+        return bool(flags & value_bit)
+
+    def _set_flag(self, state_id: StateId, known_bit: int, value_bit: int, value: bool):
+        missing = state_id + 1 - len(self._state_flags)
+        if missing > 0:
+            self._state_flags.extend(bytes(missing))
+        self._state_flags[state_id] |= known_bit | (value_bit if value else 0)
+
     def is_goal_state(self, state_id: StateId) -> bool:
         """
         Checks whether this is a goal state.
         """
-        self.state_generator.load(state_id)
-        return self.state_generator.current_state_satisfies(
-            self.input_program.prism_goal)
+        is_goal = self._get_flag(state_id, _GOAL_KNOWN, _GOAL)
+        if is_goal is None:
+            self.state_generator.load(state_id)
+            is_goal = self.state_generator.current_state_satisfies(
+                self.input_program.prism_goal)
+            self._set_flag(state_id, _GOAL_KNOWN, _GOAL, is_goal)
+        return is_goal
 
     def is_terminal_state(self, state_id: StateId) -> bool:
         """
         Checks whether this state is terminal, i.e. it has a self-loop with probability one in each successor choice.
         """
-        behavior = self.get_successors(state_id)
+        is_terminal = self._get_flag(state_id, _TERMINAL_KNOWN, _TERMINAL)
+        if is_terminal is None:
+            # get_successors sets the flag
+            self.get_successors(state_id)
+            is_terminal = self._get_flag(state_id, _TERMINAL_KNOWN, _TERMINAL)
+        return is_terminal
+
+    @staticmethod
+    def _is_terminal_behavior(state_id: StateId, behavior: StateGraphBehavior) -> bool:
         for choice in behavior:
             distribution = choice.distribution
             if not (len(distribution) == 0 or (len(distribution) == 1 and distribution[0][0] == state_id)):
                 return False
         return True
 
+    def explore_to_csr(self, limit: Optional[int] = None) -> ExplicitStateSpace:
+        """
+        Explore the state space in breadth-first order starting from the initial state
+        and return it as an :py:class:`ExplicitStateSpace`.
+
+        Unlike `get_successors`, this does not create `StateGraphChoice` objects and works on storm's choices directly.
+        The goal and terminal flags of all explored states are recorded as a side effect.
+
+        Parameters:
+            limit: the maximum number of states to expand. Successors of the last expanded states are included as frontier states.
+                   If None, the whole reachable state space is explored.
+        """
+        return self._build_csr([self.get_initial_state_id()], limit=limit, expand_successors=True)
+
+    def states_to_csr(self, state_ids: Iterable[StateId]) -> ExplicitStateSpace:
+        """
+        Return the :py:class:`ExplicitStateSpace` in which exactly the given states are expanded
+        (unless they are goal or terminal states). The given states get the first local indices, in the given order.
+
+        All other successors are frontier states, but are classified as goal and terminal states
+        (i.e. the masks agree with `get_successors_filtered`).
+        """
+        return self._build_csr(state_ids, limit=None, expand_successors=False)
+
+    def _build_csr(self, start_state_ids: Iterable[StateId], *, limit: Optional[int], expand_successors: bool) -> ExplicitStateSpace:
+        commands = self.input_program.module.commands_by_global_index
+
+        state_ids: List[StateId] = []
+        state_indices: Dict[StateId, int] = dict()
+        for state_id in start_state_ids:
+            if state_id not in state_indices:
+                state_indices[state_id] = len(state_ids)
+                state_ids.append(state_id)
+        number_of_start_states = len(state_ids)
+
+        row_pointers = [0]
+        choice_pointers = [0]
+        choice_commands: List[int] = []
+        successors: List[int] = []
+        probabilities: List[float] = []
+        exact_probabilities: List[Fraction] = []
+        goal_mask = bytearray()
+        terminal_mask = bytearray()
+        explored_mask = bytearray()
+
+        expanded = 0
+        # state_ids is the breadth-first queue, index is the next state to process
+        index = 0
+        while index < len(state_ids):
+            state_id = state_ids[index]
+            is_goal = self.is_goal_state(state_id)
+            goal_mask.append(is_goal)
+
+            if is_goal or (limit is not None and expanded >= limit) or (not expand_successors and index >= number_of_start_states):
+                is_terminal = not is_goal and not expand_successors and self.is_terminal_state(state_id)
+                terminal_mask.append(is_terminal)
+                explored_mask.append(is_goal or is_terminal)
+                row_pointers.append(len(choice_commands))
+                index += 1
+                continue
+
+            expanded += 1
+            self.state_generator.load(state_id)
+            # copy the choices before loading any other state
+            choices = [(choice.origins, list(choice.distribution)) for choice in self.state_generator.expand()]
+            is_terminal = all(len(distribution) == 0 or (len(distribution) == 1 and distribution[0][0] == state_id)
+                              for _, distribution in choices)
+            self._set_flag(state_id, _TERMINAL_KNOWN, _TERMINAL, is_terminal)
+            terminal_mask.append(is_terminal)
+            explored_mask.append(True)
+
+            if not is_terminal:
+                for origins, distribution in choices:
+                    choice_commands.append(min((commands[global_index].position for global_index in origins), default=-1))
+                    for succ_id, prob in distribution:
+                        succ_index = state_indices.get(succ_id)
+                        if succ_index is None:
+                            succ_index = len(state_ids)
+                            state_indices[succ_id] = succ_index
+                            state_ids.append(succ_id)
+                        successors.append(succ_index)
+                        probability_id = self.probabilities.intern(prob)
+                        probabilities.append(self.probabilities.float_value(probability_id))
+                        exact_probabilities.append(self.probabilities.fraction(probability_id))
+                    choice_pointers.append(len(successors))
+            row_pointers.append(len(choice_commands))
+            index += 1
+
+        exact_array = np.empty(len(exact_probabilities), dtype=object)
+        exact_array[:] = exact_probabilities
+        return ExplicitStateSpace(
+            state_ids=np.array(state_ids, dtype=np.int64),
+            state_indices=state_indices,
+            row_pointers=np.array(row_pointers, dtype=np.int64),
+            choice_pointers=np.array(choice_pointers, dtype=np.int64),
+            choice_commands=np.array(choice_commands, dtype=np.int64),
+            successors=np.array(successors, dtype=np.int64),
+            probabilities=np.array(probabilities, dtype=np.float64),
+            exact_probabilities=exact_array,
+            goal_mask=np.frombuffer(goal_mask, dtype=np.uint8).astype(np.bool_),
+            terminal_mask=np.frombuffer(terminal_mask, dtype=np.uint8).astype(np.bool_),
+            explored_mask=np.frombuffer(explored_mask, dtype=np.uint8).astype(np.bool_))
+
     def to_dot(self, node_limit: int, *, view: bool = False, show_state_valuations: bool = False) -> Digraph:
         """
         Create a graphviz Digraph from the state space.
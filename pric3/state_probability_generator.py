@@ -8,13 +8,14 @@ from pric3.oracles.exact_oracle import ExactOracle
 from pric3.oracles.model_checking_oracle import ModelCheckingOracle
 from pric3.oracles.solve_eqs_partly_oracle import SolveEQSPartlyOracle
 from pric3.oracles.file_oracle import FileOracle
-from pric3.proof_obligations.repushing_obligation_queue import RepushingObligationQueue
+from pric3.oracles.oracle_cache import CACHEABLE_ORACLE_TYPES
+from pric3.proof_obligations.obligation_store import ObligationStore
 
 logger = logging.getLogger(__name__)
 
 class StateProbabilityGenerator:
 
-    def __init__(self, state_graph, statistics, settings, model_type):
+    def __init__(self, state_graph, statistics, settings, model_type, obligation_store: ObligationStore):
         self.statistics = statistics
         self.state_graph = state_graph
         self.model_type = model_type
@@ -32,7 +33,8 @@ class StateProbabilityGenerator:
         self._realval_zero = RealVal(0)
         self._realval_one = RealVal(1)
 
-        self.obligation_queue_class = settings.get_obligation_queue_class()
+        # The smallest probabilities of the obligations of the current run
+        self.obligation_store = obligation_store
 
     def _initialize_oracle(self, settings):
 
@@ -51,7 +53,11 @@ class StateProbabilityGenerator:
             self.oracle = FileOracle(*args)
         else:
             raise RuntimeError("Unclear which oracle to use.")
-        self.oracle.initialize()
+
+        if settings.oracle_cache is not None and settings.oracle_type in CACHEABLE_ORACLE_TYPES:
+            self.oracle.initialize_cached(settings.oracle_cache)
+        else:
+            self.oracle.initialize()
 
         self.statistics.stop_initialize_oracle_timer()
 
@@ -72,6 +78,7 @@ class StateProbabilityGenerator:
 
         :param state_id: 
         :param delta: 
+        :param states_with_fixed_probabilities: the states whose probability is fixed to the smallest probability of their obligations, e.g. an ObligationHistory
         :return: (1) True iff it is possible to find probabilities for the successors of the given state_id and delta.
                  (2) If True, then it returns a dict form succ_ids to probabilities. This dict does not contain goal states.
         """
@@ -111,17 +118,23 @@ class StateProbabilityGenerator:
                 self.opt_solver.add(vars[succ_id] <= self._realval_one)
 
         # \Phi(F)[s] = delta constraint
-        # TODO: Type of porb is pycarl.gmp.gmp.Rational. Z3 magically deals with this
+        # prob is a z3 rational from the state graph's probability table
         self.opt_solver.add(
             Sum([
-                (vars[succ_id] if succ_id != -1 else RealVal(1)) * prob
+                (vars[succ_id] if succ_id != -1 else self._realval_one) * prob
                 # Note: Keep in mind that you need to check whether succ is a target state
                 for (succ_id, prob) in succ_dist
             ]) == delta)
 
-        for (succ_id, prob) in succ_dist:
-            if succ_id in states_with_fixed_probabilities:
-                self.opt_solver.add(vars[succ_id] == self.obligation_queue_class.smallest_probability_for_state[succ_id])
+        # The fixed states may be an ObligationHistory, which is walked once instead of once per successor.
+        # The walk stops when all successors were found, otherwise it takes time linear in the length of the history.
+        unfixed_succ_ids = set(vars.keys())
+        for succ_id in states_with_fixed_probabilities:
+            if succ_id in unfixed_succ_ids:
+                unfixed_succ_ids.remove(succ_id)
+                self.opt_solver.add(vars[succ_id] == self.obligation_store[succ_id])
+                if not unfixed_succ_ids:
+                    break
 
 
         # If we have more than one non-target successor, we have to optimize
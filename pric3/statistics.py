@@ -1,4 +1,6 @@
 # pylint: disable-all
+import math
+from fractions import Fraction
 import time
 import pickle
 from pric3.utils import create_binary_file_with_incremental_name, unpickle_all_in_directory
@@ -13,7 +15,12 @@ from z3 import sat, unsat, unknown
 
 class Pric3SolverStatistics:
     """
+    Statistics for the relative inductiveness checks.
 
+    The fastest and slowest sat/unsat queries are recorded as SMT2 text.
+    If `query_capture` is "deferred", only a :py:class:`pric3.pric3_solver.QueryHandle` is stored for each of them
+    and the text is produced once by :py:meth:`materialize_queries`.
+    With "off", no queries are recorded at all.
     """
     def __init__(self):
         self.check_relative_inductive_counter_inductive = 0
@@ -26,6 +33,14 @@ class Pric3SolverStatistics:
         self.fast_unsat_query: Tuple[float, str] = (float('inf'), "")
         self.slow_unsat_query: Tuple[float, str] = (float('-inf'), "")
         self.unknown_query: Optional[str] = None
+        self.solver_backend: Optional[str] = None
+        self.query_capture = "eager"
+        # Maps the decimal exponent e to the number of queries that took [10^e, 10^(e+1)) seconds.
+        self.query_latency_histogram: Dict[int, int] = dict()
+        self.inductiveness_cache_hits_inductive = 0
+        self.inductiveness_cache_hits_not_inductive = 0
+        self.inductiveness_cache_misses = 0
+        self.counterexample_pool_hits = 0
 
     def start_check_relative_inductiveness_timer(self):
         assert self._check_relative_inductiveness_timer is None
@@ -33,14 +48,38 @@ class Pric3SolverStatistics:
 
     def stop_check_relative_inductiveness_timer(self, is_inductive):
         assert self._check_relative_inductiveness_timer is not None
-        time_passed = time.time() - self._check_relative_inductiveness_timer
+        self.add_check_relative_inductiveness_time(time.time() - self._check_relative_inductiveness_timer, is_inductive)
+        self._check_relative_inductiveness_timer = None
+
+    def add_check_relative_inductiveness_time(self, time_passed: float, is_inductive: bool):
+        """
+        Count a check that was not timed with the timer, e.g. one that ran on a worker process.
+        """
         if is_inductive:
             self.check_relative_inductive_time_inductive += time_passed
             self.check_relative_inductive_counter_inductive += 1
         else:
             self.check_relative_inductive_time_not_inductive += time_passed
             self.check_relative_inductive_counter_not_inductive += 1
-        self._check_relative_inductiveness_timer = None
+
+    def inc_inductiveness_cache_hits(self, is_inductive: bool):
+        if is_inductive:
+            self.inductiveness_cache_hits_inductive += 1
+        else:
+            self.inductiveness_cache_hits_not_inductive += 1
+
+    def inc_inductiveness_cache_misses(self, number: int = 1):
+        self.inductiveness_cache_misses += number
+
+    def inc_counterexample_pool_hits(self):
+        self.counterexample_pool_hits += 1
+
+    @property
+    def inductiveness_cache_hit_rate(self):
+        hits = self.inductiveness_cache_hits_inductive + self.inductiveness_cache_hits_not_inductive
+        if hits + self.inductiveness_cache_misses == 0:
+            return 0
+        return hits / (hits + self.inductiveness_cache_misses)
 
     @property
     def check_relative_inductive_counter(self):
@@ -50,25 +89,87 @@ class Pric3SolverStatistics:
     def check_relative_inductive_time(self):
         return self.check_relative_inductive_time_inductive + self.check_relative_inductive_time_not_inductive
 
-    def add_query(self, solver, time_seconds: float, result):
+    @property
+    def average_check_relative_inductive_time(self):
+        if self.check_relative_inductive_counter == 0:
+            return 0
+        return self.check_relative_inductive_time / self.check_relative_inductive_counter
+
+    def add_query(self, query_handle, time_seconds: float, result):
+        bucket = _latency_bucket(time_seconds)
+        self.query_latency_histogram[bucket] = self.query_latency_histogram.get(bucket, 0) + 1
+
+        if self.query_capture == "off":
+            return
+
         if result == sat:
             if time_seconds < self.fast_sat_query[0]:
-                self.fast_sat_query = (time_seconds, solver.sexpr())
+                self.fast_sat_query = (time_seconds, self._capture(query_handle))
             if time_seconds > self.slow_sat_query[0]:
-                self.slow_sat_query = (time_seconds, solver.sexpr())
+                self.slow_sat_query = (time_seconds, self._capture(query_handle))
         if result == unsat:
             if time_seconds < self.fast_unsat_query[0]:
-                self.fast_unsat_query = (time_seconds, solver.sexpr())
+                self.fast_unsat_query = (time_seconds, self._capture(query_handle))
             if time_seconds > self.slow_unsat_query[0]:
-                self.slow_unsat_query = (time_seconds, solver.sexpr())
+                self.slow_unsat_query = (time_seconds, self._capture(query_handle))
         if result == unknown and self.unknown_query is None:
-            self.unknown_query = solver.sexpr()
+            self.unknown_query = self._capture(query_handle)
+
+    def _capture(self, query_handle):
+        if self.query_capture == "deferred":
+            return query_handle
+        return query_handle.materialize()
+
+    def materialize_queries(self):
+        """
+        Replace all deferred query handles by their SMT2 text. Must be called before pickling.
+        """
+        def _materialize(query):
+            return query if query is None or isinstance(query, str) else query.materialize()
+
+        self.fast_sat_query = (self.fast_sat_query[0], _materialize(self.fast_sat_query[1]))
+        self.slow_sat_query = (self.slow_sat_query[0], _materialize(self.slow_sat_query[1]))
+        self.fast_unsat_query = (self.fast_unsat_query[0], _materialize(self.fast_unsat_query[1]))
+        self.slow_unsat_query = (self.slow_unsat_query[0], _materialize(self.slow_unsat_query[1]))
+        self.unknown_query = _materialize(self.unknown_query)
+
+    def format_latency_histogram(self) -> str:
+        return ", ".join("[1e%s, 1e%s): %s" % (bucket, bucket + 1, count)
+                         for bucket, count in sorted(self.query_latency_histogram.items()))
+
+
+def _latency_bucket(time_seconds: float) -> int:
+    """
+    Return the decimal exponent of the histogram bucket for a query latency.
+
+    .. doctest::
+
+        >>> _latency_bucket(0.005)
+        -3
+        >>> _latency_bucket(12)
+        1
+    """
+    if time_seconds <= 0:
+        return -9
+    return max(-9, math.floor(math.log10(time_seconds)))
 
 class Statistics:
     """
     Statistics for the PrIC3 loop.
     """
 
+    # The counters, timers and results of a run, which merge_portfolio takes from the winning worker.
+    # New counters have to be added here to be kept for portfolio runs.
+    _RESULT_FIELDS = ("made_no_progress_in_oracle_states_after_bellman_counter", "frame_push_time", "smt_oracle_solver_time",
+                      "total_time", "solved_eq_system_instead_of_optimization_counter", "had_to_solve_optimization_problem_counter",
+                      "get_probability_counter", "get_probability_time", "refine_oracle_counter", "number_oracle_states",
+                      "considered_states", "number_considered_states", "propagation_counter", "propagation_time",
+                      "cache_states_of_same_kind_time", "pric3solverstats", "property_holds", "initialize_oracle_time",
+                      "oracle_value_iteration_time", "oracle_value_iteration_iterations", "oracle_upper_bound_verified_counter",
+                      "oracle_cache_status", "simulation_samples", "simulation_interval_widths", "batched_obligation_checks",
+                      "batched_obligation_rechecks", "merged_obligations", "discarded_obligations", "obligation_queue_saved_checks",
+                      "inductiveness_verified", "check_refutation_time")
+
     def __init__(self, args: Dict[str, Any]):
         self.command_str = " ".join(map(shlex.quote, sys.argv))
         self.start_timestamp = datetime.now()
@@ -91,6 +192,22 @@ class Statistics:
         self.args = args
         self.property_holds = None
         self.initialize_oracle_time = 0
+        self.oracle_value_iteration_time = 0
+        self.oracle_value_iteration_iterations = 0
+        self.oracle_upper_bound_verified_counter = 0
+        self.oracle_cache_status: Optional[str] = None
+        self.simulation_samples = 0
+        self.simulation_interval_widths: Dict[StateId, float] = dict()
+        self.batched_obligation_checks = 0
+        self.batched_obligation_rechecks = 0
+        self.merged_obligations = 0
+        self.discarded_obligations = 0
+        # Maps the name of a prioritized obligation queue class to the checks its order saved, see
+        # :py:meth:`pric3.proof_obligations.prioritized_obligation_queue.PrioritizedObligationQueue.checks_saved_by_order`
+        self.obligation_queue_saved_checks: Dict[str, int] = dict()
+        self.threshold_results: Dict[str, bool] = dict()
+        self.portfolio_winner: Optional[int] = None
+        self.portfolio_workers: List[Dict[str, Any]] = []
         self.status = "started"
         self.inductiveness_verified = "Unkown"
         self.check_refutation_time = 0
@@ -113,6 +230,63 @@ class Statistics:
     def inc_refine_oracle_counter(self):
         self.refine_oracle_counter += 1
 
+    def add_oracle_value_iteration_iterations(self, iterations: int):
+        self.oracle_value_iteration_iterations += iterations
+
+    def inc_oracle_upper_bound_verified_counter(self):
+        self.oracle_upper_bound_verified_counter += 1
+
+    def set_simulation_interval_widths(self, samples: int, widths: Dict[StateId, float]):
+        """
+        Record the number of walks of the adaptive simulation oracle so far,
+        and the latest confidence interval widths of the states it watched.
+        """
+        self.simulation_samples = samples
+        self.simulation_interval_widths.update(widths)
+
+    def add_threshold_result(self, threshold: Fraction, holds: bool):
+        """
+        Record the result of one run of a threshold sweep.
+        """
+        self.threshold_results[str(threshold)] = holds
+
+    def merge_portfolio(self, configs: List[Dict[str, Any]], worker_statistics: List[Optional['Statistics']], winner: Optional[int]):
+        """
+        Merge the statistics of the workers of a portfolio run (see :py:mod:`pric3.portfolio`).
+        The counters and timers are taken from the winning worker, and a summary of every worker is kept in `portfolio_workers`.
+        """
+        if winner is not None:
+            winner_statistics = worker_statistics[winner]
+            for name in Statistics._RESULT_FIELDS:
+                setattr(self, name, getattr(winner_statistics, name))
+        self.portfolio_winner = winner
+        self.portfolio_workers = []
+        for config, stats in zip(configs, worker_statistics):
+            summary: Dict[str, Any] = {"settings": {name: str(value) for name, value in config.items()}, "status": "lost"}
+            if stats is not None:
+                summary.update(status=stats.status,
+                               property_holds=stats.property_holds,
+                               total_time=stats.total_time,
+                               check_relative_inductive_counter=stats.check_relative_inductive_counter)
+            self.portfolio_workers.append(summary)
+
+    def add_batched_obligation_checks(self, number: int):
+        self.batched_obligation_checks += number
+
+    def inc_batched_obligation_rechecks(self):
+        self.batched_obligation_rechecks += 1
+
+    def add_obligation_queue_counts(self, merged: int, discarded: int):
+        """
+        Record the pushed obligations an obligation queue merged into an obligation for the same frame and state,
+        and the obligations left in the queue when it was discarded after an oracle refinement or a refutation.
+        """
+        self.merged_obligations += merged
+        self.discarded_obligations += discarded
+
+    def add_obligation_queue_saved_checks(self, obligation_queue_class: str, saved: int):
+        self.obligation_queue_saved_checks[obligation_queue_class] = self.obligation_queue_saved_checks.get(obligation_queue_class, 0) + saved
+
     def inc_get_probability_counter(self):
         self.get_probability_counter += 1
 
@@ -137,15 +311,35 @@ class Statistics:
         print("Inductiveness check time (SMT) for %s checks: %s" % (self.pric3solverstats.check_relative_inductive_counter, self.pric3solverstats.check_relative_inductive_time))
         print("\tof which for %s successful instances: %s" % (self.pric3solverstats.check_relative_inductive_counter_inductive, self.pric3solverstats.check_relative_inductive_time_inductive))
         print("\tand of which for %s unsuccessful instances: %s" % (self.pric3solverstats.check_relative_inductive_counter_not_inductive, self.pric3solverstats.check_relative_inductive_time_not_inductive))
+        print("Average time per inductiveness check (%s backend): %s" % (self.pric3solverstats.solver_backend, self.pric3solverstats.average_check_relative_inductive_time))
+        print("\tlatency histogram (seconds): %s" % self.pric3solverstats.format_latency_histogram())
+        print("Inductiveness cache hits: %s inductive, %s not inductive, %s misses (hit rate %s)" % (
+            self.pric3solverstats.inductiveness_cache_hits_inductive, self.pric3solverstats.inductiveness_cache_hits_not_inductive,
+            self.pric3solverstats.inductiveness_cache_misses, self.pric3solverstats.inductiveness_cache_hit_rate))
+        print("Checks refuted by a previous counterexample: %s" % self.pric3solverstats.counterexample_pool_hits)
         #print("SMT Solver (oracle) Time: %s" % self.smt_oracle_solver_time)
         print("Frame Push Time: %s" % self.frame_push_time)
-        print("Time to initialize oracle: %s" % self.initialize_oracle_time)
+        print("Time to initialize oracle: %s%s" % (self.initialize_oracle_time, "" if self.oracle_cache_status is None else " (cache %s)" % self.oracle_cache_status))
         print("Time for getting probabilties: %s" % self.get_probability_time)
         print("Calls to get_Probabilities: %s" % self.get_probability_counter)
         print("\tEQ System==Sat: %s" % self.solved_eq_system_instead_of_optimization_counter)
         print("\tHad to solve optimization problem: %s" % self.had_to_solve_optimization_problem_counter)
         print("Number refine_oracle/Check Refutation calls: %s" % self.refine_oracle_counter)
         print("Number oracle states: %s" % self.number_oracle_states)
+        if self.simulation_samples > 0:
+            print("Simulation walks: %s (maximum interval width: %s)" % (self.simulation_samples, max(self.simulation_interval_widths.values(), default=None)))
+        print("Oracle value iteration time: %s (%s iterations, %s verified upper bounds)" % (self.oracle_value_iteration_time, self.oracle_value_iteration_iterations, self.oracle_upper_bound_verified_counter))
+        if len(self.portfolio_workers) > 0:
+            print("Portfolio winner: %s" % self.portfolio_winner)
+            for index, summary in enumerate(self.portfolio_workers):
+                print("\tworker %s: %s" % (index, summary))
+        if len(self.threshold_results) > 0:
+            print("Threshold sweep runs: %s" % self.threshold_results)
+        if self.batched_obligation_checks > 0:
+            print("Obligations checked in batches: %s (%s checked again)" % (self.batched_obligation_checks, self.batched_obligation_rechecks))
+        print("Obligations merged in the queue: %s, discarded with the queue: %s" % (self.merged_obligations, self.discarded_obligations))
+        for obligation_queue_class, saved in self.obligation_queue_saved_checks.items():
+            print("Inductiveness checks saved by the order of the %s: %s" % (obligation_queue_class, saved))
         print("Number propagated assertions: %s" % self.propagation_counter)
         print("Propagation Time: %s" % self.propagation_time)
         print("Time for caching states of the same kind: %s" % self.cache_states_of_same_kind_time)
@@ -195,10 +389,17 @@ class Statistics:
     def stop_initialize_oracle_timer(self):
         self.initialize_oracle_time += time.time() - self.initialize_oracle_timer
 
+    def start_oracle_value_iteration_timer(self):
+        self.oracle_value_iteration_timer = time.time()
+
+    def stop_oracle_value_iteration_timer(self):
+        self.oracle_value_iteration_time += time.time() - self.oracle_value_iteration_timer
+
     def to_file(self, handle: BinaryIO):
         """
         Dump this statistics object into a file using pickle.
         """
+        self.pric3solverstats.materialize_queries()
         pickle.dump(self, handle)
 
     def to_file_incremental(self, filename_pattern: str):
@@ -211,6 +412,7 @@ class Statistics:
         """
         Convert this to a pandas Series.
         """
+        self.pric3solverstats.materialize_queries()
         self_dict = self.__dict__
         self_dict["pric3solverstats"] = self.pric3solverstats.__dict__
         df = json_normalize(self_dict)
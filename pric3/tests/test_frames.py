@@ -0,0 +1,42 @@
+from z3 import Int, RealVal, BoolVal
+
+from pric3.frames import FrameStore
+
+
+def _intern(store, state_id, value):
+    x = Int("x")
+    return store.intern(state_id, (x == state_id,), RealVal(value), lambda: BoolVal(True))
+
+
+def test_intern_is_canonical():
+    store = FrameStore()
+    store.add_frame()
+    first = _intern(store, 0, "1/2")
+    assert _intern(store, 0, "1/2") == first
+    assert _intern(store, 0, "1/3") != first
+    assert _intern(store, 1, "1/2") != first
+
+
+def test_only_in_and_equality():
+    store = FrameStore()
+    store.add_frame()
+    store.add_frame()
+    a = _intern(store, 0, "1/2")
+    b = _intern(store, 1, "1/4")
+
+    assert store.add(2, a) == 0
+    assert store.add(1, a) == 2
+    assert store.level(a) == 2
+    assert store.add(1, b) == 0
+
+    assert store.only_in(1) == [b]
+    assert store.only_in(2) == [a]
+    assert store.contains(1, a) and not store.contains(2, b)
+    assert not store.is_equal_to_next(1)
+
+    assert store.add(2, b) == 1
+    assert store.difference_count(1) == 0
+    assert store.is_equal_to_next(1)
+    assert not store.is_equal_to_next(2)
+    assert [lemma.state_id for lemma in store.lemmas_of(2)] == [0, 1]
+    assert store.size(1) == store.size(2) == 2
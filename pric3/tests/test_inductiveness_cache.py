@@ -0,0 +1,55 @@
+from z3 import And, Int, RealVal, Solver
+
+from pric3.inductiveness_cache import CounterexamplePool, InductivenessCache
+
+
+def _model():
+    solver = Solver()
+    solver.check()
+    return solver.model()
+
+
+def test_inductive_results_hold_for_stronger_frames_and_larger_deltas():
+    cache = InductivenessCache()
+    state_args = (Int("x") == 1,)
+    cache.add(3, state_args, RealVal("1/2"), True, 5)
+
+    assert cache.lookup(2, state_args, RealVal("1/2"), 10) is True
+    assert cache.lookup(3, state_args, RealVal("3/4"), 10) is True
+    assert cache.lookup(4, state_args, RealVal("1/2"), 0) is None
+    assert cache.lookup(3, state_args, RealVal("1/4"), 0) is None
+    assert cache.lookup(0, state_args, RealVal("1/2"), 0) is None
+    assert cache.lookup(3, (Int("x") == 2,), RealVal("1/2"), 0) is None
+
+
+def test_counterexamples_hold_for_unchanged_weaker_frames_and_smaller_deltas():
+    cache = InductivenessCache()
+    state_args = (Int("x") == 1,)
+    model = _model()
+    cache.add(2, state_args, RealVal("1/2"), model, 5)
+
+    assert cache.lookup(3, state_args, RealVal("1/4"), 5) is model
+    assert cache.lookup(3, state_args, RealVal("1/4"), 6) is None
+    assert cache.lookup(1, state_args, RealVal("1/2"), 0) is None
+    assert cache.lookup(2, state_args, RealVal("3/4"), 0) is None
+
+    cache.add(2, state_args, RealVal("1/2"), model, 8)
+    assert len(cache) == 1
+
+
+def test_counterexample_pool_evaluates_queries_in_recent_models():
+    x = Int("x")
+    solver = Solver()
+    solver.add(x > 5)
+    solver.check()
+    model = solver.model()
+
+    pool = CounterexamplePool(2)
+    pool.add(1, model, 3)
+    value = model[x].as_long()
+    assert pool.lookup(1, And(x > 5, x == value), 3) is model
+    assert pool.lookup(1, x < 5, 3) is None
+    assert pool.lookup(2, x > 5, 0) is None
+    # the frame changed since the check
+    assert pool.lookup(1, x > 5, 4) is None
+    assert pool.lookup(1, x > 5, 0) is None
@@ -0,0 +1,93 @@
+from types import SimpleNamespace
+
+from z3 import RealVal
+
+from pric3.proof_obligations.naive_repushing_obligation_queue import NaiveRepushingObligationQueue
+from pric3.proof_obligations.obligation_history import ObligationHistory
+from pric3.proof_obligations.obligation_queue import pop_obligations_at_minimum_frame
+from pric3.proof_obligations.obligation_store import ObligationStore
+from pric3.proof_obligations.prioritized_obligation_queue import DeltaGapObligationQueue, DepthBoundedObligationQueue, \
+    OracleValueObligationQueue
+from pric3.proof_obligations.repushing_obligation_queue import RepushingObligationQueue
+
+
+class _Oracle:
+    def __init__(self, values):
+        self.values = values
+
+    def get_oracle_value(self, state_id):
+        return RealVal(self.values[state_id])
+
+
+def _pop_all(queue):
+    popped = []
+    while not queue.is_empty():
+        (i, s, delta, _history) = queue.pop_obligation()
+        popped.append((i, s, str(delta)))
+    return popped
+
+
+def test_repushing_queue_merges_and_keeps_smallest_delta():
+    queue = RepushingObligationQueue(ObligationStore())
+    queue.push_obligation(2, 5, RealVal("1/2"), ObligationHistory(5))
+    queue.push_obligation(1, 7, RealVal("1/2"), ObligationHistory(7))
+    queue.push_obligation(2, 3, RealVal("1/2"), ObligationHistory(3))
+    queue.push_obligation(2, 5, RealVal("1/4"), ObligationHistory(5))
+    assert queue.merged_pushes == 1
+    assert queue.get_length() == 3
+    assert _pop_all(queue) == [(1, 7, "1/2"), (2, 3, "1/2"), (2, 5, "1/4")]
+
+
+def test_pop_obligations_at_minimum_frame():
+    for queue in [RepushingObligationQueue(ObligationStore()), NaiveRepushingObligationQueue(ObligationStore()),
+                  OracleValueObligationQueue(ObligationStore(), _Oracle({3: "0", 5: "0", 7: "0"}), None)]:
+        queue.push_obligation(2, 5, RealVal("1/2"), ObligationHistory(5))
+        queue.push_obligation(1, 7, RealVal("1/2"), ObligationHistory(7))
+        queue.push_obligation(1, 3, RealVal("1/2"), ObligationHistory(3))
+        # The order within the frame depends on the queue
+        assert {(i, s) for (i, s, _delta, _history) in pop_obligations_at_minimum_frame(queue)} == {(1, 3), (1, 7)}
+        assert {(i, s) for (i, s, _delta, _history) in pop_obligations_at_minimum_frame(queue)} == {(2, 5)}
+        assert queue.is_empty()
+
+
+def test_oracle_value_queue_pops_larger_oracle_values_first():
+    queue = OracleValueObligationQueue(ObligationStore(), _Oracle({0: "1/4", 1: "3/4", 2: "1/2"}), None)
+    for s in [0, 1, 2]:
+        queue.push_obligation(1, s, RealVal("1/8"), ObligationHistory(s))
+    queue.push_obligation(0, 0, RealVal("1/8"), ObligationHistory(0))
+    assert [s for (_i, s, _delta) in _pop_all(queue)] == [0, 1, 2, 0]
+
+
+def test_delta_gap_queue_rekeys_on_smaller_delta():
+    queue = DeltaGapObligationQueue(ObligationStore(), _Oracle({0: "1/2", 1: "1/2"}), None)
+    queue.push_obligation(1, 0, RealVal("1/2"), ObligationHistory(0))
+    queue.push_obligation(2, 0, RealVal("1/2"), ObligationHistory(0))
+    queue.push_obligation(1, 1, RealVal("1/4"), ObligationHistory(1))
+    queue.push_obligation(2, 1, RealVal("1/4"), ObligationHistory(1))
+    # A smaller delta for state 0 (pushed for frame 1) moves its obligations of both frames ahead of state 1
+    queue.push_obligation(1, 0, RealVal("0"), ObligationHistory(0))
+    assert queue.get_length() == 4
+    assert _pop_all(queue) == [(1, 0, "0"), (1, 1, "1/4"), (2, 0, "0"), (2, 1, "1/4")]
+
+
+def test_depth_bounded_queue_pops_shallow_obligations_first():
+    queue = DepthBoundedObligationQueue(ObligationStore(), _Oracle({}), SimpleNamespace(obligation_depth_bound=2))
+    queue.push_obligation(1, 0, RealVal("1/2"), ObligationHistory(4).extend(3).extend(0))
+    queue.push_obligation(1, 1, RealVal("1/2"), ObligationHistory(4).extend(3).extend(2).extend(1))
+    queue.push_obligation(1, 2, RealVal("1/2"), ObligationHistory(2))
+    queue.push_obligation(1, 3, RealVal("1/2"), ObligationHistory(4).extend(3))
+    # Depths 3 and 4 exceed the bound and are ordered by state id
+    assert [s for (_i, s, _delta) in _pop_all(queue)] == [2, 3, 0, 1]
+
+
+def test_checks_saved_by_order():
+    queue = OracleValueObligationQueue(ObligationStore(), _Oracle({0: "1/4", 1: "1/8", 2: "1/2", 3: "0"}), None)
+    for s in [0, 1, 2, 3]:
+        queue.push_obligation(1, s, RealVal("1/8"), ObligationHistory(s))
+    assert queue.pop_obligation()[1] == 2
+    # If state 2 fails, the baseline order would have checked states 0 and 1 first
+    assert queue.checks_saved_by_order(1, 2) == 2
+    assert queue.pop_obligation()[1] == 0
+    assert queue.pop_obligation()[1] == 1
+    # If state 1 fails, the baseline order would have checked state 0 anyway, but not state 2
+    assert queue.checks_saved_by_order(1, 1) == -1
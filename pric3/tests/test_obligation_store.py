@@ -0,0 +1,20 @@
+from fractions import Fraction
+
+from z3 import RealVal
+
+from pric3.proof_obligations.obligation_store import ObligationStore
+
+
+def test_record_keeps_smallest():
+    store = ObligationStore()
+    assert 3 not in store
+    assert store.record(3, RealVal("1/2"))
+    assert not store.record(3, RealVal("2/3"))
+    assert not store.record(3, RealVal("1/2"))
+    assert store.record(3, RealVal("1/3"))
+    assert store.smallest_fraction(3) == Fraction(1, 3)
+    assert store[3].eq(RealVal("1/3"))
+    assert 1 not in store
+
+    store.reset()
+    assert 3 not in store
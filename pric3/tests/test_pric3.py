@@ -1,39 +1,89 @@
 from fractions import Fraction
 
+from z3 import BoolVal, RealVal
+
 from pric3.input_program import InputProgram
+from pric3.oracles.file_oracle import save_oracle_dict
+from pric3.portfolio import run_portfolio
+import pric3.pric3
 from pric3.pric3 import PrIC3
+from pric3.pric3_solver import PRIC3_SOLVER_BACKENDS
 from pric3.settings import Settings
 from pric3.smt_program import SmtProgram, ForallMode
-from pric3.statistics import Statistics
+from pric3.solver_pool import _check_queries
+from pric3.state_graph import StateGraph
+from pric3.statistics import Pric3SolverStatistics, Statistics
+from pric3.threshold_sweep import ThresholdSweep
 from stormpy import parse_prism_program
 
 
-def _run_pric3(filename, threshold):
-    settings = Settings(default_oracle_value=Fraction(0),
-                        check_inductiveness_if_property_holds=True,
-                        check_relative_inductiveness_of_frames=False,
-                        obligation_queue_class="RepushingObligationQueue",
-                        oracle_type="perfect",
-                        number_simulations_for_oracle=100000,
-                        max_number_steps_per_simulation=1000000,
-                        simulator="cpp",
-                        propagate=True,
-                        forall_mode=ForallMode.FORALL_GLOBALS.value,
-                        inline_goal=True,
-                        int_to_real=False,
-                        export_to_smt2=False,
-                        store_smt_calls=False,
-                        generalize=False,
-                        depth_for_partly_solving_lqs=200,
-                        generalization_method="Hybrid",
-                        max_num_ctgs=1,
-                        use_states_of_same_kind=True)
+def _settings(**changed_settings):
+    return Settings(default_oracle_value=Fraction(0),
+                    check_inductiveness_if_property_holds=True,
+                    check_relative_inductiveness_of_frames=False,
+                    obligation_queue_class="RepushingObligationQueue",
+                    oracle_type="perfect",
+                    number_simulations_for_oracle=100000,
+                    max_number_steps_per_simulation=1000000,
+                    simulator="cpp",
+                    propagate=True,
+                    forall_mode=ForallMode.FORALL_GLOBALS.value,
+                    inline_goal=True,
+                    int_to_real=False,
+                    export_to_smt2=False,
+                    store_smt_calls=False,
+                    generalize=False,
+                    depth_for_partly_solving_lqs=200,
+                    generalization_method="Hybrid",
+                    max_num_ctgs=1,
+                    use_states_of_same_kind=True)._replace(**changed_settings)
+
+
+def _run_pric3(filename, threshold, statistics=None, **changed_settings):
+    settings = _settings(**changed_settings)
     prism_program = parse_prism_program(filename)
     input_program = InputProgram(prism_program)
     smt_program = SmtProgram(input_program, settings.get_smt_settings())
-    ic3 = PrIC3(smt_program, Fraction(threshold), settings, Statistics(dict()))
+    ic3 = PrIC3(smt_program, Fraction(threshold), settings, Statistics(dict()) if statistics is None else statistics)
     return ic3.run()
 
+
+def _run_pric3_with_solver_pool(filename, threshold, solver_pool, **changed_settings):
+    """
+    Like _run_pric3, but with the given object in place of the SolverPool.
+    """
+    settings = _settings(solver_workers=2, **changed_settings)
+    prism_program = parse_prism_program(filename)
+    smt_program = SmtProgram(InputProgram(prism_program), settings.get_smt_settings())
+    statistics = Statistics(dict())
+    ic3 = PrIC3(smt_program, Fraction(threshold), settings, statistics)
+    ic3._solver_pool = solver_pool
+    return ic3.run(), statistics
+
+
+class _InProcessSolverPool:
+    """
+    A solver pool that checks the queries like a worker, but in this process.
+    """
+
+    def check(self, assertions, queries, model_constant=None):
+        return _check_queries(assertions, queries, model_constant)
+
+    def shutdown(self):
+        pass
+
+
+class _UnknownSolverPool:
+    """
+    A solver pool whose workers give up on every query.
+    """
+
+    def check(self, assertions, queries, model_constant=None):
+        return [("unknown", 0.0, None)] * len(queries)
+
+    def shutdown(self):
+        pass
+
 def test_grid():
    assert _run_pric3("pric3/prism_models/MCs/grid.pm", "0.3") == True
    assert _run_pric3("pric3/prism_models/MCs/grid.pm", "0.2") == True
@@ -41,3 +91,142 @@ def test_grid():
 
 def test_chain():
     _run_pric3("pric3/prism_models/MCs/chain.pm", "0.8")
+
+
+def test_grid_activation_literals():
+   assert _run_pric3("pric3/prism_models/MCs/grid.pm", "0.3", solver_backend="activation") == True
+
+
+def test_grid_refuted_per_solver_backend():
+   # the probability to reach the goal is about 0.0326
+   for solver_backend in PRIC3_SOLVER_BACKENDS:
+      assert _run_pric3("pric3/prism_models/MCs/grid.pm", "0.03", solver_backend=solver_backend) == False
+
+
+def test_grid_activation_literals_generalize():
+   # the activation literals are assumptions of the oneshot solver used for generalization
+   settings = dict(solver_backend="activation", generalize=True, int_to_real=True, generalization_method="Linear")
+   assert _run_pric3("pric3/prism_models/MCs/grid.pm", "0.3", **settings) == True
+   # the probability to reach the goal is about 0.0326
+   assert _run_pric3("pric3/prism_models/MCs/grid.pm", "0.03", **settings) == False
+
+
+def test_grid_parallel_propagation():
+   assert _run_pric3("pric3/prism_models/MCs/grid.pm", "0.3", solver_workers=2) == True
+   assert _run_pric3("pric3/prism_models/MCs/grid.pm", "0.3", solver_workers=2, solver_backend="activation") == True
+   assert _run_pric3("pric3/prism_models/MCs/grid.pm", "0.3", solver_workers=2, batch_strengthen=True) == True
+
+
+def test_grid_parallel_propagation_refuted():
+   for solver_backend in PRIC3_SOLVER_BACKENDS:
+      assert _run_pric3("pric3/prism_models/MCs/grid.pm", "0.03", solver_workers=2, solver_backend=solver_backend) == False
+
+
+def test_grid_solver_pool_fallback(monkeypatch):
+   # send every candidate to the pool, whose inconclusive results are checked again on the main solver
+   monkeypatch.setattr(pric3.pric3, "MIN_PARALLEL_CANDIDATES", 1)
+   for threshold, expected in [("0.3", True), ("0.03", False)]:
+      result, statistics = _run_pric3_with_solver_pool("pric3/prism_models/MCs/grid.pm", threshold, _UnknownSolverPool())
+      assert result == expected
+      assert statistics.check_relative_inductive_counter > 0
+
+
+def test_grid_batch_strengthen_refuted():
+   for solver_backend in PRIC3_SOLVER_BACKENDS:
+      assert _run_pric3("pric3/prism_models/MCs/grid.pm", "0.03", solver_workers=2, batch_strengthen=True,
+                        solver_backend=solver_backend) == False
+
+
+def test_grid_batch_strengthen_in_process(monkeypatch):
+   monkeypatch.setattr(pric3.pric3, "MIN_PARALLEL_CANDIDATES", 1)
+   for threshold, expected in [("0.3", True), ("0.03", False)]:
+      result, statistics = _run_pric3_with_solver_pool("pric3/prism_models/MCs/grid.pm", threshold, _InProcessSolverPool(),
+                                                       batch_strengthen=True)
+      assert result == expected
+      # the first obligation is for frame 1, so at least that one is checked in a batch
+      assert statistics.batched_obligation_checks > 0
+      assert statistics.batched_obligation_rechecks <= statistics.batched_obligation_checks
+
+
+def test_batch_rechecks_after_frame_changes():
+   # A counterexample from a batch check is only used if the frame did not change since the check
+   settings = _settings()
+   smt_program = SmtProgram(InputProgram(parse_prism_program("pric3/prism_models/MCs/grid.pm")), settings.get_smt_settings())
+   for solver_class in PRIC3_SOLVER_BACKENDS.values():
+      p_solver = solver_class(smt_program, Pric3SolverStatistics(), False, settings)
+      for _ in range(3):
+         p_solver.add_new_solver()
+      watermark = p_solver.lemma_log_watermark()
+      assert not p_solver.frame_changed_since(1, watermark)
+      # a lemma with level 2 belongs to F_1 and F_2, but not to F_3
+      p_solver.add_lemma(BoolVal(True), 0, 2)
+      assert p_solver.frame_changed_since(1, watermark)
+      assert p_solver.frame_changed_since(2, watermark)
+      assert not p_solver.frame_changed_since(3, watermark)
+
+
+def test_grid_obligation_queue_policies():
+   for obligation_queue_class in ["OracleValueObligationQueue", "DeltaGapObligationQueue", "DepthBoundedObligationQueue"]:
+      assert _run_pric3("pric3/prism_models/MCs/grid.pm", "0.3", obligation_queue_class=obligation_queue_class) == True
+   assert _run_pric3("pric3/prism_models/MCs/grid.pm", "0.3", obligation_queue_class="DepthBoundedObligationQueue", obligation_depth_bound=2) == True
+
+
+def test_grid_obligation_queue_policies_refuted():
+   for obligation_queue_class in ["OracleValueObligationQueue", "DeltaGapObligationQueue", "DepthBoundedObligationQueue"]:
+      statistics = Statistics(dict())
+      assert _run_pric3("pric3/prism_models/MCs/grid.pm", "0.03", statistics, obligation_queue_class=obligation_queue_class) == False
+      # the refutation discards the queue, which records the checks saved by its order
+      assert obligation_queue_class in statistics.obligation_queue_saved_checks
+   statistics = Statistics(dict())
+   assert _run_pric3("pric3/prism_models/MCs/grid.pm", "0.03", statistics) == False
+   assert statistics.obligation_queue_saved_checks == dict()
+
+
+def test_grid_value_iteration_oracle_refinement():
+   assert _run_pric3("pric3/prism_models/MCs/grid.pm", "0.3", oracle_refinement="value_iteration") == True
+
+
+def test_grid_batched_simulation_oracle():
+   assert _run_pric3("pric3/prism_models/MCs/grid.pm", "0.3", oracle_type="simulation", simulator="batched",
+                     number_simulations_for_oracle=10000, simulation_workers=2, simulation_seed=0) == True
+
+
+def test_grid_adaptive_simulation_oracle():
+   assert _run_pric3("pric3/prism_models/MCs/grid.pm", "0.3", oracle_type="simulation", simulator="batched",
+                     number_simulations_for_oracle=100000, simulation_tolerance=0.05, simulation_seed=0) == True
+
+
+def test_grid_oracle_cache(tmp_path):
+   cache_directory = str(tmp_path / "oracles")
+   assert _run_pric3("pric3/prism_models/MCs/grid.pm", "0.3", oracle_cache=cache_directory) == True
+   assert len(list((tmp_path / "oracles").iterdir())) == 1
+   assert _run_pric3("pric3/prism_models/MCs/grid.pm", "0.2", oracle_cache=cache_directory) == True
+
+
+def test_grid_file_oracle(tmp_path):
+   oracle_file = str(tmp_path / "oracle.pr")
+   state_graph = StateGraph(InputProgram(parse_prism_program("pric3/prism_models/MCs/grid.pm")))
+   save_oracle_dict(state_graph, {state_graph.get_initial_state_id(): RealVal("1/4")}, oracle_file)
+   assert _run_pric3("pric3/prism_models/MCs/grid.pm", "0.3", oracle_type="file", oracle_file=oracle_file) == True
+
+
+def test_grid_threshold_sweep():
+   settings = _settings(check_relative_inductiveness_of_frames=True)
+   input_program = InputProgram(parse_prism_program("pric3/prism_models/MCs/grid.pm"))
+   sweep = ThresholdSweep(SmtProgram(input_program, settings.get_smt_settings()), settings, Statistics(dict()))
+   sweep.sweep([Fraction(1, 100), Fraction(1, 10), Fraction(3, 10)])
+   sweep.bisect(3)
+   refuted_below, holds_from = sweep.interval()
+   assert holds_from <= Fraction(2, 10)
+   assert refuted_below is None or refuted_below < holds_from
+
+
+def test_grid_portfolio():
+   settings = _settings()
+   prism_program = parse_prism_program("pric3/prism_models/MCs/grid.pm")
+   input_program = InputProgram(prism_program)
+   statistics = Statistics(dict())
+   configs = [dict(forall_mode="macro"), dict(generalize=True, int_to_real=True, generalization_method="Linear")]
+   assert run_portfolio(prism_program, input_program, Fraction("0.3"), settings, configs, statistics) == True
+   assert statistics.property_holds == True
+   assert len(statistics.portfolio_workers) == 2
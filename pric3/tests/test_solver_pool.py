@@ -0,0 +1,26 @@
+from z3 import Int, Solver
+
+from pric3.solver_pool import SolverPool, _check_queries
+
+
+def _sexpr(*assertions):
+    solver = Solver()
+    solver.add(*assertions)
+    return solver.sexpr()
+
+
+def test_queries_declaring_the_frame_constants_again():
+    # Queries are exported on their own, so they declare the constants of the frame again.
+    a, b = Int("a"), Int("b")
+    frame = _sexpr(a > 0, b == a + 1)
+    queries = [_sexpr(b < 3), _sexpr(b < 1), _sexpr(a == 5)]
+
+    results = _check_queries(frame, queries, "b")
+    assert [result for (result, _time, _value) in results] == ["sat", "unsat", "sat"]
+    assert [value for (_result, _time, value) in results] == [2, None, 6]
+
+    pool = SolverPool(2)
+    try:
+        assert [result for (result, _time, _value) in pool.check(frame, queries)] == ["sat", "unsat", "sat"]
+    finally:
+        pool.shutdown()
@@ -1,3 +1,7 @@
+from fractions import Fraction
+
+import numpy as np
+
 from pric3.input_program import InputProgram
 from pric3.state_graph import StateGraph
 from pric3.utils import parse_prism_program_string
@@ -84,3 +88,46 @@ def test_nondeterministic():
     assert len(behavior[0].origins) == 1
     assert str(behavior[0].origins[0].guard) == "And(10 > c, 10 >= c)"
     assert str(behavior[1].origins[0].guard) == "10 > c"
+    assert [command.position for choice in behavior for command in choice.origins] == [0, 1]
+    assert input_program.module.commands_by_global_index[behavior[1].origins[0].global_index] is behavior[1].origins[0]
+    # both choices have the same two (interned) probabilities
+    probabilities = [prob for choice in behavior for _, prob in choice.distribution]
+    assert {prob.as_fraction() for prob in probabilities} == {Fraction(1, 1000), Fraction(999, 1000)}
+    assert len({id(prob) for prob in probabilities}) == 2
+
+def test_state_valuation_table():
+    prism_program = parse_prism_program_string(NONDET_MODEL)
+    input_program = InputProgram(prism_program)
+    state_graph = StateGraph(input_program)
+    initial_id = state_graph.get_initial_state_id()
+    c = input_program.module.lookup_variable("c")
+    f = input_program.module.lookup_variable("f")
+
+    int_valuation = state_graph.get_state_int_valuation(initial_id)
+    assert int_valuation[state_graph.get_valuation_column(c)] == 0
+    assert int_valuation[state_graph.get_valuation_column(f)] == 0
+
+    valuation = state_graph.get_state_valuation(initial_id)
+    assert str(valuation[c]) == "0" and str(valuation[f]) == "False"
+    assert state_graph.get_state_valuation(initial_id) is valuation
+    assert state_graph.get_state_args(initial_id) is state_graph.get_state_args(initial_id)
+
+def test_explore_to_csr():
+    prism_program = parse_prism_program_string(NONDET_MODEL)
+    input_program = InputProgram(prism_program)
+    state_graph = StateGraph(input_program)
+
+    state_space = state_graph.explore_to_csr()
+    assert state_space.state_ids[0] == state_graph.get_initial_state_id()
+    assert state_space.number_of_states == 21
+    assert state_space.goal_mask.sum() == 10
+    assert state_space.terminal_mask.sum() == 1
+    assert state_space.explored_mask.all()
+    assert list(state_space.choice_commands[state_space.row_pointers[0]:state_space.row_pointers[1]]) == [0, 1]
+    choice_sums = np.add.reduceat(state_space.probabilities, state_space.choice_pointers[:-1])
+    assert np.allclose(choice_sums, 1)
+    assert sum(state_space.exact_probabilities[:2]) == 1
+
+    partial = state_graph.explore_to_csr(1)
+    assert partial.number_of_states == 3
+    assert list(partial.explored_mask) == list(partial.goal_mask | (partial.state_ids == partial.state_ids[0]))
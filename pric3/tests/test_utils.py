@@ -0,0 +1,18 @@
+from z3 import Bool, Implies, sat, unsat
+
+from pric3.utils import OneshotSolver
+
+
+def test_oneshot_solver_checks_assumptions():
+    a = Bool("a")
+    solver = OneshotSolver()
+    solver.add(Implies(a, False))
+    assert solver.check() == sat
+    assert solver.check(a) == unsat
+    # the assumptions only hold for one check
+    assert solver.check() == sat
+    solver.push()
+    solver.add(a)
+    assert solver.check() == unsat
+    solver.pop()
+    assert solver.check() == sat
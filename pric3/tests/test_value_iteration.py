@@ -0,0 +1,63 @@
+from pric3.input_program import InputProgram
+from pric3.oracles.value_iteration import IncrementalValueIteration, reachability_boundary, value_iteration
+from pric3.state_graph import StateGraph
+from pric3.tests.test_state_graph import NONDET_MODEL
+from pric3.utils import parse_prism_program_string
+
+
+def test_value_iteration_mdp():
+    prism_program = parse_prism_program_string(NONDET_MODEL)
+    state_graph = StateGraph(InputProgram(prism_program))
+    state_space = state_graph.explore_to_csr()
+
+    fixed_mask, fixed_values = reachability_boundary(state_space)
+    result = value_iteration(state_space, fixed_mask, fixed_values)
+    assert result.converged
+    assert abs(result.values[0] - (1 - 0.999**10)) < 1e-8
+
+
+def test_value_iteration_frontier():
+    prism_program = parse_prism_program_string(NONDET_MODEL)
+    state_graph = StateGraph(InputProgram(prism_program))
+    state_space = state_graph.explore_to_csr(1)
+
+    fixed_mask, fixed_values = reachability_boundary(state_space, frontier_value=1.0)
+    result = value_iteration(state_space, fixed_mask, fixed_values)
+    assert abs(result.values[0] - 1.0) < 1e-8
+
+
+def test_incremental_value_iteration():
+    prism_program = parse_prism_program_string(NONDET_MODEL)
+    state_graph = StateGraph(InputProgram(prism_program))
+    state_space = state_graph.explore_to_csr()
+    fixed_mask, fixed_values = reachability_boundary(state_space)
+    expected = value_iteration(state_space, fixed_mask, fixed_values).values
+
+    states = [int(state_id) for state_id in state_space.state_ids[~fixed_mask]]
+    incremental = IncrementalValueIteration()
+    incremental.add_states(state_graph.states_to_csr(states[::2]))
+    incremental.solve(lambda state_id: 0.0)
+    incremental.add_states(state_graph.states_to_csr(states[1::2]))
+    result = incremental.solve(lambda state_id: 0.0)
+
+    assert set(states[1::2]) <= result.changed_states
+    for state_id in states:
+        assert abs(incremental.values[state_id] - expected[state_space.state_indices[state_id]]) < 1e-8
+
+
+def test_incremental_value_iteration_does_not_accumulate_epsilon():
+    prism_program = parse_prism_program_string(NONDET_MODEL)
+    state_graph = StateGraph(InputProgram(prism_program))
+    state_space = state_graph.explore_to_csr()
+    fixed_mask, fixed_values = reachability_boundary(state_space)
+    expected = value_iteration(state_space, fixed_mask, fixed_values).values
+
+    states = [int(state_id) for state_id in state_space.state_ids[~fixed_mask]]
+    incremental = IncrementalValueIteration(epsilon=1e-6)
+    for step in range(3):
+        incremental.add_states(state_graph.states_to_csr(states[step::3]))
+        incremental.solve(lambda state_id: 0.0)
+
+    for state_id in states:
+        assert abs(incremental.values[state_id] - expected[state_space.state_indices[state_id]]) < 1e-8
+        assert incremental.upper_bound(state_id) >= incremental.values[state_id]
@@ -0,0 +1,116 @@
+"""
+Check one program for several thresholds in one process.
+
+All runs share one :py:class:`pric3.pric3.PrIC3` instance, and therefore the SMT program, the state graph, the oracle and the statistics.
+Results are propagated by monotonicity: if the property holds for a threshold, it holds for all larger ones,
+and if it is refuted for a threshold, it is refuted for all smaller ones.
+"""
+
+import logging
+from fractions import Fraction
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from pric3.pric3 import PrIC3
+from pric3.settings import Settings
+from pric3.smt_program import SmtProgram
+from pric3.statistics import Statistics
+
+logger = logging.getLogger(__name__)
+
+
+def parse_thresholds(thresholds: str) -> List[Fraction]:
+    """
+    Parse a comma-separated list of thresholds.
+
+    >>> parse_thresholds("0.1, 1/3")
+    [Fraction(1, 10), Fraction(1, 3)]
+    """
+    return [Fraction(threshold.strip()) for threshold in thresholds.split(",") if threshold.strip()]
+
+
+class ThresholdSweep:
+    """
+    Checks thresholds one after another.
+    A run for a larger threshold than the previous run continues with the previous run's frames.
+
+    Attributes:
+        results (Dict[Fraction, bool]): whether the property holds, for each threshold PrIC3 was run for.
+    """
+
+    def __init__(self, smt_program: SmtProgram, settings: Settings, statistics: Statistics):
+        self.smt_program = smt_program
+        self.settings = settings
+        self.statistics = statistics
+        self.pric3: Optional[PrIC3] = None
+        self.results: Dict[Fraction, bool] = dict()
+        self._last_threshold: Optional[Fraction] = None
+
+    def interval(self) -> Tuple[Optional[Fraction], Optional[Fraction]]:
+        """
+        Return the largest threshold for which the property was refuted and the smallest one for which it holds.
+        Either is None if there is no such threshold yet.
+        """
+        refuted = [threshold for threshold, holds in self.results.items() if not holds]
+        proven = [threshold for threshold, holds in self.results.items() if holds]
+        return max(refuted, default=None), min(proven, default=None)
+
+    def implied_result(self, threshold: Fraction) -> Optional[bool]:
+        """
+        Return whether the property holds for the threshold if that follows from the results so far, otherwise None.
+        """
+        refuted_below, holds_from = self.interval()
+        if holds_from is not None and threshold >= holds_from:
+            return True
+        if refuted_below is not None and threshold <= refuted_below:
+            return False
+        return None
+
+    def check(self, threshold: Fraction) -> bool:
+        """
+        Return whether the property holds for the threshold, running PrIC3 unless the result is implied.
+        """
+        result = self.implied_result(threshold)
+        if result is not None:
+            logger.info("Threshold %s: result follows from the previous runs", threshold)
+            return result
+
+        logger.info("Threshold %s: run PrIC3", threshold)
+        if self.pric3 is None:
+            self.pric3 = PrIC3(self.smt_program, threshold, self.settings, self.statistics)
+            result = self.pric3.run()
+        else:
+            # set by the run that created self.pric3
+            assert self._last_threshold is not None
+            seed_frames = threshold > self._last_threshold
+            self.pric3.set_threshold(threshold)
+            result = self.pric3.run(seed_frames=seed_frames)
+
+        self._last_threshold = threshold
+        self.results[threshold] = result
+        self.statistics.add_threshold_result(threshold, result)
+        return result
+
+    def sweep(self, thresholds: Iterable[Fraction]):
+        """
+        Check the thresholds in increasing order, so that each run can continue with the frames of the previous one.
+        """
+        for threshold in sorted(set(thresholds)):
+            self.check(threshold)
+
+    def bisect(self, steps: int):
+        """
+        Narrow the interval between the largest refuted and the smallest proven threshold by bisection.
+        The interval starts at 0 and 1 if there are no such thresholds yet (any probability is at most 1).
+        """
+        for _ in range(steps):
+            refuted_below, holds_from = self.interval()
+            lower = Fraction(0) if refuted_below is None else refuted_below
+            upper = Fraction(1) if holds_from is None else holds_from
+            self.check((lower + upper) / 2)
+
+    def print_results(self):
+        for threshold, holds in sorted(self.results.items()):
+            print("Threshold %s: %s" % (threshold, "holds" if holds else "does not hold"))
+        refuted_below, holds_from = self.interval()
+        print("Tightest threshold interval: (%s, %s]" % ("-" if refuted_below is None else refuted_below,
+                                                         "-" if holds_from is None else holds_from))
@@ -323,13 +323,14 @@ class OneshotSolver:
         Important! This method asserts the result is either SAT or UNSAT, unknown will throw an error.
         We'll never handle unknown results anyway, so this is an important sanity check.
         """
-        self._update_stack()
-
         assumptions = list(assumptions)
         if len(assumptions) != 0:
             self.push()
             self.add(*assumptions)
 
+        # The assumptions must be on the stack when it is synced, otherwise the check ignores them
+        self._update_stack()
+
         res = self._solver.check()
         assert res != unknown
 